@@ -18,16 +18,35 @@ except Exception as e:
 
 import sqlite3
 import json
+import threading
 from datetime import datetime
 
 app = Flask(__name__)
 DATABASE = 'database.db'
+ORDERS_PER_PAGE = 50
+# Ids per IN (...) lookup, well under SQLite's bound-variable limit (999 before 3.32)
+MAX_IN_VARIABLES = 500
+
+# One connection per thread, reused across requests (sqlite3 connections
+# must not be shared between threads)
+_local = threading.local()
 
 def get_db_connection():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(DATABASE)
+        conn.row_factory = sqlite3.Row
+        _local.conn = conn
     return conn
 
+@app.teardown_appcontext
+def rollback_db_connection(exception=None):
+    # The connection outlives the request; don't leave a failed request's
+    # transaction (and its locks) open on it
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
+
 def init_db():
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -49,7 +68,6 @@ def init_db():
         )
     ''')
     conn.commit()
-    conn.close()
 
 def seed_menu():
     conn = get_db_connection()
@@ -69,13 +87,11 @@ def seed_menu():
         ]
         cursor.executemany('INSERT INTO menu_items (name, description, price) VALUES (?, ?, ?)', sample_items)
         conn.commit()
-    conn.close()
 
 @app.route('/')
 def home():
     conn = get_db_connection()
     menu_items = conn.execute('SELECT * FROM menu_items').fetchall()
-    conn.close()
     return render_template('home.html', menu_items=menu_items)
 
 @app.route('/order', methods=['GET', 'POST'])
@@ -87,25 +103,48 @@ def order():
         if not selected_ids:
             # No items selected, reload order page with a message could be added (not implemented here)
             return redirect(url_for('order'))
+        # Look up the selected items with one query per batch of ids
+        unique_ids = list(dict.fromkeys(selected_ids))
+        items_by_id = {}
+        for start in range(0, len(unique_ids), MAX_IN_VARIABLES):
+            batch = unique_ids[start:start + MAX_IN_VARIABLES]
+            placeholders = ', '.join('?' * len(batch))
+            rows = conn.execute(
+                f'SELECT id, name, price FROM menu_items WHERE id IN ({placeholders})',
+                batch
+            ).fetchall()
+            items_by_id.update((str(row['id']), row) for row in rows)
         selected_items = []
         for item_id in selected_ids:
-            item = conn.execute('SELECT * FROM menu_items WHERE id = ?', (item_id,)).fetchone()
+            item = items_by_id.get(item_id)
             if item:
                 selected_items.append({'id': item['id'], 'name': item['name'], 'price': item['price']})
         # Save order items as JSON string
         items_json = json.dumps(selected_items)
         conn.execute('INSERT INTO orders (items) VALUES (?)', (items_json,))
         conn.commit()
-        conn.close()
         return render_template('order.html', menu_items=menu_items, success=True)
-    conn.close()
     return render_template('order.html', menu_items=menu_items)
 
 @app.route('/admin')
 def admin():
     conn = get_db_connection()
-    orders = conn.execute('SELECT * FROM orders ORDER BY timestamp DESC').fetchall()
-    conn.close()
+    # Keyset pagination on id (newest first): only one page of orders is
+    # read and decoded, however long the history gets
+    before = request.args.get('before', type=int)
+    if before:
+        orders = conn.execute(
+            'SELECT * FROM orders WHERE id < ? ORDER BY id DESC LIMIT ?',
+            (before, ORDERS_PER_PAGE + 1)
+        ).fetchall()
+    else:
+        orders = conn.execute(
+            'SELECT * FROM orders ORDER BY id DESC LIMIT ?',
+            (ORDERS_PER_PAGE + 1,)
+        ).fetchall()
+    has_more = len(orders) > ORDERS_PER_PAGE
+    orders = orders[:ORDERS_PER_PAGE]
+    total_orders = conn.execute('SELECT COUNT(*) FROM orders').fetchone()[0]
     # Parse JSON items for display
     orders_parsed = []
     for order in orders:
@@ -115,7 +154,9 @@ def admin():
             'items': items,
             'timestamp': order['timestamp']
         })
-    return render_template('admin.html', orders=orders_parsed)
+    next_before = orders_parsed[-1]['id'] if has_more else None
+    return render_template('admin.html', orders=orders_parsed, total_orders=total_orders,
+                           next_before=next_before, first_page=not before)
 
 if __name__ == '__main__':
     init_db()
@@ -1,45 +1,157 @@
 import os
 from flask import Flask, request, jsonify
-from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
-from flask_bootstrap3 import Bootstrap
 from flask_migrate import Migrate
 from flask_caching import Cache
-from flask_moment import Moment
-from flask_mail import Mail
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from flask_talisman import Talisman
 from config import config
+from .utils.startup import LazyExtension
+from .utils.sqlite import configure_sqlite_engine, init_sqlite_profile
+from .utils.gevent_support import configure_gevent_engine, init_gevent_sqlite
+from .utils.db_routing import configure_replicas
+from .utils.sql_stats import init_sql_stats
+from .utils.structured_logging import init_logging
+# The models declare their tables on this instance
+from .models.base import db
 
 # Initialize extensions
-db = SQLAlchemy()
 login_manager = LoginManager()
 login_manager.login_view = 'auth.login'
 login_manager.login_message_category = 'info'
 login_manager.session_protection = 'strong'  # Prevents session fixation
-bootstrap = Bootstrap()
+
+@login_manager.user_loader
+def load_user(user_id):
+    """Return the logged-in user for Flask-Login."""
+    from .models.user import User
+    return db.session.get(User, int(user_id))
+
 migrate = Migrate()
-cache = Cache()
-moment = Moment()
-mail = Mail()
+# The `cache` template block comes from utils.fragment_cache instead
+cache = Cache(with_jinja2_ext=False)
+# Optional extensions are imported on first use (see utils.startup)
+bootstrap = LazyExtension('flask_bootstrap3', 'Bootstrap')
+moment = LazyExtension('flask_moment', 'Moment')
+mail = LazyExtension('flask_mail', 'Mail', deferred=True)
 limiter = Limiter(key_func=get_remote_address, default_limits=["200 per day", "50 per hour"])
 
-def create_app(config_name='default'):
-    """Application factory function."""
+def create_app(config_name='default', web=True):
+    """Application factory function.
+    
+    Args:
+        config_name (str): Key of the configuration class to load.
+        web (bool): Set up the template, security-header and metrics
+            extensions needed to serve pages. CLI commands pass ``False`` to
+            skip them.
+    """
     app = Flask(__name__)
     
     # Load configuration
     app.config.from_object(config[config_name])
     
+    # Queue log records to a background writer and add request ids
+    init_logging(app)
+    
+    # Size the pool for gevent workers (GEVENT_MODE), then tune SQLite
+    # connections (WAL, busy timeout, caches) when enabled
+    configure_gevent_engine(app)
+    configure_sqlite_engine(app)
+    
+    # Register read replicas as binds for the read-only views
+    configure_replicas(app)
+    
     # Initialize extensions
     db.init_app(app)
+    init_sqlite_profile(app, db)
+    init_gevent_sqlite(app, db)
     login_manager.init_app(app)
-    bootstrap.init_app(app)
     migrate.init_app(app, db)
-    moment.init_app(app)
     mail.init_app(app)
     limiter.init_app(app)
+    app.mail = mail
+    
+    # Count queries per request (Server-Timing header, N+1 warnings)
+    init_sql_stats(app)
+    
+    if web:
+        init_web_extensions(app)
+    
+    # Configure cache
+    if config_name == 'production':
+        cache.init_app(app, config={
+            'CACHE_TYPE': 'filesystem',
+            'CACHE_DIR': 'instance/cache',
+            'CACHE_DEFAULT_TIMEOUT': 300
+        })
+    else:
+        cache.init_app(app, config={'CACHE_TYPE': 'simple'})
+    
+    # Prometheus metrics at /metrics (scrapes must not count against the limits).
+    # Imported here: prometheus_client is only needed to serve requests
+    if web:
+        from .utils.metrics import init_metrics
+        init_metrics(app, cache)
+        if 'metrics' in app.view_functions:
+            limiter.exempt(app.view_functions['metrics'])
+    
+    # Register blueprints with URL prefixes
+    from .main import main as main_blueprint
+    from .auth import auth as auth_blueprint
+    
+    # Apply rate limiting to auth routes
+    limiter.limit(
+        "100 per day;10 per hour",
+        methods=["POST"],
+        error_message='Too many requests. Please try again later.'
+    )(auth_blueprint)
+    
+    app.register_blueprint(main_blueprint)
+    app.register_blueprint(auth_blueprint, url_prefix='/auth')
+    
+    # Admin-triggered request profiling (see utils.profiler)
+    from .utils.profiler import init_profiler
+    init_profiler(app)
+    
+    # Keep the in-memory menu snapshot in sync with menu edits
+    from .utils import menu_cache  # noqa: F401
+    
+    # Count item sales for the trending list as orders commit
+    from .utils import trending  # noqa: F401
+    
+    # Feed the prep time sketches as orders become ready
+    from .utils import prep_times  # noqa: F401
+    
+    # Keep customers' lifetime stats in step with completed orders
+    from .utils import user_stats  # noqa: F401
+    
+    # Register the models. Schema creation and the admin account are handled
+    # by `flask db upgrade` / `manage.py deploy`, not on every startup.
+    from .models import init_app as init_models
+    app.models = init_models()
+    
+    return app
+
+def init_web_extensions(app):
+    """Initialize the extensions only needed to serve HTML pages."""
+    from flask_talisman import Talisman
+    from .utils.static_assets import init_static_assets
+    from .utils.compression import init_compression
+    from .utils.page_cache import init_page_cache
+    from .utils.admission import init_admission_control
+    from .utils.fragment_cache import init_fragment_cache
+    
+    bootstrap.init_app(app)
+    moment.init_app(app)
+    
+    # {% cache %} blocks for menu-dependent template fragments
+    init_fragment_cache(app)
+    
+    # Hashed, precompressed static files served by WhiteNoise
+    init_static_assets(app)
+    
+    # gzip/brotli for pages and API responses (wraps WhiteNoise)
+    init_compression(app)
     
     # Initialize security headers
     Talisman(
@@ -126,56 +238,10 @@ def create_app(config_name='default'):
         }
     )
     
-    # Configure cache
-    if config_name == 'production':
-        cache.init_app(app, config={
-            'CACHE_TYPE': 'filesystem',
-            'CACHE_DIR': 'instance/cache',
-            'CACHE_DEFAULT_TIMEOUT': 300
-        })
-    else:
-        cache.init_app(app, config={'CACHE_TYPE': 'simple'})
-    
-    # Register blueprints with URL prefixes
-    from .main import main as main_blueprint
-    from .auth import auth as auth_blueprint
-    
-    # Apply rate limiting to auth routes
-    auth_blueprint.before_request(
-        limiter.limit(
-            "100 per day;10 per hour",
-            methods=["POST"],
-            error_message='Too many requests. Please try again later.'
-        )
-    )
-    
-    app.register_blueprint(main_blueprint)
-    app.register_blueprint(auth_blueprint, url_prefix='/auth')
+    # Shed low-priority requests with a fast 503 when the worker is overloaded
+    # (inside the page cache, so cached pages are still served)
+    init_admission_control(app)
     
-    # Initialize models and create database tables
-    with app.app_context():
-        # Import models
-        from .models import init_app as init_models
-        models = init_models()
-        
-        # Make models available in the app context
-        app.models = models
-        
-        # Create database tables if they don't exist
-        db.create_all()
-        
-        # Create default admin user if it doesn't exist
-        from .models.user import User
-        from werkzeug.security import generate_password_hash
-        
-        if not User.query.filter_by(email='admin@cafe.com').first():
-            admin = User(
-                email='admin@cafe.com',
-                username='admin',
-                password=generate_password_hash('admin123'),
-                is_admin=True
-            )
-            db.session.add(admin)
-            db.session.commit()
-    
-    return app
\ No newline at end of file
+    # Serve anonymous public pages from a short-lived in-memory cache
+    # (outermost layer, so hits skip Talisman, the limiter and compression)
+    init_page_cache(app)
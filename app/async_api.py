@@ -0,0 +1,159 @@
+"""
+Asyncio-native, read-only menu API for the Café application.
+
+An optional ASGI application serving the public menu endpoints without the
+Flask stack (Talisman, sessions, Flask-Login, the limiter). It uses the same
+config classes and models as the Flask app, with an async SQLAlchemy engine
+(``aiosqlite`` for SQLite, ``asyncpg`` for PostgreSQL):
+
+* ``GET /api/menu/items``           - available items (same JSON as Flask)
+* ``GET /api/menu/categories``      - category names
+* ``GET /api/menu/items/<id>``      - one available item
+* ``GET /api/menu/search?q=...``    - available items matching name/description
+
+Run it next to gunicorn and route ``/api/menu/`` to it from the proxy::
+
+    uvicorn asgi:application --port 8001 --workers 2
+
+Reads go to the first of ``REPLICA_DATABASE_URLS`` if any, otherwise to the
+primary database; ``ASYNC_API_DATABASE_URL`` overrides both. The item and
+category lists are kept in memory for ``ASYNC_API_CACHE_SECONDS`` and served
+with an ETag, like the Flask routes.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from sqlalchemy import or_, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from config import config
+from .models.menu_item import MenuItem
+
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'mysql': 'mysql+aiomysql',
+}
+
+
+def async_database_url(url):
+    """Return ``url`` with the async driver for its database backend."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'No async driver configured for {backend!r} databases')
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+class CachedJSON:
+    """A JSON body and its ETag, rebuilt at most every ``ttl`` seconds."""
+
+    def __init__(self, ttl, load):
+        self.ttl = ttl
+        self.load = load
+        self.body = None
+        self.etag = None
+        self.loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self):
+        if self.body is not None and time.monotonic() - self.loaded_at < self.ttl:
+            return self.body, self.etag
+        async with self._lock:
+            # Another request may have reloaded it while we waited
+            if self.body is None or time.monotonic() - self.loaded_at >= self.ttl:
+                body = json.dumps(await self.load()).encode()
+                self.etag = f'"{hashlib.md5(body, usedforsecurity=False).hexdigest()}"'
+                self.body = body
+                self.loaded_at = time.monotonic()
+        return self.body, self.etag
+
+
+def _cached_response(request, body, etag):
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if etag in request.headers.get('if-none-match', ''):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type='application/json', headers=headers)
+
+
+def create_async_app(config_name='default'):
+    """Create the ASGI menu API.
+
+    Args:
+        config_name (str): Key of the configuration class to load, as for
+            :func:`app.create_app`.
+    """
+    settings = config[config_name]
+    url = (getattr(settings, 'ASYNC_API_DATABASE_URL', None)
+           or (getattr(settings, 'REPLICA_DATABASE_URLS', None) or [None])[0]
+           or settings.SQLALCHEMY_DATABASE_URI)
+    url = async_database_url(url)
+    engine_options = {}
+    if url.get_backend_name() != 'sqlite':
+        engine_options = {'pool_size': getattr(settings, 'ASYNC_API_POOL_SIZE', 10), 'pool_pre_ping': True}
+    engine = create_async_engine(url, **engine_options)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    cache_seconds = getattr(settings, 'ASYNC_API_CACHE_SECONDS', 5)
+    search_limit = getattr(settings, 'ASYNC_API_SEARCH_LIMIT', 50)
+
+    async def load_items():
+        async with Session() as session:
+            result = await session.scalars(
+                select(MenuItem).filter_by(is_available=True).order_by(MenuItem.category, MenuItem.name)
+            )
+            return [item.to_dict() for item in result]
+
+    async def load_categories():
+        async with Session() as session:
+            result = await session.scalars(select(MenuItem.category).distinct())
+            return [category for category in result if category]
+
+    items_cache = CachedJSON(cache_seconds, load_items)
+    categories_cache = CachedJSON(cache_seconds, load_categories)
+
+    async def menu_items(request):
+        return _cached_response(request, *await items_cache.get())
+
+    async def menu_categories(request):
+        return _cached_response(request, *await categories_cache.get())
+
+    async def menu_item(request):
+        async with Session() as session:
+            item = await session.get(MenuItem, request.path_params['id'])
+        if item is None or not item.is_available:
+            return JSONResponse({'error': 'Menu item not found'}, status_code=404)
+        return JSONResponse(item.to_dict())
+
+    async def search(request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return JSONResponse([])
+        pattern = f'%{query}%'
+        async with Session() as session:
+            result = await session.scalars(
+                select(MenuItem)
+                .where(or_(MenuItem.name.ilike(pattern), MenuItem.description.ilike(pattern)),
+                       MenuItem.is_available == True)  # noqa: E712
+                .order_by(MenuItem.name)
+                .limit(search_limit)
+            )
+            return JSONResponse([item.to_dict() for item in result])
+
+    async def dispose_engine():
+        await engine.dispose()
+
+    app = Starlette(
+        routes=[
+            Route('/api/menu/items', menu_items),
+            Route('/api/menu/items/{id:int}', menu_item),
+            Route('/api/menu/categories', menu_categories),
+            Route('/api/menu/search', search),
+        ],
+        on_shutdown=[dispose_engine]
+    )
+    app.state.engine = engine
+    return app
@@ -154,7 +154,8 @@ def profile():
         flash('Your profile has been updated!', 'success')
         return redirect(url_for('auth.profile'))
     
-    return render_template('auth/profile.html', title='Edit Profile', form=form)
+    return render_template('auth/profile.html', title='Edit Profile', form=form,
+                         summary=current_user.get_order_summary())
 
 @auth.route('/deactivate', methods=['POST'])
 @login_required
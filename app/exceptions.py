@@ -28,6 +28,11 @@ class BusinessRuleError(Exception):
     pass
 
 
+class QueryBudgetError(Exception):
+    """Custom exception class for requests that run too many SQL queries."""
+    pass
+
+
 class ExternalServiceError(Exception):
     """Custom exception class for external service errors."""
     def __init__(self, message, status_code=None, payload=None):
@@ -1,4 +1,4 @@
-from flask import render_template, redirect, url_for, flash, request, current_app, jsonify, abort
+from flask import render_template, redirect, url_for, flash, request, current_app, jsonify, abort, send_from_directory
 from flask_login import login_required, current_user
 from datetime import datetime
 from .. import db
@@ -6,26 +6,36 @@ from ..models import MenuItem, Order, OrderItem
 from . import main
 from .forms import MenuItemForm, OrderForm, SearchForm
 from ..utils.decorators import admin_required
+from ..utils.menu_cache import get_menu_snapshot
+from ..utils.trending import get_trending_items
+from ..utils.prep_times import estimate_order_eta
+from ..utils.db_routing import read_replica
+from ..utils.memory import get_memory_status, get_report_dir, list_reports, stop_tracing, take_snapshot
+from ..utils.profiler import (PROFILE_MODES, PROFILE_TOKEN_HEADER, disable_profiling, enable_profiling,
+                              generate_profile_token, get_profile_dir, get_profiling_switch, list_profiles)
 
 @main.route('/')
+@read_replica
 def index():
     """Render the home page with featured menu items."""
     # Get featured menu items (you can adjust the query as needed)
     featured_items = MenuItem.query.filter_by(is_featured=True, is_available=True).all()
     
     # Get menu categories for navigation
-    categories = MenuItem.get_categories()
+    categories = get_menu_snapshot().categories
     
     return render_template('main/index.html', 
                          featured_items=featured_items,
+                         trending_items=get_trending_items(current_app.config.get('TRENDING_INDEX_ITEMS', 6)),
                          categories=categories)
 
 @main.route('/menu')
+@read_replica
 def menu():
     """Display the full menu with all available items."""
     # Get all available menu items grouped by category
     menu_items = {}
-    categories = MenuItem.get_categories()
+    categories = get_menu_snapshot().categories
     
     for category in categories:
         items = MenuItem.query.filter_by(
@@ -40,18 +50,27 @@ def menu():
                          categories=categories)
 
 @main.route('/menu/<int:id>')
+@read_replica
 def menu_item(id):
     """Display details for a specific menu item."""
     item = MenuItem.query.get_or_404(id)
     if not item.is_available and not current_user.is_admin:
         abort(404)
     
-    # Get recommended items (e.g., other items from the same category)
-    recommended = MenuItem.query.filter(
-        MenuItem.id != item.id,
-        MenuItem.category == item.category,
-        MenuItem.is_available == True
-    ).limit(4).all()
+    # Recommend other items from the same category, trending ones first
+    trending_ids = [trending['id'] for trending in get_trending_items()
+                    if trending['category'] == item.category and trending['id'] != item.id][:4]
+    recommended = []
+    if trending_ids:
+        recommended = MenuItem.query.filter(MenuItem.id.in_(trending_ids)).all()
+        recommended.sort(key=lambda r: trending_ids.index(r.id))
+    if len(recommended) < 4:
+        recommended += MenuItem.query.filter(
+            MenuItem.id != item.id,
+            MenuItem.id.notin_(trending_ids),
+            MenuItem.category == item.category,
+            MenuItem.is_available == True
+        ).limit(4 - len(recommended)).all()
     
     return render_template('main/menu_item.html', 
                          item=item,
@@ -119,6 +138,7 @@ def order_confirmation(order_id):
 
 @main.route('/my-orders')
 @login_required
+@read_replica
 def my_orders():
     """Display the current user's order history."""
     page = request.args.get('page', 1, type=int)
@@ -129,7 +149,8 @@ def my_orders():
     orders = pagination.items
     return render_template('main/my_orders.html', 
                          orders=orders,
-                         pagination=pagination)
+                         pagination=pagination,
+                         summary=current_user.get_order_summary())
 
 @main.route('/about')
 def about():
@@ -149,6 +170,7 @@ def contact():
     return render_template('main/contact.html', form=form)
 
 @main.route('/search')
+@read_replica
 def search():
     """Search for menu items."""
     form = SearchForm()
@@ -171,16 +193,23 @@ def search():
 
 # API Endpoints
 @main.route('/api/menu/items')
+@read_replica
 def get_menu_items():
     """API endpoint to get all available menu items."""
-    items = MenuItem.query.filter_by(is_available=True).all()
-    return jsonify([item.to_dict() for item in items])
+    snapshot = get_menu_snapshot()
+    # The ETag lets clients revalidate and the compression layer reuse its copy
+    response = jsonify(snapshot.items)
+    response.set_etag(f'menu-items-{snapshot.version}')
+    return response.make_conditional(request)
 
 @main.route('/api/menu/categories')
+@read_replica
 def get_menu_categories():
     """API endpoint to get all menu categories."""
-    categories = MenuItem.get_categories()
-    return jsonify(categories)
+    snapshot = get_menu_snapshot()
+    response = jsonify(snapshot.categories)
+    response.set_etag(f'menu-categories-{snapshot.version}')
+    return response.make_conditional(request)
 
 @main.route('/api/orders', methods=['POST'])
 @login_required
@@ -231,3 +260,105 @@ def create_order():
         db.session.rollback()
         current_app.logger.error(f'Error creating order: {str(e)}')
         return jsonify({'error': 'Failed to create order'}), 500
+
+@main.route('/api/orders/<int:order_id>/eta')
+@login_required
+def order_eta(order_id):
+    """API endpoint estimating when an order will be ready."""
+    order = Order.query.get_or_404(order_id)
+    
+    # Ensure the current user owns the order or is an admin
+    if order.user_id != current_user.id and not current_user.is_admin:
+        abort(403)
+    
+    return jsonify(estimate_order_eta(order))
+
+# Admin endpoints
+@main.route('/admin/profiling', methods=['GET', 'POST', 'DELETE'])
+@admin_required
+def profiling():
+    """Show, enable or disable the time-boxed request profiler."""
+    if request.method == 'DELETE':
+        disable_profiling()
+        return jsonify({'message': 'Profiling disabled'})
+    
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or request.form
+        mode = data.get('mode', 'sampling')
+        if mode not in PROFILE_MODES:
+            return jsonify({'error': f'Unknown profiling mode: {mode}'}), 400
+        endpoints = data.get('endpoints') or []
+        if isinstance(endpoints, str):
+            endpoints = [endpoint.strip() for endpoint in endpoints.split(',') if endpoint.strip()]
+        try:
+            switch = enable_profiling(
+                seconds=int(data.get('seconds', 60)),
+                endpoints=endpoints,
+                sample=float(data.get('sample', 1.0)),
+                mode=mode
+            )
+        except (TypeError, ValueError):
+            return jsonify({'error': 'seconds and sample must be numbers'}), 400
+        current_app.logger.info(f'Profiling enabled by {current_user.email}: {switch}')
+        return jsonify(switch)
+    
+    return jsonify({
+        'switch': get_profiling_switch(),
+        'profiles': list_profiles(limit=20)
+    })
+
+@main.route('/admin/profiling/token', methods=['POST'])
+@admin_required
+def profiling_token():
+    """Issue a signed token that profiles the requests sending it."""
+    mode = (request.get_json(silent=True) or request.form).get('mode', 'sampling')
+    if mode not in PROFILE_MODES:
+        return jsonify({'error': f'Unknown profiling mode: {mode}'}), 400
+    return jsonify({
+        'header': PROFILE_TOKEN_HEADER,
+        'token': generate_profile_token(mode),
+        'expires_in': current_app.config.get('PROFILER_TOKEN_MAX_AGE', 3600)
+    })
+
+@main.route('/admin/profiles')
+@admin_required
+def profiles():
+    """List the most recent saved profiles."""
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify(list_profiles(limit=limit))
+
+@main.route('/admin/profiles/<path:name>')
+@admin_required
+def download_profile(name):
+    """Download a saved profile (collapsed stacks or pstats)."""
+    return send_from_directory(get_profile_dir(), name, as_attachment=True)
+
+@main.route('/admin/memory', methods=['GET', 'DELETE'])
+@admin_required
+def memory():
+    """Show this worker's memory usage, or stop tracing with DELETE."""
+    if request.method == 'DELETE':
+        stop_tracing()
+    status = get_memory_status()
+    status['reports'] = list_reports(limit=20)
+    return jsonify(status)
+
+@main.route('/admin/memory/snapshot', methods=['POST'])
+@admin_required
+def memory_snapshot():
+    """Take a tracemalloc snapshot in this worker and diff it with earlier ones."""
+    data = request.get_json(silent=True) or request.form
+    key_type = data.get('key_type', 'lineno')
+    if key_type not in ('lineno', 'filename', 'traceback'):
+        return jsonify({'error': f'Unknown key_type: {key_type}'}), 400
+    try:
+        limit = int(data.get('limit', 25))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'limit must be a number'}), 400
+    return jsonify(take_snapshot(limit=limit, key_type=key_type))
+
+@main.route('/admin/memory/reports/<path:name>')
+@admin_required
+def memory_report(name):
+    """Download a saved snapshot report from any worker."""
+    return send_from_directory(get_report_dir(), name, as_attachment=True)
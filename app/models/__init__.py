@@ -6,6 +6,9 @@ from .base import db, BaseModel
 from .user import User
 from .menu_item import MenuItem
 from .order import Order, OrderItem
+from .item_sales import ItemSales
+from .prep_time import PrepTimeBucket
+from .user_item_count import UserItemCount
 
 def init_app():
     """Initialize models with the Flask app.
@@ -20,8 +23,8 @@ def init_app():
         'MenuItem': MenuItem,
         'Order': Order,
         'OrderItem': OrderItem,
+        'ItemSales': ItemSales,
+        'PrepTimeBucket': PrepTimeBucket,
+        'UserItemCount': UserItemCount,
         'db': db
     }
-
-# This will be populated when init_app is called
-User = MenuItem = Order = OrderItem = None
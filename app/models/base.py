@@ -2,9 +2,11 @@ from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
+from ..utils.db_routing import RoutingSession
 
-# Create SQLAlchemy instance
-db = SQLAlchemy()
+# The application's SQLAlchemy instance (re-exported as app.db), so the
+# models are registered with the app that create_app initializes
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class BaseModel(db.Model):
     """Base model that includes common columns and methods."""
@@ -0,0 +1,20 @@
+from .base import db, BaseModel
+
+class ItemSales(BaseModel):
+    """Units of a menu item sold per hour, for the trending list.
+
+    Rows are written in batches by ``app.utils.trending`` and pruned once
+    they fall out of ``TRENDING_WINDOW_HOURS``.
+    """
+    __tablename__ = 'item_sales'
+    
+    menu_item_id = db.Column(db.Integer, db.ForeignKey('menu_items.id'), nullable=False)
+    period_start = db.Column(db.DateTime, nullable=False, index=True)  # Start of the hour (UTC)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('menu_item_id', 'period_start', name='uq_item_sales_item_period'),
+    )
+    
+    def __repr__(self):
+        return f'<ItemSales {self.menu_item_id} @ {self.period_start:%Y-%m-%d %H}:00 x{self.quantity}>'
@@ -31,6 +31,8 @@ class MenuItem(BaseModel):
     # Constraints
     __table_args__ = (
         CheckConstraint('price >= 0', name='check_price_positive'),
+        # Menu pages: filter_by(is_available, category).order_by(name)
+        db.Index('ix_menu_items_available_category_name', 'is_available', 'category', 'name'),
     )
     
     def __repr__(self):
@@ -11,7 +11,12 @@ class Order(BaseModel):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     
     # Status tracking
-    status = db.Column(db.String(20), default='pending', index=True)  # pending, confirmed, preparing, ready, completed, cancelled
+    # active_history: the stats listeners compare the previous status, even
+    # after a commit has expired it (see utils/user_stats.py, utils/prep_times.py)
+    status = db.column_property(
+        db.Column(db.String(20), default='pending', index=True),  # pending, confirmed, preparing, ready, completed, cancelled
+        active_history=True
+    )
     
     # Customer information (denormalized for historical accuracy)
     customer_name = db.Column(db.String(120))
@@ -51,6 +56,10 @@ class Order(BaseModel):
                        name='check_payment_status'),
         CheckConstraint("order_type IN ('dine_in', 'takeout', 'delivery')", 
                        name='check_order_type'),
+        # Order history: filter_by(user_id).order_by(order_date desc)
+        db.Index('ix_orders_user_id_order_date', 'user_id', 'order_date'),
+        # Order queues: filter_by(status).order_by(order_date desc)
+        db.Index('ix_orders_status_order_date', 'status', 'order_date'),
     )
     
     def __init__(self, **kwargs):
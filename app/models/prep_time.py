@@ -0,0 +1,23 @@
+from .base import db, BaseModel
+
+class PrepTimeBucket(BaseModel):
+    """One bucket of a prep time quantile sketch.
+
+    A sketch is identified by a dimension and a key, e.g. ``('category',
+    'Coffee')``, ``('order_type', 'takeout')`` or ``('hour', '14')``; its
+    buckets count the orders whose prep time fell in each range (see
+    ``app.utils.prep_times``).
+    """
+    __tablename__ = 'prep_time_buckets'
+    
+    dimension = db.Column(db.String(20), nullable=False)
+    key = db.Column(db.String(50), nullable=False)
+    bucket = db.Column(db.Integer, nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('dimension', 'key', 'bucket', name='uq_prep_time_buckets_sketch_bucket'),
+    )
+    
+    def __repr__(self):
+        return f'<PrepTimeBucket {self.dimension}={self.key} #{self.bucket} x{self.count}>'
@@ -29,6 +29,13 @@ class User(UserMixin, BaseModel):
     last_login_at = db.Column(db.DateTime)
     last_seen = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Lifetime stats of completed orders, maintained as orders complete
+    # (see app.utils.user_stats)
+    order_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    total_spent = db.Column(db.Numeric(10, 2), nullable=False, default=0, server_default='0')
+    last_order_date = db.Column(db.DateTime)
+    top_items = db.Column(db.JSON)  # [{'id', 'name', 'quantity'}], most ordered first
+    
     # Relationships
     orders = db.relationship('Order', backref='customer', lazy='dynamic')
     
@@ -55,6 +62,15 @@ class User(UserMixin, BaseModel):
         """Return the full name of the user."""
         return f"{self.first_name} {self.last_name}" if self.first_name and self.last_name else self.username
     
+    def get_order_summary(self):
+        """Return the user's lifetime order stats without querying orders."""
+        return {
+            'order_count': self.order_count or 0,
+            'total_spent': float(self.total_spent or 0),
+            'last_order_date': self.last_order_date,
+            'top_items': self.top_items or []
+        }
+    
     def update_last_seen(self):
         """Update the last seen timestamp."""
         self.last_seen = datetime.utcnow()
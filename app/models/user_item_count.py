@@ -0,0 +1,21 @@
+from .base import db, BaseModel
+
+class UserItemCount(BaseModel):
+    """Units of a menu item a customer has received in completed orders.
+
+    Maintained with ``User``'s lifetime stats (see ``app.utils.user_stats``)
+    to keep the customer's top items current.
+    """
+    __tablename__ = 'user_item_counts'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    menu_item_id = db.Column(db.Integer, db.ForeignKey('menu_items.id'), nullable=False)
+    item_name = db.Column(db.String(100), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'menu_item_id', name='uq_user_item_counts_user_item'),
+    )
+    
+    def __repr__(self):
+        return f'<UserItemCount {self.user_id} {self.item_name} x{self.quantity}>'
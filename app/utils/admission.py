@@ -0,0 +1,215 @@
+"""
+Admission control and load shedding for the Café application.
+
+A gevent worker accepts up to ``worker_connections`` requests at once, so
+under overload requests do not fail fast: they all slow down until the worker
+timeout kills them. This middleware tracks, per worker:
+
+* the number of requests in flight, against ``ADMISSION_MAX_IN_FLIGHT``;
+* the queueing delay, against ``ADMISSION_MAX_DELAY``. Under gevent it is
+  the event loop lag, i.e. how long runnable greenlets wait for the CPU.
+  Behind a proxy that sets ``X-Request-Start`` (nginx:
+  ``proxy_set_header X-Request-Start "t=${msec}";``) the header is used as
+  well, but only with ``ADMISSION_TRUST_REQUEST_START`` on: clients can send
+  it too, so the proxy must overwrite it.
+
+The larger of the two ratios is the worker's pressure. Each route belongs to
+a priority class (``ADMISSION_ROUTE_PRIORITIES``) and each class has the
+pressure at which its requests are rejected (``ADMISSION_PRIORITY_CLASSES``).
+Search, order history and the menu API go first, and order placement goes
+last. Rejected requests get an immediate ``503`` with ``Retry-After``.
+"""
+import json
+import os
+import threading
+import time
+from werkzeug.exceptions import HTTPException
+from werkzeug.wsgi import ClosingIterator
+from .gevent_support import is_patched
+
+DEFAULT_PRIORITY_CLASSES = {'low': 0.5, 'normal': 0.75, 'high': 0.9, 'critical': 1.0}
+# X-Request-Start samples older than this no longer describe the queue
+_DELAY_SAMPLE_MAX_AGE = 1.0
+
+_middleware = None
+
+
+def parse_request_start(value, now=None, max_delay=None):
+    """Return the queueing delay in seconds from an ``X-Request-Start`` value.
+
+    Accepts ``t=<seconds>`` (nginx ``$msec``) as well as milliseconds and
+    microseconds since the epoch, with or without the ``t=`` prefix. Returns
+    None for values that cannot be a queueing delay: unparsable, in the
+    future, or longer than ``max_delay`` seconds.
+    """
+    try:
+        started = float(value.strip().removeprefix('t='))
+    except ValueError:
+        return None
+    if started > 1e14:
+        started /= 1e6
+    elif started > 1e11:
+        started /= 1e3
+    delay = (now or time.time()) - started
+    if delay < 0 or (max_delay is not None and delay > max_delay):
+        return None
+    return delay
+
+
+class AdmissionControlMiddleware:
+    """Reject requests with a fast 503 when the worker is overloaded.
+
+    Args:
+        app: The WSGI callable to wrap.
+        flask_app (Flask): The application, used to map requests to endpoints.
+        max_in_flight (int): Concurrent requests per worker at full pressure.
+        max_delay (float): Queueing delay in seconds at full pressure.
+        classes (dict): Priority class -> pressure at which it is shed.
+        route_priorities (dict): Endpoint (or ``'METHOD endpoint'``) ->
+            priority class.
+        default_priority (str): Class of routes not listed.
+        retry_after (int): ``Retry-After`` seconds sent with a 503.
+        trust_request_start (bool): Use the ``X-Request-Start`` header. Only
+            enable behind a proxy that overwrites it.
+        max_request_start_delay (float): Header delays above this many
+            seconds are discarded as bogus.
+    """
+
+    def __init__(self, app, flask_app, max_in_flight=200, max_delay=1.0, classes=None,
+                 route_priorities=None, default_priority='normal', retry_after=5,
+                 trust_request_start=False, max_request_start_delay=120):
+        self.app = app
+        self.flask_app = flask_app
+        self.max_in_flight = max_in_flight
+        self.max_delay = max_delay
+        self.classes = dict(classes or DEFAULT_PRIORITY_CLASSES)
+        self.route_priorities = dict(route_priorities or {})
+        self.default_priority = default_priority
+        self.retry_after = str(retry_after)
+        self.trust_request_start = trust_request_start
+        self.max_request_start_delay = max_request_start_delay
+        for priority in [default_priority, *self.route_priorities.values()]:
+            if priority not in self.classes:
+                raise ValueError(f'Unknown admission priority class {priority!r}')
+
+        self.in_flight = 0
+        self.header_delay = 0.0
+        self.header_delay_at = 0.0
+        self.loop_lag = 0.0
+        self.stats = {'admitted': 0, 'shed': dict.fromkeys(self.classes, 0)}
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def __call__(self, environ, start_response):
+        if self._pid != os.getpid():
+            self._start_lag_monitor()
+
+        priority = self.classify(environ)
+        if self.pressure() >= self.classes[priority]:
+            self.stats['shed'][priority] += 1
+            return self._reject(environ, start_response)
+
+        # Only admitted requests update the estimate, so a burst of shed
+        # requests cannot keep the worker looking overloaded
+        if self.trust_request_start and 'HTTP_X_REQUEST_START' in environ:
+            delay = parse_request_start(environ['HTTP_X_REQUEST_START'],
+                                        max_delay=self.max_request_start_delay)
+            if delay is not None:
+                self.header_delay = 0.8 * self.header_delay + 0.2 * delay
+                self.header_delay_at = time.monotonic()
+
+        with self._lock:
+            self.in_flight += 1
+        self.stats['admitted'] += 1
+        try:
+            return ClosingIterator(self.app(environ, start_response), self._finished)
+        except BaseException:
+            self._finished()
+            raise
+
+    def _finished(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def classify(self, environ):
+        """Return the priority class of a request."""
+        try:
+            endpoint, _ = self.flask_app.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            return self.default_priority
+        method = environ.get('REQUEST_METHOD', 'GET')
+        return self.route_priorities.get(
+            f'{method} {endpoint}', self.route_priorities.get(endpoint, self.default_priority)
+        )
+
+    def queue_delay(self):
+        """Return the current queueing delay estimate in seconds."""
+        header_delay = self.header_delay
+        if time.monotonic() - self.header_delay_at > _DELAY_SAMPLE_MAX_AGE:
+            header_delay = 0.0
+        return max(header_delay, self.loop_lag)
+
+    def pressure(self):
+        """Return the worker's load: 1.0 means at the configured limit."""
+        return max(self.in_flight / self.max_in_flight, self.queue_delay() / self.max_delay)
+
+    def _reject(self, environ, start_response):
+        headers = [('Retry-After', self.retry_after), ('Cache-Control', 'no-store')]
+        if environ.get('PATH_INFO', '').startswith('/api/'):
+            body = json.dumps({'error': 'Service overloaded, please retry shortly'}).encode()
+            headers.append(('Content-Type', 'application/json'))
+        else:
+            body = b'The cafe is very busy right now. Please try again in a few seconds.'
+            headers.append(('Content-Type', 'text/plain; charset=utf-8'))
+        headers.append(('Content-Length', str(len(body))))
+        start_response('503 Service Unavailable', headers)
+        return [body]
+
+    def _start_lag_monitor(self):
+        """Measure event loop lag in a greenlet when running under gevent."""
+        self._pid = os.getpid()
+        if not is_patched('socket'):
+            return
+        import gevent
+        gevent.spawn(self._monitor_lag, gevent.sleep, 0.05)
+
+    def _monitor_lag(self, sleep, interval):
+        while True:
+            started = time.perf_counter()
+            sleep(interval)
+            lag = time.perf_counter() - started - interval
+            # Rise at once, fall gradually so short gaps don't admit a burst
+            self.loop_lag = max(lag, self.loop_lag * 0.8)
+
+
+def get_admission_stats():
+    """Return this worker's admission counters, or None if not installed."""
+    if _middleware is None:
+        return None
+    return {
+        'in_flight': _middleware.in_flight,
+        'queue_delay': _middleware.queue_delay(),
+        'pressure': _middleware.pressure(),
+        'admitted': _middleware.stats['admitted'],
+        'shed': dict(_middleware.stats['shed'])
+    }
+
+
+def init_admission_control(app):
+    """Wrap the app's WSGI callable with :class:`AdmissionControlMiddleware`."""
+    global _middleware
+    if not app.config.get('ADMISSION_CONTROL_ENABLED', True):
+        return
+    _middleware = AdmissionControlMiddleware(
+        app.wsgi_app,
+        app,
+        max_in_flight=app.config.get('ADMISSION_MAX_IN_FLIGHT', 200),
+        max_delay=app.config.get('ADMISSION_MAX_DELAY', 1.0),
+        classes=app.config.get('ADMISSION_PRIORITY_CLASSES'),
+        route_priorities=app.config.get('ADMISSION_ROUTE_PRIORITIES'),
+        default_priority=app.config.get('ADMISSION_DEFAULT_PRIORITY', 'normal'),
+        retry_after=app.config.get('ADMISSION_RETRY_AFTER', 5),
+        trust_request_start=app.config.get('ADMISSION_TRUST_REQUEST_START', False),
+        max_request_start_delay=app.config.get('ADMISSION_MAX_REQUEST_START_DELAY', 120)
+    )
+    app.wsgi_app = _middleware
@@ -0,0 +1,275 @@
+"""
+Response compression middleware for the Café application.
+
+Compresses HTML, JSON and other text responses with brotli or gzip,
+negotiated from ``Accept-Encoding``. Bodies below ``COMPRESSION_MIN_SIZE``,
+already-encoded responses (e.g. WhiteNoise's precompressed assets), range
+requests and ``Cache-Control: no-transform`` are passed through unchanged.
+
+Responses with a ``Content-Length`` are compressed in one go. Responses with
+an ``ETag`` (such as the menu API) also keep their compressed copy in a
+bounded in-memory LRU keyed by URL, ETag and encoding, so repeated requests for
+the same version skip the compression. Streamed responses (no
+``Content-Length``) are compressed chunk by chunk and flushed after every
+chunk so clients still receive data as it is produced.
+
+Compressed responses carry the ETag with an ``-<encoding>`` suffix. The
+suffix of the encoding negotiated for the request is stripped from
+``If-None-Match`` before it reaches the app, so conditional requests keep
+working; a tag for another encoding's variant is left alone and never
+matches.
+"""
+import threading
+import zlib
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/json', 'application/javascript', 'application/xml',
+    'application/xhtml+xml', 'application/rss+xml', 'application/manifest+json', 'image/svg+xml'
+)
+_SKIP_STATUS = {204, 206, 304}
+
+
+def negotiate_encoding(accept_encoding, brotli_available=True):
+    """Return 'br', 'gzip' or None for an ``Accept-Encoding`` header value."""
+    accepted = {}
+    for part in accept_encoding.lower().split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding] = quality
+
+    for coding in (['br', 'gzip'] if brotli_available else ['gzip']):
+        if accepted.get(coding, accepted.get('*', 0)) > 0:
+            return coding
+    return None
+
+
+class _Compressor:
+    """Incremental gzip or brotli compressor."""
+
+    def __init__(self, encoding, level, brotli_quality):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits=31 writes a gzip header and trailer
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data, flush=False):
+        if self.encoding == 'br':
+            out = self._compressor.process(data)
+            return out + self._compressor.flush() if flush else out
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+class CompressedCache:
+    """LRU of compressed bodies keyed by URL, ETag and encoding, bounded in bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def set(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._entries[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+class CompressionMiddleware:
+    """WSGI middleware that compresses eligible responses."""
+
+    def __init__(self, app, min_size=500, level=6, brotli_quality=5, cache_size=8 * 1024 * 1024):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self.cache = CompressedCache(cache_size) if cache_size else None
+
+    def __call__(self, environ, start_response):
+        encoding = None
+        if environ.get('REQUEST_METHOD') != 'HEAD' and 'HTTP_RANGE' not in environ:
+            encoding = negotiate_encoding(environ.get('HTTP_ACCEPT_ENCODING', ''), brotli is not None)
+
+        # Only a tag of the variant this request would get may match
+        matched_encoding = None
+        if encoding and 'HTTP_IF_NONE_MATCH' in environ:
+            suffix = f'-{encoding}"'
+            if suffix in environ['HTTP_IF_NONE_MATCH']:
+                environ['HTTP_IF_NONE_MATCH'] = environ['HTTP_IF_NONE_MATCH'].replace(suffix, '"')
+                matched_encoding = encoding
+
+        captured = []
+        written = []
+
+        def capture_start_response(status, headers, exc_info=None):
+            captured[:] = [status, headers, exc_info]
+            return written.append
+
+        app_iter = self.app(environ, capture_start_response)
+        if not captured:
+            # The app starts the response lazily: pull the first chunk
+            iterator = iter(app_iter)
+            app_iter = _prepend(next(iterator, b''), iterator, app_iter)
+        if written:
+            app_iter = with_written(written, app_iter)
+        status, headers, exc_info = captured
+
+        header_map = {name.lower(): value for name, value in headers}
+        if status.startswith('304') and matched_encoding and 'etag' in header_map:
+            # Echo the ETag the client revalidated, i.e. the compressed variant's
+            headers = [(name, _suffix_etag(value, matched_encoding) if name.lower() == 'etag' else value)
+                       for name, value in headers]
+        if not self._should_compress(status, header_map):
+            if header_map.get('content-type', '').startswith(COMPRESSIBLE_TYPES):
+                headers = _add_vary(headers)
+            start_response(status, headers, exc_info)
+            return app_iter
+
+        headers = _add_vary(headers)
+        if encoding is None:
+            start_response(status, headers, exc_info)
+            return app_iter
+
+        etag = header_map.get('etag')
+        headers = [(name, value) for name, value in headers
+                   if name.lower() not in ('content-length', 'etag')]
+        headers.append(('Content-Encoding', encoding))
+        if etag:
+            headers.append(('ETag', _suffix_etag(etag, encoding)))
+
+        if 'content-length' not in header_map:
+            start_response(status, headers, exc_info)
+            return self._stream(app_iter, encoding)
+
+        cache_key = (environ.get('PATH_INFO'), environ.get('QUERY_STRING'), etag, encoding)
+        body = self.cache.get(cache_key) if etag and self.cache else None
+        if body is None:
+            try:
+                data = b''.join(app_iter)
+            finally:
+                if hasattr(app_iter, 'close'):
+                    app_iter.close()
+            compressor = _Compressor(encoding, self.level, self.brotli_quality)
+            body = compressor.compress(data) + compressor.finish()
+            if etag and self.cache:
+                self.cache.set(cache_key, body)
+        elif hasattr(app_iter, 'close'):
+            app_iter.close()
+
+        headers.append(('Content-Length', str(len(body))))
+        start_response(status, headers, exc_info)
+        return [body]
+
+    def _should_compress(self, status, header_map):
+        if int(status[:3]) in _SKIP_STATUS:
+            return False
+        if 'content-encoding' in header_map:
+            return False
+        if not header_map.get('content-type', '').startswith(COMPRESSIBLE_TYPES):
+            return False
+        if 'no-transform' in header_map.get('cache-control', ''):
+            return False
+        length = header_map.get('content-length')
+        return length is None or int(length) >= self.min_size
+
+    def _stream(self, app_iter, encoding):
+        compressor = _Compressor(encoding, self.level, self.brotli_quality)
+        try:
+            for chunk in app_iter:
+                if chunk:
+                    yield compressor.compress(chunk, flush=True)
+            yield compressor.finish()
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+
+def _prepend(first, iterator, app_iter):
+    try:
+        yield first
+        yield from iterator
+    finally:
+        if hasattr(app_iter, 'close'):
+            app_iter.close()
+
+
+def with_written(written, app_iter):
+    """Yield the data an app passed to ``write()`` ahead of its iterable.
+
+    Args:
+        written (list): Chunks appended by the ``write`` callable that the
+            captured ``start_response`` returned; drained as they are sent.
+        app_iter: The app's response iterable.
+    """
+    try:
+        for chunk in app_iter:
+            while written:
+                yield written.pop(0)
+            yield chunk
+        while written:
+            yield written.pop(0)
+    finally:
+        if hasattr(app_iter, 'close'):
+            app_iter.close()
+
+
+def _suffix_etag(etag, encoding):
+    return etag[:-1] + f'-{encoding}"' if etag.endswith('"') else etag
+
+
+def _add_vary(headers):
+    for index, (name, value) in enumerate(headers):
+        if name.lower() == 'vary':
+            if 'accept-encoding' not in value.lower():
+                headers = list(headers)
+                headers[index] = (name, f'{value}, Accept-Encoding')
+            return headers
+    return list(headers) + [('Vary', 'Accept-Encoding')]
+
+
+def init_compression(app):
+    """Wrap the app's WSGI callable with :class:`CompressionMiddleware`."""
+    if not app.config.get('COMPRESSION_ENABLED', True):
+        return
+    app.wsgi_app = CompressionMiddleware(
+        app.wsgi_app,
+        min_size=app.config.get('COMPRESSION_MIN_SIZE', 500),
+        level=app.config.get('COMPRESSION_LEVEL', 6),
+        brotli_quality=app.config.get('COMPRESSION_BROTLI_QUALITY', 5),
+        cache_size=app.config.get('COMPRESSION_CACHE_SIZE', 8 * 1024 * 1024)
+    )
@@ -0,0 +1,61 @@
+"""
+Shared counter rows for the Café application.
+
+Several workers add to the same rows (hourly item sales, prep time sketch
+buckets), so counts are written as increments, ``count = count + n``, never
+as a read followed by an overwrite.
+"""
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+
+
+def increment_counts(connection, table, key_columns, rows, column):
+    """Add ``rows`` to the counter ``column`` of ``table``, creating missing rows.
+
+    Uses ``INSERT ... ON CONFLICT DO UPDATE`` on SQLite and PostgreSQL, and an
+    update falling back to an insert elsewhere.
+
+    Args:
+        connection: SQLAlchemy connection inside a transaction.
+        table (Table): Table with a unique constraint on ``key_columns``.
+        key_columns (list): Names of the columns identifying a counter.
+        rows (list): Dicts with a value for every column to insert.
+        column (str): Name of the counter column.
+    """
+    if not rows:
+        return
+    counter = table.c[column]
+    # Keep BaseModel's updated_at current on incremented rows
+    touch = 'updated_at' in table.c and 'updated_at' in rows[0]
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(table)
+        values = {column: counter + stmt.excluded[column]}
+        if touch:
+            values['updated_at'] = stmt.excluded.updated_at
+        connection.execute(stmt.on_conflict_do_update(index_elements=key_columns, set_=values), rows)
+        return
+
+    def increment(row):
+        values = {column: counter + row[column]}
+        if touch:
+            values['updated_at'] = row['updated_at']
+        return connection.execute(
+            update(table)
+            .where(*[table.c[name] == row[name] for name in key_columns])
+            .values(values)
+        ).rowcount
+
+    for row in rows:
+        if increment(row):
+            continue
+        try:
+            with connection.begin_nested():
+                connection.execute(insert(table), row)
+        except IntegrityError:
+            # Another worker created the row in the meantime
+            increment(row)
@@ -0,0 +1,80 @@
+"""
+Read-replica routing for the Café application.
+
+Read-only views are decorated with ``@read_replica``; their SELECTs go to one
+of the replica binds listed in ``REPLICA_DATABASE_URLS`` while flushes and
+other writes always go to the primary. After a write request commits, the
+client sticks to the primary for ``REPLICA_STICKY_SECONDS`` so it reads its
+own writes even if the replicas lag behind.
+"""
+import random
+import time
+from functools import wraps
+from flask import current_app, has_request_context, request, session as flask_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+REPLICA_BIND_PREFIX = 'replica_'
+STICKY_SESSION_KEY = 'db_primary_until'
+
+
+class RoutingSession(Session):
+    """Session that sends SELECTs to a replica when the request allows it."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get('use_replica') and not self._flushing \
+                and getattr(clause, 'is_select', False):
+            replicas = current_app.extensions.get('replica_binds')
+            if replicas:
+                return self._db.engines[random.choice(replicas)]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def configure_replicas(app):
+    """Expose ``REPLICA_DATABASE_URLS`` as ``replica_<n>`` binds.
+
+    Must be called before ``db.init_app(app)``.
+    """
+    urls = app.config.get('REPLICA_DATABASE_URLS') or []
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    keys = []
+    for n, url in enumerate(urls):
+        key = f'{REPLICA_BIND_PREFIX}{n}'
+        binds[key] = url
+        keys.append(key)
+    app.config['SQLALCHEMY_BINDS'] = binds
+    app.extensions['replica_binds'] = keys
+
+
+def is_sticky():
+    """Return True if the current client recently wrote and must read the primary."""
+    return flask_session.get(STICKY_SESSION_KEY, 0) > time.time()
+
+
+def use_replica():
+    """Route the rest of this request's reads to a replica, if any is configured."""
+    from .. import db
+
+    if current_app.extensions.get('replica_binds') and not is_sticky():
+        db.session().info['use_replica'] = True
+
+
+def read_replica(f):
+    """
+    Decorator for read-only views.
+    Their queries are served by a replica unless the client just wrote.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        use_replica()
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _stick_to_primary(session):
+    # GET requests only commit bookkeeping (e.g. last_seen), not user writes
+    if has_request_context() and request.method not in ('GET', 'HEAD', 'OPTIONS') \
+            and current_app.extensions.get('replica_binds'):
+        window = current_app.config.get('REPLICA_STICKY_SECONDS', 5)
+        flask_session[STICKY_SESSION_KEY] = time.time() + window
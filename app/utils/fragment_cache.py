@@ -0,0 +1,87 @@
+"""
+Template fragment caching for the Café application.
+
+Pages for logged-in users cannot be cached whole (see
+:mod:`app.utils.page_cache`), but their expensive parts, such as the menu
+grid or the recommendations on an item page, are the same for everyone.
+Wrap such a part in a ``cache`` block::
+
+    {% cache 'menu_grid' %}
+        ...
+    {% endcache %}
+
+    {% cache 'recommended', 600, item.id %}
+        ...
+    {% endcache %}
+
+The first argument names the fragment, the optional second one is the TTL
+in seconds (``FRAGMENT_CACHE_TTL`` by default) and any further arguments are
+values the fragment varies on. The rendered HTML is stored in the app cache
+under a key that includes the current menu version, so a menu edit makes
+every cached fragment stale at once. Never cache markup that depends on the
+current user.
+
+Hits and misses are counted per fragment name in
+``cafe_fragment_cache_requests_total``.
+"""
+from flask import current_app
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from .. import cache
+from .menu_cache import get_menu_snapshot
+from .metrics import FRAGMENT_CACHE_REQUESTS
+
+FRAGMENT_KEY_PREFIX = 'fragment'
+
+
+def make_fragment_key(name, vary_on=(), version=None):
+    """Return the cache key of a fragment at a menu version (default: current)."""
+    if version is None:
+        version = get_menu_snapshot().version
+    parts = [FRAGMENT_KEY_PREFIX, name, f'v{version}']
+    parts.extend(str(value) for value in vary_on)
+    return ':'.join(parts)
+
+
+class FragmentCacheExtension(Extension):
+    """Adds the ``{% cache name[, ttl[, vary_on...]] %}`` block."""
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        name = parser.parse_expression()
+        ttl = nodes.Const(None)
+        vary_on = []
+        if parser.stream.skip_if('comma'):
+            ttl = parser.parse_expression()
+            while parser.stream.skip_if('comma'):
+                vary_on.append(parser.parse_expression())
+
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_render_cached', [name, ttl, nodes.List(vary_on)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render_cached(self, name, ttl, vary_on, caller):
+        if not current_app.config.get('FRAGMENT_CACHE_ENABLED', True):
+            return caller()
+
+        key = make_fragment_key(name, vary_on)
+        html = cache.get(key)
+        if html is not None:
+            FRAGMENT_CACHE_REQUESTS.labels(name, 'hit').inc()
+            return Markup(html)
+
+        FRAGMENT_CACHE_REQUESTS.labels(name, 'miss').inc()
+        html = caller()
+        if ttl is None:
+            ttl = current_app.config.get('FRAGMENT_CACHE_TTL', 300)
+        cache.set(key, str(html), timeout=ttl)
+        return html
+
+
+def init_fragment_cache(app):
+    """Register the ``cache`` template block."""
+    app.jinja_env.add_extension(FragmentCacheExtension)
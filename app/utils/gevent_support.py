@@ -0,0 +1,258 @@
+"""
+gevent support for the Café application.
+
+Helpers for code that must keep working when gevent has monkey-patched the
+standard library (gunicorn ``worker_class = 'gevent'``), and the "gevent
+mode" for the database layer (``GEVENT_MODE``):
+
+* the SQLAlchemy pool is sized for the worker's concurrency (every request
+  admitted by :mod:`app.utils.admission` can get a connection) and waits for
+  a connection fail fast;
+* psycopg2 is made cooperative with psycogreen, so a slow PostgreSQL query
+  only blocks its own greenlet;
+* SQLite calls, which gevent cannot patch, run in the hub's thread pool so
+  queries and lock waits (``busy_timeout``) do not block the event loop.
+
+``gunicorn_config.py`` turns the mode on for gevent workers and calls
+:func:`init_gevent_worker` once the worker has been patched, which also
+checks the setup and logs anything that would still block the hub.
+
+gevent itself is only imported in gevent mode: a process that has not loaded
+it (CLI commands, sync workers) cannot have been patched.
+"""
+import sys
+from sqlalchemy import event
+from .sqlite import is_memory_uri, is_sqlite_uri
+
+# Modules that must be patched for request handling not to block the hub
+REQUIRED_PATCHES = ('socket', 'ssl', 'select', 'threading', 'time')
+
+
+def _monkey():
+    """Return ``gevent.monkey`` if gevent is already loaded, else None."""
+    if 'gevent' not in sys.modules:
+        return None
+    try:
+        from gevent import monkey
+    except ImportError:
+        return None
+    return monkey
+
+
+def unpatched(module, name, default):
+    """Return the original ``module.name`` if gevent has monkey-patched it.
+
+    Background threads that must run while a request greenlet is busy (the
+    profiler's sampler, the log writer) need a real OS thread and a blocking
+    sleep that does not yield to the gevent hub.
+
+    Args:
+        module (str): Module name, e.g. ``'_thread'`` or ``'time'``.
+        name (str): Attribute in that module.
+        default: Value to use when gevent is missing or did not patch it.
+    """
+    monkey = _monkey()
+    if monkey is None:
+        return default
+    if monkey.is_module_patched(module):
+        return monkey.get_original(module, name)
+    return default
+
+
+def is_patched(module='socket'):
+    """Return True if gevent has monkey-patched ``module``."""
+    monkey = _monkey()
+    return monkey is not None and monkey.is_module_patched(module)
+
+
+def gevent_mode_enabled(app):
+    """Return True if ``GEVENT_MODE`` is on, or 'auto' and gevent is patched in."""
+    mode = str(app.config.get('GEVENT_MODE', 'auto')).lower()
+    if mode == 'auto':
+        return is_patched()
+    return mode in ('on', 'true', '1')
+
+
+class _ThreadpoolProxy:
+    """Delegate to a DBAPI object, running blocking calls in the hub's thread pool."""
+
+    __slots__ = ('_target',)
+
+    def __init__(self, target):
+        object.__setattr__(self, '_target', target)
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+    def _call(self, method, *args):
+        from gevent import get_hub
+        return get_hub().threadpool.apply(getattr(self._target, method), args)
+
+
+class GreenSQLiteCursor(_ThreadpoolProxy):
+    """sqlite3 cursor whose statements and fetches run off the event loop."""
+
+    __slots__ = ()
+
+    def execute(self, *args):
+        self._call('execute', *args)
+        return self
+
+    def executemany(self, *args):
+        self._call('executemany', *args)
+        return self
+
+    def executescript(self, *args):
+        self._call('executescript', *args)
+        return self
+
+    def fetchone(self):
+        return self._call('fetchone')
+
+    def fetchmany(self, *args):
+        return self._call('fetchmany', *args)
+
+    def fetchall(self):
+        return self._call('fetchall')
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+
+class GreenSQLiteConnection(_ThreadpoolProxy):
+    """sqlite3 connection whose blocking calls run off the event loop.
+
+    The pool hands a connection to one greenlet at a time, and that greenlet
+    waits for each call, so the connection is never used concurrently.
+    """
+
+    __slots__ = ()
+
+    def cursor(self, *args):
+        return GreenSQLiteCursor(self._target.cursor(*args))
+
+    def execute(self, *args):
+        return GreenSQLiteCursor(self._call('execute', *args))
+
+    def commit(self):
+        return self._call('commit')
+
+    def rollback(self):
+        return self._call('rollback')
+
+    def close(self):
+        return self._call('close')
+
+
+def _green_sqlite_connect(dialect, connection_record, cargs, cparams):
+    from gevent import get_hub
+    # Connections are created in one thread and used from others
+    cparams['check_same_thread'] = False
+    connection = get_hub().threadpool.apply(dialect.loaded_dbapi.connect, cargs, cparams)
+    return GreenSQLiteConnection(connection)
+
+
+def configure_gevent_engine(app):
+    """Size the connection pool for gevent workers in ``SQLALCHEMY_ENGINE_OPTIONS``.
+
+    Must be called before ``db.init_app(app)``, and before
+    :func:`app.utils.sqlite.configure_sqlite_engine` so these sizes win over
+    the SQLite defaults. Explicit engine options in the config still win.
+    """
+    if not gevent_mode_enabled(app):
+        return
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI')
+    if is_sqlite_uri(uri) and is_memory_uri(uri):
+        return
+
+    pool_size = app.config.get('GEVENT_DB_POOL_SIZE', 20)
+    max_overflow = app.config.get('GEVENT_DB_MAX_OVERFLOW')
+    if max_overflow is None:
+        # Enough for every request admission control lets in
+        max_overflow = max(0, app.config.get('ADMISSION_MAX_IN_FLIGHT', 200) - pool_size)
+    options = {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': app.config.get('GEVENT_DB_POOL_TIMEOUT', 5),
+        'pool_pre_ping': True
+    }
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def init_gevent_sqlite(app, db):
+    """Route the app's file-based SQLite engines through the hub's thread pool.
+
+    Must be called after ``db.init_app(app)``.
+    """
+    if not gevent_mode_enabled(app) or not app.config.get('GEVENT_SQLITE_THREADPOOL', True):
+        return
+
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        if engine.dialect.name == 'sqlite' and not is_memory_uri(engine.url):
+            event.listen(engine, 'do_connect', _green_sqlite_connect)
+
+
+def check_gevent_mode(app, db):
+    """Return a list of problems that would block the event loop.
+
+    Run in a worker after gevent has patched it (``post_worker_init``).
+    """
+    problems = []
+    missing = [module for module in REQUIRED_PATCHES if not is_patched(module)]
+    if missing:
+        problems.append(f'gevent has not patched: {", ".join(missing)}')
+
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        driver = engine.dialect.driver
+        if engine.dialect.name == 'postgresql':
+            if driver != 'psycopg2':
+                problems.append(f'{engine.url.render_as_string()}: driver {driver!r} is not cooperative '
+                                f'under gevent; use psycopg2 with psycogreen')
+            else:
+                import psycopg2.extensions
+                if psycopg2.extensions.get_wait_callback() is None:
+                    problems.append(f'{engine.url.render_as_string()}: psycopg2 has no wait callback; '
+                                    f'install psycogreen')
+        elif engine.dialect.name == 'sqlite':
+            if not is_memory_uri(engine.url) and not app.config.get('GEVENT_SQLITE_THREADPOOL', True):
+                problems.append(f'{engine.url.render_as_string()}: SQLite queries run on the event loop '
+                                f'(GEVENT_SQLITE_THREADPOOL is off)')
+        elif engine.dialect.name == 'mysql' and driver != 'pymysql':
+            problems.append(f'{engine.url.render_as_string()}: driver {driver!r} is not cooperative '
+                            f'under gevent; use pymysql')
+    return problems
+
+
+def init_gevent_worker(app, db):
+    """Finish gevent mode in a freshly patched worker and check the setup.
+
+    Called from ``post_worker_init`` in ``gunicorn_config.py``.
+
+    Returns:
+        list: The problems found (also logged as errors).
+    """
+    if not gevent_mode_enabled(app):
+        return []
+
+    with app.app_context():
+        uses_psycopg2 = any(engine.dialect.name == 'postgresql' and engine.dialect.driver == 'psycopg2'
+                            for engine in db.engines.values())
+    if uses_psycopg2:
+        try:
+            from psycogreen.gevent import patch_psycopg
+            patch_psycopg()
+        except ImportError:
+            pass
+
+    problems = check_gevent_mode(app, db)
+    for problem in problems:
+        app.logger.error(f'gevent mode: {problem}')
+    return problems
@@ -0,0 +1,232 @@
+"""
+Migration of the legacy kiosk orders into the normalized order tables.
+
+The standalone ``app.py`` stores every order as a JSON ``items`` blob in its
+own SQLite database. ``migrate_legacy_orders`` streams those rows in id order,
+one chunk per transaction, and bulk-inserts them as ``Order``/``OrderItem``
+rows with the prices denormalized from the blob. Progress is checkpointed to a
+file after every chunk so the migration can be stopped and resumed at will.
+"""
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+from sqlalchemy import insert, select
+from .. import db
+from ..exceptions import ValidationError
+from ..models.menu_item import MenuItem
+from ..models.order import Order, OrderItem
+
+LEGACY_ORDER_PREFIX = 'LEGACY-'
+LEGACY_CATEGORY = 'Legacy'
+TAX_RATE = 0.08
+
+
+def new_stats():
+    """Return the counters of a migration that has not migrated anything yet."""
+    return {'orders': 0, 'items': 0, 'skipped': 0, 'invalid': 0, 'errors': []}
+
+
+def read_checkpoint(path):
+    """Return the last migrated legacy order id and the stats recorded in ``path``.
+
+    Returns:
+        tuple: ``(last_id, stats)``; ``(0, new_stats())`` if there is no checkpoint.
+    """
+    stats = new_stats()
+    if not path or not os.path.exists(path):
+        return 0, stats
+    with open(path) as f:
+        checkpoint = json.load(f)
+    stats.update(checkpoint.get('stats') or {})
+    return int(checkpoint.get('last_id', 0)), stats
+
+
+def write_checkpoint(path, last_id, stats):
+    """Atomically record progress so an interrupted run can resume."""
+    if not path:
+        return
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'last_id': last_id, 'stats': stats}, f)
+    os.replace(tmp_path, path)
+
+
+def iter_legacy_chunks(source, after_id=0, chunk_size=1000):
+    """Yield lists of ``(id, items, timestamp)`` rows from the legacy database.
+
+    Uses keyset pagination on id, so memory use is bounded by ``chunk_size``.
+    """
+    conn = sqlite3.connect(source)
+    try:
+        last_id = after_id
+        while True:
+            rows = conn.execute(
+                'SELECT id, items, timestamp FROM orders WHERE id > ? ORDER BY id LIMIT ?',
+                (last_id, chunk_size)
+            ).fetchall()
+            if not rows:
+                break
+            yield rows
+            last_id = rows[-1][0]
+    finally:
+        conn.close()
+
+
+def decode_legacy_order(items_json, timestamp):
+    """Decode and validate one legacy order.
+
+    Returns:
+        tuple: ``(order_date, lines)`` where lines is a list of
+        ``(name, price, quantity)``. Repeated items are merged into one line.
+
+    Raises:
+        ValidationError: If the blob or timestamp is invalid.
+    """
+    try:
+        items = json.loads(items_json)
+    except (TypeError, ValueError) as e:
+        raise ValidationError(f'invalid JSON: {e}')
+    if not isinstance(items, list) or not items:
+        raise ValidationError('items must be a non-empty list')
+
+    lines = {}
+    for item in items:
+        if not isinstance(item, dict) or not item.get('name'):
+            raise ValidationError(f'invalid item: {item!r}')
+        try:
+            price = round(float(item.get('price')), 2)
+        except (TypeError, ValueError):
+            raise ValidationError(f'invalid price for {item["name"]!r}')
+        if price < 0:
+            raise ValidationError(f'negative price for {item["name"]!r}')
+        key = (str(item['name'])[:100], price)
+        lines[key] = lines.get(key, 0) + 1
+
+    try:
+        order_date = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S') if timestamp else None
+    except (TypeError, ValueError):
+        raise ValidationError(f'invalid timestamp: {timestamp!r}')
+
+    return order_date, [(name, price, quantity) for (name, price), quantity in lines.items()]
+
+
+def _menu_item_ids():
+    """Map menu item names to ids (the menu is small compared to the order history)."""
+    return {name: id for id, name in db.session.execute(select(MenuItem.id, MenuItem.name))}
+
+
+def _placeholder_menu_item(name, price, menu_ids):
+    """Return the id for ``name``, creating an unavailable menu item if needed."""
+    if name not in menu_ids:
+        item = MenuItem(name=name, price=price, category=LEGACY_CATEGORY, is_available=False)
+        db.session.add(item)
+        db.session.flush()
+        menu_ids[name] = item.id
+    return menu_ids[name]
+
+
+def migrate_chunk(rows, user_id, menu_ids, stats):
+    """Insert one chunk of legacy rows in the current transaction."""
+    order_numbers = {row[0]: f'{LEGACY_ORDER_PREFIX}{row[0]}' for row in rows}
+
+    # Skip rows already migrated by a run that died before its checkpoint
+    existing = set(db.session.scalars(
+        select(Order.order_number).where(Order.order_number.in_(order_numbers.values()))
+    ))
+
+    orders, lines_by_number = [], {}
+    for legacy_id, items_json, timestamp in rows:
+        number = order_numbers[legacy_id]
+        if number in existing:
+            stats['skipped'] += 1
+            continue
+        try:
+            order_date, lines = decode_legacy_order(items_json, timestamp)
+        except ValidationError as e:
+            stats['invalid'] += 1
+            stats['errors'].append(f'{legacy_id}: {e}')
+            continue
+
+        subtotal = round(sum(price * quantity for _, price, quantity in lines), 2)
+        tax = round(subtotal * TAX_RATE, 2)
+        orders.append({
+            'order_number': number,
+            'user_id': user_id,
+            'status': 'completed',
+            'order_type': 'dine_in',
+            'subtotal': subtotal,
+            'tax': tax,
+            'total': round(subtotal + tax, 2),
+            'order_date': order_date,
+            'completed_at': order_date,
+            'created_at': order_date,
+            'updated_at': order_date
+        })
+        lines_by_number[number] = (order_date, lines)
+
+    if not orders:
+        return
+
+    db.session.execute(insert(Order.__table__), orders)
+    order_ids = dict(db.session.execute(
+        select(Order.order_number, Order.id).where(Order.order_number.in_(lines_by_number))
+    ).all())
+
+    order_items = []
+    for number, (order_date, lines) in lines_by_number.items():
+        for name, price, quantity in lines:
+            order_items.append({
+                'order_id': order_ids[number],
+                'menu_item_id': _placeholder_menu_item(name, price, menu_ids),
+                'item_name': name,
+                'item_price': price,
+                'quantity': quantity,
+                'total_price': round(price * quantity, 2),
+                'created_at': order_date
+            })
+    db.session.execute(insert(OrderItem.__table__), order_items)
+    stats['orders'] += len(orders)
+    stats['items'] += len(order_items)
+
+
+def migrate_legacy_orders(source, user_id, checkpoint_path=None, chunk_size=1000,
+                          pause=0, progress=None):
+    """Stream every legacy order after the checkpoint into ``orders``/``order_items``.
+
+    Args:
+        source (str): Path to the legacy SQLite database.
+        user_id (int): User the migrated orders are attributed to.
+        checkpoint_path (str): JSON file holding the last migrated legacy id.
+        chunk_size (int): Legacy rows per transaction.
+        pause (float): Seconds to sleep between chunks to limit load.
+        progress (callable): Called with ``(last_id, stats)`` after each chunk.
+
+    Returns:
+        dict: Counts of migrated orders and items, skipped and invalid rows,
+        including those of the runs the checkpoint resumes.
+    """
+    last_id, stats = read_checkpoint(checkpoint_path)
+    menu_ids = _menu_item_ids()
+
+    for rows in iter_legacy_chunks(source, after_id=last_id, chunk_size=chunk_size):
+        try:
+            migrate_chunk(rows, user_id, menu_ids, stats)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        # Free the identity map so memory stays flat across chunks
+        db.session.expunge_all()
+
+        last_id = rows[-1][0]
+        # Only keep the most recent errors in the checkpoint
+        stats['errors'] = stats['errors'][-100:]
+        write_checkpoint(checkpoint_path, last_id, stats)
+        if progress:
+            progress(last_id, stats)
+        if pause:
+            time.sleep(pause)
+
+    return stats
@@ -0,0 +1,187 @@
+"""
+Per-worker memory diagnostics for the Café application.
+
+Each gunicorn worker can take ``tracemalloc`` snapshots on demand, from the
+admin endpoint (``POST /admin/memory/snapshot``) or by sending the worker
+process ``MEMORY_SNAPSHOT_SIGNAL`` (``SIGUSR2`` by default; send it to a
+worker pid, never to the gunicorn master, which re-executes on USR2).
+
+The first snapshot starts tracing and becomes the baseline. Every later one is
+diffed against both the previous snapshot and the baseline, and the top
+allocation sites are written as a JSON report to ``instance/memory`` so the
+reports of all workers can be collected in one place. Only two snapshots are
+kept in memory at any time.
+"""
+import gc
+import json
+import os
+import resource
+import signal
+import threading
+import tracemalloc
+from datetime import datetime
+from flask import current_app
+from .gevent_support import is_patched
+
+_IGNORED_FILES = (tracemalloc.__file__, '<frozen importlib._bootstrap>',
+                  '<frozen importlib._bootstrap_external>', '<unknown>')
+_lock = threading.Lock()
+_snapshots = {'baseline': None, 'previous': None}
+
+
+def get_rss():
+    """Return the resident set size of this process in bytes."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (OSError, IndexError, ValueError):
+        # Peak rather than current RSS, but better than nothing (KiB on Linux)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def get_gc_stats():
+    """Return per-generation GC counters and the current allocation counts."""
+    return {
+        'counts': list(gc.get_count()),
+        'thresholds': list(gc.get_threshold()),
+        'generations': gc.get_stats(),
+        'frozen': gc.get_freeze_count()
+    }
+
+
+def _top_stats(snapshot, other, key_type, limit):
+    stats = snapshot.compare_to(other, key_type)
+    return [{
+        'site': str(stat.traceback),
+        'size_diff': stat.size_diff,
+        'count_diff': stat.count_diff,
+        'size': stat.size,
+        'count': stat.count
+    } for stat in stats[:limit]]
+
+
+def take_snapshot(limit=25, key_type='lineno', frames=None):
+    """Snapshot this worker's allocations and diff them against earlier ones.
+
+    Args:
+        limit (int): Allocation sites to report per diff.
+        key_type (str): ``'lineno'``, ``'filename'`` or ``'traceback'``.
+        frames (int): Frames per traceback when tracing is started here.
+
+    Returns:
+        dict: The report (also saved under ``instance/memory``).
+    """
+    with _lock:
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(frames or current_app.config.get('MEMORY_TRACE_FRAMES', 10))
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, pattern) for pattern in _IGNORED_FILES]
+        )
+        traced, peak = tracemalloc.get_traced_memory()
+        report = {
+            'pid': os.getpid(),
+            'taken_at': datetime.utcnow().isoformat(),
+            'rss_bytes': get_rss(),
+            'traced_bytes': traced,
+            'traced_peak_bytes': peak,
+            'tracemalloc_overhead_bytes': tracemalloc.get_tracemalloc_memory(),
+            'gc': get_gc_stats(),
+            'since_previous': [],
+            'since_baseline': []
+        }
+        if started or _snapshots['baseline'] is None:
+            report['message'] = 'Tracing started; this snapshot is the baseline'
+            _snapshots['baseline'] = snapshot
+        else:
+            report['since_previous'] = _top_stats(snapshot, _snapshots['previous'], key_type, limit)
+            report['since_baseline'] = _top_stats(snapshot, _snapshots['baseline'], key_type, limit)
+        _snapshots['previous'] = snapshot
+
+    save_report(report)
+    return report
+
+
+def stop_tracing():
+    """Stop tracemalloc and drop the stored snapshots."""
+    with _lock:
+        _snapshots['baseline'] = _snapshots['previous'] = None
+        tracemalloc.stop()
+
+
+def get_memory_status():
+    """Return this worker's current memory figures without taking a snapshot."""
+    status = {
+        'pid': os.getpid(),
+        'rss_bytes': get_rss(),
+        'tracing': tracemalloc.is_tracing(),
+        'gc': get_gc_stats()
+    }
+    if status['tracing']:
+        status['traced_bytes'], status['traced_peak_bytes'] = tracemalloc.get_traced_memory()
+    return status
+
+
+def get_report_dir(app=None):
+    app = app or current_app
+    return app.config.get('MEMORY_REPORT_DIR') or os.path.join(app.instance_path, 'memory')
+
+
+def list_reports(limit=None):
+    """Return the saved reports of all workers, newest first."""
+    directory = get_report_dir()
+    if not os.path.isdir(directory):
+        return []
+    names = sorted((name for name in os.listdir(directory) if name.endswith('.json')), reverse=True)
+    return names[:limit] if limit else names
+
+
+def save_report(report):
+    """Write a snapshot report to the report directory, pruning old ones."""
+    directory = get_report_dir()
+    name = f'{datetime.utcnow():%Y%m%dT%H%M%S%f}-{report["pid"]}.json'
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, name), 'w') as f:
+            json.dump(report, f, indent=2)
+        for old in list_reports()[current_app.config.get('MEMORY_REPORTS_KEEP', 50):]:
+            os.remove(os.path.join(directory, old))
+    except OSError as e:
+        current_app.logger.warning(f'Could not save memory report {name}: {e}')
+        return None
+    return name
+
+
+def install_signal_handler(app):
+    """Take a snapshot whenever this process receives ``MEMORY_SNAPSHOT_SIGNAL``.
+
+    Gunicorn resets signal handlers in each worker after forking, so this is
+    called from the ``post_worker_init`` hook in ``gunicorn_config.py``.
+    """
+    signame = app.config.get('MEMORY_SNAPSHOT_SIGNAL')
+    if not signame:
+        return None
+    signum = getattr(signal, signame)
+
+    def snapshot():
+        with app.app_context():
+            report = take_snapshot()
+            top = report['since_previous'][:5]
+            app.logger.warning(f'Memory snapshot in worker {report["pid"]}: '
+                               f'RSS {report["rss_bytes"] // 1024} KiB, top growth {top}')
+
+    if is_patched('signal'):
+        # Run the handler in a greenlet instead of interrupting the hub
+        import gevent
+        gevent.signal_handler(signum, snapshot)
+        return signum
+
+    def handle_signal(*args):
+        # The signal may interrupt a thread that holds the (non-reentrant)
+        # snapshot lock, e.g. during /admin/memory/snapshot, so snapshot in
+        # a thread of its own, which waits for the lock instead of deadlocking
+        threading.Thread(target=snapshot, name='memory-snapshot', daemon=True).start()
+
+    signal.signal(signum, handle_signal)
+    return signum
@@ -0,0 +1,124 @@
+"""
+Process-local menu snapshot for the Café application.
+
+The available menu items and categories are read on almost every public page,
+but change only when staff edit the menu. The snapshot keeps them in worker
+memory and is rebuilt when the shared menu version in the app cache changes.
+"""
+import time
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from .. import cache
+from ..models.menu_item import MenuItem
+
+MENU_VERSION_KEY = 'menu_version'
+
+
+class MenuSnapshot:
+    """The available menu at a given menu version.
+
+    The items and categories are never changed once loaded; only
+    ``checked_at``, when the version was last confirmed, is updated in place.
+    """
+
+    def __init__(self, version, items, categories):
+        self.version = version
+        self.items = items
+        self.categories = categories
+        self.checked_at = time.monotonic()
+
+    def __repr__(self):
+        return f'<MenuSnapshot v{self.version} ({len(self.items)} items)>'
+
+
+def get_menu_version():
+    """Return the current shared menu version.
+
+    A missing version (never set, or evicted from the cache) is seeded with
+    the current time rather than a constant, so an ETag built from it is
+    never reused for a different menu. If the cache keeps nothing (e.g.
+    ``NullCache``) every call returns a new version.
+    """
+    version = cache.get(MENU_VERSION_KEY)
+    if version is None:
+        # add() only sets the key if no other worker seeded it first
+        cache.add(MENU_VERSION_KEY, time.time_ns(), timeout=0)
+        version = cache.get(MENU_VERSION_KEY)
+        if version is None:
+            version = time.time_ns()
+    return version
+
+
+def bump_menu_version():
+    """Mark the menu as changed so every worker rebuilds its snapshot.
+
+    Returns:
+        int: The new menu version.
+    """
+    version = time.time_ns()
+    cache.set(MENU_VERSION_KEY, version, timeout=0)
+    return version
+
+
+def build_menu_snapshot(version=None):
+    """Load the available menu from the database into a new snapshot.
+
+    Args:
+        version (int): The menu version the snapshot belongs to. Defaults to
+            the current shared version.
+    """
+    if version is None:
+        version = get_menu_version()
+    items = MenuItem.query.filter_by(is_available=True)\
+                          .order_by(MenuItem.category, MenuItem.name).all()
+    return MenuSnapshot(
+        version=version,
+        items=[item.to_dict() for item in items],
+        categories=MenuItem.get_categories()
+    )
+
+
+def get_menu_snapshot():
+    """Return the menu snapshot for the current app, rebuilding it if stale.
+
+    The shared version is checked at most once every
+    ``MENU_SNAPSHOT_CHECK_INTERVAL`` seconds so the hot path stays in memory.
+    """
+    app = current_app._get_current_object()
+    snapshot = app.extensions.get('menu_snapshot')
+    interval = app.config.get('MENU_SNAPSHOT_CHECK_INTERVAL', 5)
+
+    if snapshot is not None and time.monotonic() - snapshot.checked_at < interval:
+        return snapshot
+
+    version = get_menu_version()
+    if snapshot is None or snapshot.version != version:
+        snapshot = build_menu_snapshot(version)
+        app.extensions['menu_snapshot'] = snapshot
+    else:
+        snapshot.checked_at = time.monotonic()
+    return snapshot
+
+
+# Invalidate the snapshot whenever a transaction touching menu items commits
+def _mark_menu_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info['menu_changed'] = True
+
+
+for _event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(MenuItem, _event_name, _mark_menu_changed)
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_on_commit(session):
+    # Outside the app (e.g. scripts using a plain Session) there is no cache to bump
+    if session.info.pop('menu_changed', False) and has_app_context():
+        bump_menu_version()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_on_rollback(session):
+    session.info.pop('menu_changed', None)
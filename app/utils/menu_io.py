@@ -0,0 +1,204 @@
+"""
+Bulk menu import and export for the Café application.
+
+Menus are exchanged as CSV or JSON with one record per item. Imports are
+upserts keyed on the item name, applied with batched bulk statements in a
+single transaction, and the menu version is bumped once at the end.
+"""
+import csv
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import insert, select, update
+from .. import db
+from ..exceptions import ValidationError
+from ..models.menu_item import MenuItem
+from .menu_cache import bump_menu_version
+
+MENU_FIELDS = [
+    'name', 'description', 'price', 'category', 'is_available', 'is_featured',
+    'calories', 'is_vegetarian', 'is_vegan', 'is_gluten_free', 'image_url', 'display_order'
+]
+BOOLEAN_FIELDS = {'is_available', 'is_featured', 'is_vegetarian', 'is_vegan', 'is_gluten_free'}
+INTEGER_FIELDS = {'calories', 'display_order'}
+BATCH_SIZE = 500
+
+
+def guess_format(path, fmt=None):
+    """Return 'csv' or 'json' from an explicit format or the file extension."""
+    fmt = (fmt or path.rsplit('.', 1)[-1]).lower()
+    if fmt not in ('csv', 'json'):
+        raise ValidationError(f'Unsupported menu format: {fmt}')
+    return fmt
+
+
+def _parse_boolean(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y', 'on')
+
+
+def normalize_row(raw, line):
+    """Validate one imported record and convert it to column values.
+
+    Only fields present in the record are returned, so partial files (e.g.
+    name and price only) update just those columns.
+    """
+    name = (raw.get('name') or '').strip()
+    if not name:
+        raise ValidationError(f'Row {line}: name is required')
+    row = {'name': name[:100]}
+
+    for field in MENU_FIELDS[1:]:
+        if field not in raw:
+            continue
+        value = raw[field]
+        if value == '' or value is None:
+            row[field] = None
+        elif field == 'price':
+            try:
+                row[field] = Decimal(str(value)).quantize(Decimal('0.01'))
+            except InvalidOperation:
+                raise ValidationError(f'Row {line}: invalid price {value!r}')
+            if row[field] < 0:
+                raise ValidationError(f'Row {line}: price must not be negative')
+        elif field in BOOLEAN_FIELDS:
+            row[field] = _parse_boolean(value)
+        elif field in INTEGER_FIELDS:
+            try:
+                row[field] = int(value)
+            except (TypeError, ValueError):
+                raise ValidationError(f'Row {line}: invalid {field} {value!r}')
+        else:
+            row[field] = str(value)
+
+    if 'price' in row and row['price'] is None:
+        raise ValidationError(f'Row {line}: price is required')
+    return row
+
+
+def read_menu_file(path, fmt=None):
+    """Read and validate a CSV or JSON menu file.
+
+    Returns:
+        list: Normalized rows, in file order.
+    """
+    fmt = guess_format(path, fmt)
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            records = list(csv.DictReader(f))
+        else:
+            records = json.load(f)
+            if isinstance(records, dict):
+                records = records.get('items', [])
+
+    rows, seen = [], set()
+    for line, record in enumerate(records, start=1):
+        row = normalize_row(record, line)
+        if row['name'] in seen:
+            raise ValidationError(f'Row {line}: duplicate item {row["name"]!r}')
+        seen.add(row['name'])
+        rows.append(row)
+    return rows
+
+
+def import_menu(rows, dry_run=False):
+    """Upsert menu rows keyed on name in a single transaction.
+
+    Args:
+        rows (list): Rows from :func:`read_menu_file`.
+        dry_run (bool): Compute the diff but roll back instead of committing.
+
+    Returns:
+        dict: ``added`` and ``unchanged`` name lists and ``updated``, a
+        mapping of name to ``{field: (old, new)}``.
+    """
+    diff = {'added': [], 'updated': {}, 'unchanged': []}
+    now = datetime.utcnow()
+    columns = [getattr(MenuItem, field) for field in MENU_FIELDS]
+
+    try:
+        for start in range(0, len(rows), BATCH_SIZE):
+            batch = rows[start:start + BATCH_SIZE]
+            existing = {}
+            # Lowest id wins if the table already holds duplicate names
+            for item in db.session.execute(
+                select(MenuItem.id, *columns)
+                .where(MenuItem.name.in_([row['name'] for row in batch]))
+                .order_by(MenuItem.id.desc())
+            ).mappings():
+                existing[item['name']] = item
+
+            inserts, updates = [], []
+            for row in batch:
+                current = existing.get(row['name'])
+                if current is None:
+                    if row.get('price') is None:
+                        raise ValidationError(f'New item {row["name"]!r} needs a price')
+                    inserts.append(dict(row, created_at=now, updated_at=now))
+                    diff['added'].append(row['name'])
+                    continue
+                changes = {
+                    field: (current[field], value) for field, value in row.items()
+                    if current[field] != value
+                }
+                if changes:
+                    updates.append(dict(row, id=current['id'], updated_at=now))
+                    diff['updated'][row['name']] = changes
+                else:
+                    diff['unchanged'].append(row['name'])
+
+            if inserts:
+                db.session.execute(insert(MenuItem.__table__), inserts)
+            if updates:
+                db.session.execute(update(MenuItem), updates)
+
+        if dry_run:
+            db.session.rollback()
+        else:
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    # Bulk statements bypass the ORM change events, so bump once here
+    if not dry_run and (diff['added'] or diff['updated']):
+        bump_menu_version()
+    return diff
+
+
+def _export_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def export_menu(path, fmt=None):
+    """Write every menu item to a CSV or JSON file.
+
+    Returns:
+        int: The number of items exported.
+    """
+    fmt = guess_format(path, fmt)
+    columns = [getattr(MenuItem, field) for field in MENU_FIELDS]
+    result = db.session.execute(
+        select(*columns).order_by(MenuItem.category, MenuItem.name)
+        .execution_options(yield_per=BATCH_SIZE)
+    ).mappings()
+
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            writer = csv.DictWriter(f, fieldnames=MENU_FIELDS)
+            writer.writeheader()
+            for row in result:
+                writer.writerow({k: _export_value(v) for k, v in row.items()})
+                count += 1
+        else:
+            f.write('[')
+            for row in result:
+                f.write(',\n' if count else '\n')
+                json.dump({k: _export_value(v) for k, v in row.items()}, f)
+                count += 1
+            f.write('\n]\n')
+    return count
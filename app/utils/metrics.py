@@ -0,0 +1,322 @@
+"""
+Prometheus metrics for the Café application.
+
+Exposes ``/metrics`` in the Prometheus text format with:
+
+* request latency histograms per blueprint and endpoint (plus DB time from
+  :mod:`app.utils.sql_stats`) and rate-limit rejections,
+* SQLAlchemy connection pool gauges and checkout wait times,
+* Flask-Caching hit/miss counters, and per-fragment hit/miss counters for
+  ``{% cache %}`` template blocks,
+* order-creation counters,
+* per-worker RSS, request count and GC statistics, to tune ``max_requests``,
+* log queue depth and dropped log records,
+* page micro-cache hits and misses (hits never reach Flask, so they are not
+  in the request histograms),
+* admission control pressure and requests shed per priority class.
+
+Under gunicorn every worker is a separate process, so values are kept in
+per-process files in ``PROMETHEUS_MULTIPROC_DIR`` (set up by
+``gunicorn_config.py``) and summed when scraped. Without that variable the
+metrics live in the process registry, e.g. for ``flask run``.
+
+Scrapes must send ``Authorization: Bearer <METRICS_TOKEN>`` when a token is
+set. With ``METRICS_REQUIRE_TOKEN`` (production) and no token, ``/metrics``
+is not registered at all.
+"""
+import gc
+import hmac
+import os
+import time
+import tracemalloc
+from flask import Response, abort, current_app, g, request, request_finished, request_started
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+    generate_latest, multiprocess
+)
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.pool import Pool
+from ..models.base import db
+from ..models.order import Order
+from .admission import get_admission_stats
+from .memory import get_rss
+from .page_cache import get_page_cache_stats
+from .sql_stats import get_query_stats
+from .structured_logging import get_log_stats
+
+REQUEST_LATENCY = Histogram(
+    'cafe_request_duration_seconds', 'Request latency',
+    ['blueprint', 'endpoint', 'method', 'status']
+)
+REQUEST_DB_TIME = Histogram(
+    'cafe_request_db_seconds', 'Time spent in the database per request',
+    ['blueprint', 'endpoint'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, float('inf'))
+)
+RATE_LIMITED = Counter(
+    'cafe_rate_limited_total', 'Requests rejected by the rate limiter', ['endpoint']
+)
+POOL_CHECKED_OUT = Gauge(
+    'cafe_db_pool_checked_out', 'Connections currently checked out of the pool',
+    multiprocess_mode='livesum'
+)
+POOL_OPEN = Gauge(
+    'cafe_db_pool_connections', 'Open DB connections held by the pool',
+    multiprocess_mode='livesum'
+)
+POOL_CHECKOUT_WAIT = Histogram(
+    'cafe_db_pool_checkout_seconds',
+    'Time to get a connection from the pool, including waiting for a free one',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30,
+             float('inf'))
+)
+POOL_INVALIDATED = Counter(
+    'cafe_db_pool_invalidated_total', 'Connections invalidated (e.g. after disconnects)'
+)
+CACHE_REQUESTS = Counter(
+    'cafe_cache_requests_total', 'Flask-Caching lookups', ['result']
+)
+FRAGMENT_CACHE_REQUESTS = Counter(
+    'cafe_fragment_cache_requests_total', 'Template fragment cache lookups', ['fragment', 'result']
+)
+ORDERS_CREATED = Counter(
+    'cafe_orders_created_total', 'Orders created', ['order_type']
+)
+# Per-worker gauges (labelled by pid in multiprocess mode)
+WORKER_RSS = Gauge(
+    'cafe_worker_rss_bytes', 'Resident set size of the worker', multiprocess_mode='liveall'
+)
+WORKER_REQUESTS = Gauge(
+    'cafe_worker_requests', 'Requests handled since the worker started', multiprocess_mode='liveall'
+)
+WORKER_TRACED = Gauge(
+    'cafe_worker_tracemalloc_bytes', 'Memory traced by tracemalloc (0 when not tracing)',
+    multiprocess_mode='liveall'
+)
+GC_COLLECTIONS = Gauge(
+    'cafe_gc_collections', 'Garbage collections since the worker started',
+    ['generation'], multiprocess_mode='liveall'
+)
+GC_COLLECTED = Gauge(
+    'cafe_gc_collected_objects', 'Objects freed by the garbage collector',
+    ['generation'], multiprocess_mode='liveall'
+)
+GC_UNCOLLECTABLE = Gauge(
+    'cafe_gc_uncollectable_objects', 'Objects the garbage collector could not free',
+    ['generation'], multiprocess_mode='liveall'
+)
+LOG_QUEUED = Gauge(
+    'cafe_log_queue_depth', 'Log records waiting for the writer thread', multiprocess_mode='liveall'
+)
+LOG_DROPPED = Gauge(
+    'cafe_log_records_dropped', 'Log records dropped because the queue was full',
+    multiprocess_mode='liveall'
+)
+PAGE_CACHE_REQUESTS = Gauge(
+    'cafe_page_cache_requests', 'Page micro-cache lookups since the worker started',
+    ['result'], multiprocess_mode='liveall'
+)
+PAGE_CACHE_ENTRIES = Gauge(
+    'cafe_page_cache_entries', 'Pages held in the micro-cache', multiprocess_mode='liveall'
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    'cafe_admission_in_flight', 'Requests in flight in the worker', multiprocess_mode='liveall'
+)
+ADMISSION_PRESSURE = Gauge(
+    'cafe_admission_pressure', 'Worker load relative to the admission limits (1 = full)',
+    multiprocess_mode='liveall'
+)
+ADMISSION_SHED = Gauge(
+    'cafe_admission_shed_requests', 'Requests rejected with 503 since the worker started',
+    ['priority'], multiprocess_mode='liveall'
+)
+_process_metrics = {'updated_at': 0.0}
+
+
+def update_process_metrics():
+    """Refresh this worker's RSS, GC, log queue, page cache and admission gauges."""
+    WORKER_RSS.set(get_rss())
+    WORKER_TRACED.set(tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0)
+    for generation, stats in enumerate(gc.get_stats()):
+        GC_COLLECTIONS.labels(generation).set(stats['collections'])
+        GC_COLLECTED.labels(generation).set(stats['collected'])
+        GC_UNCOLLECTABLE.labels(generation).set(stats['uncollectable'])
+    log_stats = get_log_stats()
+    if log_stats is not None:
+        LOG_QUEUED.set(log_stats['queued'])
+        LOG_DROPPED.set(log_stats['dropped'])
+    page_stats = get_page_cache_stats()
+    if page_stats is not None:
+        PAGE_CACHE_REQUESTS.labels('hit').set(page_stats['hits'])
+        PAGE_CACHE_REQUESTS.labels('miss').set(page_stats['misses'])
+        PAGE_CACHE_ENTRIES.set(page_stats['entries'])
+    admission_stats = get_admission_stats()
+    if admission_stats is not None:
+        ADMISSION_IN_FLIGHT.set(admission_stats['in_flight'])
+        ADMISSION_PRESSURE.set(admission_stats['pressure'])
+        for priority, shed in admission_stats['shed'].items():
+            ADMISSION_SHED.labels(priority).set(shed)
+    _process_metrics['updated_at'] = time.monotonic()
+
+
+def _labels():
+    return request.blueprint or '', request.endpoint or 'unmatched'
+
+
+def _start_timer(sender, **extra):
+    g._metrics_start = time.perf_counter()
+
+
+def _observe_request(sender, response, **extra):
+    started = g.get('_metrics_start')
+    if started is None:
+        return
+    blueprint, endpoint = _labels()
+    REQUEST_LATENCY.labels(blueprint, endpoint, request.method, response.status_code)\
+                   .observe(time.perf_counter() - started)
+
+    stats = get_query_stats()
+    if stats is not None:
+        REQUEST_DB_TIME.labels(blueprint, endpoint).observe(stats.duration)
+    if response.status_code == 429:
+        RATE_LIMITED.labels(endpoint).inc()
+
+    WORKER_REQUESTS.inc()
+    interval = current_app.config.get('METRICS_PROCESS_INTERVAL', 10)
+    if time.monotonic() - _process_metrics['updated_at'] >= interval:
+        update_process_metrics()
+
+
+@event.listens_for(Pool, 'connect')
+def _pool_connect(dbapi_connection, connection_record):
+    POOL_OPEN.inc()
+
+
+@event.listens_for(Pool, 'close')
+def _pool_close(dbapi_connection, connection_record):
+    POOL_OPEN.dec()
+
+
+@event.listens_for(Pool, 'checkout')
+def _pool_checkout(dbapi_connection, connection_record, connection_proxy):
+    POOL_CHECKED_OUT.inc()
+
+
+@event.listens_for(Pool, 'checkin')
+def _pool_checkin(dbapi_connection, connection_record):
+    POOL_CHECKED_OUT.dec()
+
+
+@event.listens_for(Pool, 'invalidate')
+def _pool_invalidate(dbapi_connection, connection_record, exception):
+    POOL_INVALIDATED.inc()
+
+
+def instrument_pool(engine):
+    """Time connection checkouts from ``engine``'s pool."""
+    pool = engine.pool
+    connect = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+
+    pool.connect = timed_connect
+
+
+def _instrument_engine(engine):
+    instrument_pool(engine)
+
+    # dispose() (e.g. before forking workers) replaces the pool
+    @event.listens_for(engine, 'engine_disposed')
+    def _pool_replaced(engine):
+        instrument_pool(engine)
+
+
+# Orders are counted once their transaction commits
+@event.listens_for(Order, 'after_insert')
+def _order_inserted(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('orders_created', []).append(target.order_type or 'unknown')
+
+
+@event.listens_for(Session, 'after_commit')
+def _count_orders(session):
+    for order_type in session.info.pop('orders_created', ()):
+        ORDERS_CREATED.labels(order_type).inc()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_orders(session):
+    session.info.pop('orders_created', None)
+
+
+def instrument_cache(backend):
+    """Count hits and misses on a Flask-Caching backend instance."""
+    get, get_many = backend.get, backend.get_many
+
+    def counted_get(*args, **kwargs):
+        value = get(*args, **kwargs)
+        CACHE_REQUESTS.labels('miss' if value is None else 'hit').inc()
+        return value
+
+    def counted_get_many(*args, **kwargs):
+        values = get_many(*args, **kwargs)
+        misses = sum(1 for value in values if value is None)
+        CACHE_REQUESTS.labels('miss').inc(misses)
+        CACHE_REQUESTS.labels('hit').inc(len(values) - misses)
+        return values
+
+    backend.get, backend.get_many = counted_get, counted_get_many
+
+
+def generate_metrics():
+    """Render all metrics, merged across workers in multiprocess mode."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+def metrics():
+    """Prometheus scrape endpoint."""
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(supplied.encode(), token.encode()):
+            abort(401)
+    update_process_metrics()
+    return Response(generate_metrics(), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app, cache=None):
+    """Register the request signals, cache and pool instrumentation and ``/metrics`` view.
+
+    Must be called after ``db.init_app(app)`` and ``cache.init_app(app)``.
+    """
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    # Signals fire around the before/after_request hooks, so requests
+    # rejected by the rate limiter are still timed
+    request_started.connect(_start_timer, app)
+    request_finished.connect(_observe_request, app)
+
+    if cache is not None and cache in app.extensions.get('cache', {}):
+        instrument_cache(app.extensions['cache'][cache])
+
+    with app.app_context():
+        for engine in db.engines.values():
+            _instrument_engine(engine)
+
+    if app.config.get('METRICS_REQUIRE_TOKEN') and not app.config.get('METRICS_TOKEN'):
+        app.logger.warning('METRICS_TOKEN is not set; /metrics is disabled')
+        return
+    app.add_url_rule(app.config.get('METRICS_PATH', '/metrics'), 'metrics', metrics)
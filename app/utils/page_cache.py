@@ -0,0 +1,248 @@
+"""
+WSGI micro-cache for anonymous public pages.
+
+The home page, the menu, menu item pages and the about page render the same
+HTML for every visitor who is not logged in. This middleware sits outside
+everything else (Talisman, Flask-Login, the limiter, compression) and serves
+those pages from worker memory for ``PAGE_CACHE_TTL`` seconds.
+
+Only ``GET`` requests without a session or remember-me cookie are cached, and
+only ``200`` responses that do not set a cookie. Entries are keyed on host,
+scheme, ``X-Forwarded-Proto``, path, query string and the negotiated content
+encoding, so compressed and uncompressed variants are stored separately and
+a plain HTTP request never gets a page cached for HTTPS (Talisman redirects
+it instead). All entries are dropped when the
+shared menu version (see :mod:`app.utils.menu_cache`) changes.
+
+Hits never reach Flask, so the middleware writes their ``cafe.access``
+records (see :mod:`app.utils.structured_logging`) and ``X-Request-ID``.
+
+Every hit gets a fresh CSP nonce in the ``Content-Security-Policy`` header.
+If the page itself used the nonce (``csp_nonce()`` in a template), it is
+replaced in the body too; such pages are only cached uncompressed, since the
+nonce cannot be rewritten inside a compressed body.
+"""
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from flask import request
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import parse_cookie
+from .compression import brotli, negotiate_encoding, with_written
+from .structured_logging import REQUEST_ID_HEADER, get_request_id, log_access
+
+NONCE_USED_KEY = 'cafe.csp_nonce_used'
+_NONCE = re.compile(r"'nonce-([^']+)'")
+# Per-request headers that must not be replayed from the cache
+_UNCACHED_HEADERS = {'x-request-id', 'server-timing', 'set-cookie'}
+
+_middleware = None
+
+
+class CachedPage:
+    """A stored response and the CSP nonce it was rendered with."""
+
+    __slots__ = ('status', 'headers', 'body', 'nonce', 'nonce_in_body', 'expires_at', 'stored_at')
+
+    def __init__(self, status, headers, body, nonce, nonce_in_body, ttl):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.nonce = nonce
+        self.nonce_in_body = nonce_in_body
+        self.stored_at = time.monotonic()
+        self.expires_at = self.stored_at + ttl
+
+
+class PageCacheMiddleware:
+    """Serve cacheable anonymous pages from memory.
+
+    Args:
+        app: The WSGI callable to wrap.
+        flask_app (Flask): The application, used to match endpoints and to
+            read the menu version.
+        endpoints (iterable): Endpoint names whose pages may be cached.
+        ttl (float): Seconds an entry is served for.
+        max_entries (int): Entries kept per worker (least recently used are
+            evicted first).
+    """
+
+    def __init__(self, app, flask_app, endpoints, ttl=5, max_entries=500):
+        self.app = app
+        self.flask_app = flask_app
+        self.endpoints = frozenset(endpoints)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.session_cookies = (flask_app.config.get('SESSION_COOKIE_NAME', 'session'),
+                                flask_app.config.get('REMEMBER_COOKIE_NAME', 'remember_token'))
+        self.entries = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'stored': 0}
+        self._lock = threading.Lock()
+        self._menu_version = None
+        self._checked_at = 0.0
+
+    def __call__(self, environ, start_response):
+        if not self._is_cacheable_request(environ):
+            return self.app(environ, start_response)
+
+        started = time.perf_counter()
+        self._check_menu_version()
+        encoding = negotiate_encoding(environ.get('HTTP_ACCEPT_ENCODING', ''), brotli is not None)
+        key = (environ.get('HTTP_HOST'), environ['wsgi.url_scheme'], environ.get('HTTP_X_FORWARDED_PROTO'),
+               environ.get('PATH_INFO'), environ.get('QUERY_STRING'), encoding)
+
+        page = self._get(key)
+        if page is not None:
+            self.stats['hits'] += 1
+            return self._serve(page, environ, start_response, started)
+
+        self.stats['misses'] += 1
+        return self._fetch(key, environ, start_response)
+
+    def _is_cacheable_request(self, environ):
+        if environ.get('REQUEST_METHOD') != 'GET' or 'HTTP_AUTHORIZATION' in environ:
+            return False
+        if 'HTTP_X_PROFILE_TOKEN' in environ:
+            return False
+        if 'HTTP_COOKIE' in environ:
+            cookies = parse_cookie(environ)
+            if any(name in cookies for name in self.session_cookies):
+                return False
+        try:
+            endpoint, _ = self.flask_app.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            return False
+        return endpoint in self.endpoints
+
+    def _check_menu_version(self):
+        """Drop every entry if the menu changed, checking at most once a second."""
+        now = time.monotonic()
+        if now - self._checked_at < 1:
+            return
+        self._checked_at = now
+        # Imported here: menu_cache needs the app package's cache, and this
+        # module is imported while the package is still initialising
+        from .menu_cache import get_menu_version
+        with self.flask_app.app_context():
+            version = get_menu_version()
+        if version != self._menu_version:
+            self._menu_version = version
+            self.clear()
+
+    def _get(self, key):
+        with self._lock:
+            page = self.entries.get(key)
+            if page is None:
+                return None
+            if page.expires_at <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return page
+
+    def _set(self, key, page):
+        with self._lock:
+            self.entries[key] = page
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        self.stats['stored'] += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    def _fetch(self, key, environ, start_response):
+        captured = []
+        written = []
+
+        def capture_start_response(status, headers, exc_info=None):
+            captured[:] = [status, headers, exc_info]
+            return written.append
+
+        environ[NONCE_USED_KEY] = False
+        body = b''.join(with_written(written, self.app(environ, capture_start_response)))
+        status, headers, exc_info = captured
+
+        page = self._build_page(status, headers, body, environ[NONCE_USED_KEY])
+        if page is not None:
+            self._set(key, page)
+        start_response(status, headers + [('X-Cache', 'MISS')], exc_info)
+        return [body]
+
+    def _build_page(self, status, headers, body, nonce_used):
+        """Return a :class:`CachedPage` for the response, or None if it must not be stored."""
+        if not status.startswith('200'):
+            return None
+        header_map = {name.lower(): value for name, value in headers}
+        if 'set-cookie' in header_map:
+            return None
+        cache_control = header_map.get('cache-control', '')
+        if 'no-store' in cache_control or 'private' in cache_control:
+            return None
+
+        match = _NONCE.search(header_map.get('content-security-policy', ''))
+        nonce = match.group(1) if match else None
+        if nonce_used and nonce and 'content-encoding' in header_map:
+            return None
+
+        stored_headers = [(name, value) for name, value in headers
+                          if name.lower() not in _UNCACHED_HEADERS]
+        return CachedPage(status, stored_headers, body, nonce, nonce_used and nonce is not None, self.ttl)
+
+    def _serve(self, page, environ, start_response, started):
+        headers = list(page.headers)
+        body = page.body
+        if page.nonce:
+            nonce = secrets.token_urlsafe(16)
+            headers = [(name, value.replace(page.nonce, nonce))
+                       if name.lower() in ('content-security-policy', 'x-content-security-policy')
+                       else (name, value) for name, value in headers]
+            if page.nonce_in_body:
+                body = body.replace(page.nonce.encode(), nonce.encode())
+                headers = [(name, str(len(body))) if name.lower() == 'content-length' else (name, value)
+                           for name, value in headers]
+        request_id = get_request_id(environ)
+        headers.append(('X-Cache', 'HIT'))
+        headers.append(('Age', str(int(time.monotonic() - page.stored_at))))
+        headers.append((REQUEST_ID_HEADER, request_id))
+        start_response(page.status, headers)
+        log_access(environ, int(page.status.split(None, 1)[0]), time.perf_counter() - started,
+                   len(body), request_id, cache='hit')
+        return [body]
+
+
+def get_page_cache_stats():
+    """Return this worker's micro-cache counters, or None if it is not installed."""
+    if _middleware is None:
+        return None
+    return dict(_middleware.stats, entries=len(_middleware.entries))
+
+
+def init_page_cache(app):
+    """Install :class:`PageCacheMiddleware` as the outermost WSGI layer.
+
+    Call it after Talisman is set up, so ``csp_nonce()`` can be tracked.
+    """
+    global _middleware
+    if not app.config.get('PAGE_CACHE_ENABLED', True):
+        return
+
+    # Record whether a template put the nonce in the page
+    get_nonce = app.jinja_env.globals.get('csp_nonce')
+    if get_nonce is not None:
+        def csp_nonce():
+            request.environ[NONCE_USED_KEY] = True
+            return get_nonce()
+        app.jinja_env.globals['csp_nonce'] = csp_nonce
+
+    _middleware = PageCacheMiddleware(
+        app.wsgi_app,
+        app,
+        endpoints=app.config.get('PAGE_CACHE_ENDPOINTS', ()),
+        ttl=app.config.get('PAGE_CACHE_TTL', 5),
+        max_entries=app.config.get('PAGE_CACHE_MAX_ENTRIES', 500)
+    )
+    app.wsgi_app = _middleware
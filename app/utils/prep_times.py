@@ -0,0 +1,318 @@
+"""
+Prep time sketches and order ETAs for the Café application.
+
+When an order's status moves to ``ready`` (``Order.update_status``), its prep
+time is added, in the same transaction, to quantile sketches for each of
+its item categories, its order type, the hour of day it was started and the
+kitchen as a whole. Prep time runs from ``prepared_at``, falling back to
+``confirmed_at`` or ``order_date`` when the kitchen skipped a status.
+
+The sketches are log-bucketed histograms (DDSketch): each bucket covers
+values within ``PREP_TIME_SKETCH_ACCURACY`` relative error, so a quantile
+comes from a few hundred counters instead of the order history, and workers
+record an order by incrementing bucket rows. Each worker keeps the sketches
+in memory, reloading them every ``PREP_TIME_REFRESH_INTERVAL`` seconds;
+:func:`estimate_order_eta` combines them with the orders currently queued.
+"""
+import math
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import and_, case, delete, event, func, insert, inspect, select
+from .. import db
+from ..models.menu_item import MenuItem
+from ..models.order import Order, OrderItem
+from ..models.prep_time import PrepTimeBucket
+from .counters import increment_counts
+
+QUEUED_STATUSES = ('pending', 'confirmed')
+# Orders already in these statuses are in the sketches
+RECORDED_STATUSES = ('ready', 'completed')
+# Shorter prep times are counted in the lowest bucket
+MIN_PREP_SECONDS = 1.0
+
+
+class QuantileSketch:
+    """Log-bucketed quantile sketch with relative accuracy ``alpha``.
+
+    A value ``v`` is counted in bucket ``ceil(log(v) / log(gamma))`` with
+    ``gamma = (1 + alpha) / (1 - alpha)``. Quantiles are within ``alpha``
+    relative error of the true value, and sketches merge by adding counts.
+    """
+
+    def __init__(self, alpha=0.02):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.buckets = Counter()
+        self.count = 0
+        self._log_gamma = math.log(self.gamma)
+
+    def __repr__(self):
+        return f'<QuantileSketch n={self.count} alpha={self.alpha}>'
+
+    def bucket(self, value):
+        """Return the bucket index ``value`` is counted in."""
+        return math.ceil(math.log(max(value, MIN_PREP_SECONDS)) / self._log_gamma)
+
+    def add(self, value, count=1):
+        self.add_bucket(self.bucket(value), count)
+
+    def add_bucket(self, bucket, count):
+        self.buckets[bucket] += count
+        self.count += count
+
+    def merge(self, other):
+        for bucket, count in other.buckets.items():
+            self.add_bucket(bucket, count)
+
+    def quantile(self, q):
+        """Return the estimated ``q`` quantile (0-1), or None if empty."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen > rank:
+                return 2 * self.gamma ** bucket / (self.gamma + 1)
+
+
+def _sketch_accuracy():
+    if has_app_context():
+        return current_app.config.get('PREP_TIME_SKETCH_ACCURACY', 0.02)
+    return 0.02
+
+
+def prep_started_at(order):
+    """Return when the kitchen started on ``order``."""
+    return order.prepared_at or order.confirmed_at or order.order_date
+
+
+def sketch_keys(order_type, categories, started):
+    """Return the ``(dimension, key)`` of every sketch an order counts in."""
+    keys = [('all', ''), ('order_type', order_type or 'dine_in'), ('hour', str(started.hour))]
+    keys += [('category', category) for category in categories if category]
+    return keys
+
+
+def _bucket_rows(counts):
+    now = datetime.utcnow()
+    return [
+        {'dimension': dimension, 'key': key, 'bucket': bucket, 'count': count,
+         'created_at': now, 'updated_at': now}
+        for (dimension, key, bucket), count in counts.items()
+    ]
+
+
+def _order_categories(order_id, connection=None):
+    query = (select(MenuItem.category)
+             .join(OrderItem, OrderItem.menu_item_id == MenuItem.id)
+             .where(OrderItem.order_id == order_id)
+             .distinct())
+    result = connection.execute(query) if connection is not None else db.session.execute(query)
+    return [category for category in result.scalars() if category]
+
+
+# Record prep times in the transaction that marks the order ready
+@event.listens_for(Order, 'after_update')
+def _record_prep_time(mapper, connection, target):
+    state = inspect(target)
+    if target.ready_at is None or not state.attrs.ready_at.history.added:
+        return
+    # Marked ready again: Order.status keeps its previous value (active_history)
+    if any(status in RECORDED_STATUSES for status in state.attrs.status.history.non_added()):
+        return
+    started = prep_started_at(target)
+    if started is None or target.ready_at < started:
+        return
+
+    bucket = QuantileSketch(_sketch_accuracy()).bucket((target.ready_at - started).total_seconds())
+    keys = sketch_keys(target.order_type, _order_categories(target.id, connection), started)
+    rows = _bucket_rows(Counter((dimension, key, bucket) for dimension, key in keys))
+    increment_counts(connection, PrepTimeBucket.__table__, ['dimension', 'key', 'bucket'], rows, 'count')
+
+
+def load_prep_time_sketches():
+    """Load every sketch from the database.
+
+    Returns:
+        dict: ``(dimension, key)`` -> :class:`QuantileSketch`.
+    """
+    alpha = _sketch_accuracy()
+    sketches = {}
+    rows = db.session.execute(
+        select(PrepTimeBucket.dimension, PrepTimeBucket.key, PrepTimeBucket.bucket, PrepTimeBucket.count)
+    )
+    for dimension, key, bucket, count in rows:
+        sketch = sketches.get((dimension, key))
+        if sketch is None:
+            sketch = sketches[(dimension, key)] = QuantileSketch(alpha)
+        sketch.add_bucket(bucket, count)
+    return sketches
+
+
+def get_prep_time_sketches():
+    """Return the app's sketches, reloading them when stale."""
+    app = current_app._get_current_object()
+    loaded = app.extensions.get('prep_time_sketches')
+    interval = app.config.get('PREP_TIME_REFRESH_INTERVAL', 60)
+    if loaded is None or time.monotonic() - loaded[0] >= interval:
+        loaded = (time.monotonic(), load_prep_time_sketches())
+        app.extensions['prep_time_sketches'] = loaded
+    return loaded[1]
+
+
+def _quantile(dimension, key, q):
+    """Return the ``q`` quantile of a sketch with enough samples, or None."""
+    sketch = get_prep_time_sketches().get((dimension, key))
+    if sketch is None or sketch.count < current_app.config.get('ETA_MIN_SAMPLES', 20):
+        return None
+    return sketch.quantile(q)
+
+
+def typical_prep_seconds(q=0.5):
+    """Return the ``q`` quantile of prep time over all orders."""
+    value = _quantile('all', '', q)
+    if value is None:
+        value = current_app.config.get('ETA_DEFAULT_PREP_MINUTES', 10) * 60
+    return value
+
+
+def estimate_prep_seconds(order_type, categories, hour, q=0.5):
+    """Estimate the ``q`` quantile of an order's prep time.
+
+    Averages the estimates of the order type, the hour of day and the
+    slowest of the order's categories, using only sketches with at least
+    ``ETA_MIN_SAMPLES`` orders.
+    """
+    estimates = []
+    by_category = [value for value in (_quantile('category', category, q) for category in categories)
+                   if value is not None]
+    if by_category:
+        estimates.append(max(by_category))
+    for dimension, key in (('order_type', order_type or 'dine_in'), ('hour', str(hour))):
+        value = _quantile(dimension, key, q)
+        if value is not None:
+            estimates.append(value)
+    if not estimates:
+        return typical_prep_seconds(q)
+    return sum(estimates) / len(estimates)
+
+
+def get_kitchen_queue(order):
+    """Return ``(orders queued ahead of order, orders being prepared)``.
+
+    Counts only active orders, through the ``(status, order_date)`` index.
+    """
+    ahead, preparing = db.session.execute(
+        select(
+            func.coalesce(func.sum(case((and_(Order.status.in_(QUEUED_STATUSES),
+                                              Order.order_date < order.order_date), 1), else_=0)), 0),
+            func.coalesce(func.sum(case((Order.status == 'preparing', 1), else_=0)), 0)
+        ).where(Order.status.in_(QUEUED_STATUSES + ('preparing',)))
+    ).one()
+    return int(ahead), int(preparing)
+
+
+def estimate_order_eta(order, now=None):
+    """Estimate when ``order`` will be ready.
+
+    A queued order waits for the orders ahead of it and those being prepared
+    (half done on average), shared among ``ETA_KITCHEN_CAPACITY`` parallel
+    orders at the typical prep time, then for its own prep time. An order
+    being prepared only waits for the rest of its prep time.
+
+    Returns:
+        dict: The median (``eta_seconds``) and 90th percentile
+        (``eta_p90_seconds``) of the time left, the estimated ready time and
+        the queue seen by the order. ETAs are None for cancelled orders.
+    """
+    now = now or datetime.utcnow()
+    eta = {
+        'order_id': order.id,
+        'status': order.status,
+        'orders_ahead': 0,
+        'orders_preparing': 0,
+        'eta_seconds': None,
+        'eta_p90_seconds': None,
+        'estimated_ready_at': None
+    }
+    if order.status == 'cancelled':
+        return eta
+    if order.status in ('ready', 'completed'):
+        ready_at = order.ready_at or order.completed_at
+        eta.update(eta_seconds=0, eta_p90_seconds=0,
+                   estimated_ready_at=ready_at.isoformat() if ready_at else None)
+        return eta
+
+    categories = _order_categories(order.id)
+    if order.status == 'preparing':
+        started = order.prepared_at or now
+        wait = 0.0
+    else:
+        started = now
+        ahead, preparing = get_kitchen_queue(order)
+        eta.update(orders_ahead=ahead, orders_preparing=preparing)
+        capacity = max(current_app.config.get('ETA_KITCHEN_CAPACITY', 3), 1)
+        wait = (ahead + preparing / 2) / capacity * typical_prep_seconds()
+
+    elapsed = max((now - started).total_seconds(), 0.0)
+    median = wait + estimate_prep_seconds(order.order_type, categories, started.hour, 0.5) - elapsed
+    p90 = wait + estimate_prep_seconds(order.order_type, categories, started.hour, 0.9) - elapsed
+    median = max(median, 0.0)
+    eta.update(
+        eta_seconds=round(median),
+        eta_p90_seconds=round(max(p90, median)),
+        estimated_ready_at=(now + timedelta(seconds=median)).isoformat()
+    )
+    return eta
+
+
+def rebuild_prep_time_sketches(chunk_size=5000):
+    """Recompute every sketch from the orders that have been ready.
+
+    Returns:
+        int: The number of orders counted.
+    """
+    alpha = _sketch_accuracy()
+    sketch = QuantileSketch(alpha)
+    counts = Counter()
+    result = db.session.execute(
+        select(Order.id, Order.order_type, Order.order_date, Order.confirmed_at, Order.prepared_at,
+               Order.ready_at, MenuItem.category)
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .outerjoin(MenuItem, MenuItem.id == OrderItem.menu_item_id)
+        .where(Order.ready_at.isnot(None))
+        .order_by(Order.id)
+        .execution_options(yield_per=chunk_size)
+    )
+
+    orders = 0
+    current, categories = None, set()
+
+    def count(row):
+        started = prep_started_at(row)
+        if started is None or row.ready_at < started:
+            return 0
+        bucket = sketch.bucket((row.ready_at - started).total_seconds())
+        for dimension, key in sketch_keys(row.order_type, categories, started):
+            counts[(dimension, key, bucket)] += 1
+        return 1
+
+    for row in result:
+        if current is not None and row.id != current.id:
+            orders += count(current)
+            categories = set()
+        current = row
+        categories.add(row.category)
+    if current is not None:
+        orders += count(current)
+
+    db.session.execute(delete(PrepTimeBucket))
+    rows = _bucket_rows(counts)
+    if rows:
+        db.session.execute(insert(PrepTimeBucket.__table__), rows)
+    db.session.commit()
+    current_app.extensions.pop('prep_time_sketches', None)
+    return orders
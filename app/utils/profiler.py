@@ -0,0 +1,264 @@
+"""
+On-demand request profiling for the Café application.
+
+Profiling is off by default and is turned on for selected requests in one of
+two ways:
+
+* a time-boxed switch set by an admin (``POST /admin/profiling``), shared
+  with every worker through the app cache, optionally limited to some
+  endpoints and a sample of their requests;
+* a signed ``X-Profile-Token`` header (tokens are issued to admins by
+  ``POST /admin/profiling/token`` and expire), for profiling one client's
+  requests without touching anyone else's.
+
+The default profiler samples the request thread's stack from a background
+thread every ``PROFILER_INTERVAL`` seconds and writes collapsed stacks
+(``flamegraph.pl`` / speedscope format). ``mode='cprofile'`` uses cProfile
+and writes a pstats file instead; it is exact but much slower. Profiles are
+stored under ``instance/profiles``.
+"""
+import _thread
+import cProfile
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from flask import current_app, g, request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from .. import cache
+from .gevent_support import unpatched
+
+PROFILING_SWITCH_KEY = 'profiling_switch'
+PROFILE_TOKEN_HEADER = 'X-Profile-Token'
+PROFILE_MODES = {'sampling': 'collapsed', 'cprofile': 'pstats'}
+_UNSAFE_FILENAME = re.compile(r'[^A-Za-z0-9_.-]+')
+
+# The sampler must run in a real OS thread even under gevent, or it would
+# never get to run while a request greenlet is busy
+_start_new_thread = unpatched('_thread', 'start_new_thread', _thread.start_new_thread)
+_get_ident = unpatched('_thread', 'get_ident', _thread.get_ident)
+_allocate_lock = unpatched('_thread', 'allocate_lock', _thread.allocate_lock)
+_sleep = unpatched('time', 'sleep', time.sleep)
+
+
+class SamplingProfiler:
+    """Statistical profiler for a single thread.
+
+    Under gevent, samples show whatever greenlet is running on the worker
+    thread, so concurrent requests can appear in each other's profiles.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._running = False
+        self._thread_id = None
+        self._finished = _allocate_lock()
+
+    def start(self):
+        self._thread_id = _get_ident()
+        self._running = True
+        self._finished.acquire()
+        _start_new_thread(self._run, ())
+
+    def stop(self):
+        """Stop sampling and wait for the sampler thread to exit."""
+        self._running = False
+        self._finished.acquire()
+        self._finished.release()
+
+    def _run(self):
+        try:
+            while self._running:
+                frame = sys._current_frames().get(self._thread_id)
+                if frame is not None:
+                    self.stacks[self._collapse(frame)] += 1
+                    self.samples += 1
+                _sleep(self.interval)
+        finally:
+            self._finished.release()
+
+    @staticmethod
+    def _collapse(frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})')
+            frame = frame.f_back
+        return ';'.join(reversed(stack))
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+class CProfileProfiler:
+    """Deterministic profiler (cProfile) writing a pstats file."""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def dump(self, path):
+        self.profile.dump_stats(path)
+
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='request-profiling')
+
+
+def generate_profile_token(mode='sampling'):
+    """Return a signed token that enables profiling for requests that send it."""
+    return _serializer().dumps({'mode': mode})
+
+
+def verify_profile_token(token):
+    """Return the profiling mode encoded in a valid token, or None."""
+    try:
+        data = _serializer().loads(token, max_age=current_app.config.get('PROFILER_TOKEN_MAX_AGE', 3600))
+    except BadSignature:
+        return None
+    return data.get('mode')
+
+
+def enable_profiling(seconds, endpoints=None, sample=1.0, mode='sampling'):
+    """Profile matching requests in every worker for the next ``seconds``.
+
+    Args:
+        seconds (int): How long the switch stays on (capped at
+            ``PROFILER_MAX_DURATION``).
+        endpoints (list): Endpoint names to profile, e.g. ``['main.menu']``.
+            Empty or None profiles every endpoint.
+        sample (float): Fraction of matching requests to profile.
+        mode (str): ``'sampling'`` or ``'cprofile'``.
+
+    Returns:
+        dict: The switch that was stored.
+    """
+    seconds = min(seconds, current_app.config.get('PROFILER_MAX_DURATION', 600))
+    switch = {
+        'until': time.time() + seconds,
+        'endpoints': list(endpoints or []),
+        'sample': max(0.0, min(1.0, sample)),
+        'mode': mode
+    }
+    cache.set(PROFILING_SWITCH_KEY, switch, timeout=seconds)
+    current_app.extensions.pop('profiling_switch', None)
+    return switch
+
+
+def disable_profiling():
+    """Turn the time-boxed switch off in every worker."""
+    cache.delete(PROFILING_SWITCH_KEY)
+    current_app.extensions.pop('profiling_switch', None)
+
+
+def get_profiling_switch():
+    """Return the active switch, re-reading the shared cache at most once a second."""
+    app = current_app._get_current_object()
+    checked_at, switch = app.extensions.get('profiling_switch', (0, None))
+    now = time.monotonic()
+    if now - checked_at >= 1:
+        switch = cache.get(PROFILING_SWITCH_KEY)
+        app.extensions['profiling_switch'] = (now, switch)
+    if switch and switch['until'] > time.time():
+        return switch
+    return None
+
+
+def _requested_mode():
+    """Return the profiling mode for the current request, or None to skip it."""
+    token = request.headers.get(PROFILE_TOKEN_HEADER)
+    if token:
+        return verify_profile_token(token)
+
+    switch = get_profiling_switch()
+    if switch is None:
+        return None
+    if switch['endpoints'] and request.endpoint not in switch['endpoints']:
+        return None
+    if random.random() >= switch['sample']:
+        return None
+    return switch['mode']
+
+
+def get_profile_dir(app=None):
+    app = app or current_app
+    return app.config.get('PROFILER_DIR') or os.path.join(app.instance_path, 'profiles')
+
+
+def list_profiles(limit=None):
+    """Return saved profiles, newest first, as dicts of name, size and time."""
+    directory = get_profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.rsplit('.', 1)[-1] in PROFILE_MODES.values():
+            stat = entry.stat()
+            profiles.append({
+                'name': entry.name,
+                'size': stat.st_size,
+                'created_at': datetime.utcfromtimestamp(stat.st_mtime).isoformat()
+            })
+    profiles.sort(key=lambda profile: profile['created_at'], reverse=True)
+    return profiles[:limit] if limit else profiles
+
+
+def _prune_profiles(keep):
+    for profile in list_profiles()[keep:]:
+        try:
+            os.remove(os.path.join(get_profile_dir(), profile['name']))
+        except OSError:
+            pass
+
+
+def _start_profile():
+    mode = _requested_mode()
+    if mode not in PROFILE_MODES:
+        return
+    if mode == 'cprofile':
+        profiler = CProfileProfiler()
+    else:
+        profiler = SamplingProfiler(current_app.config.get('PROFILER_INTERVAL', 0.005))
+    g._profiler = (mode, profiler, time.perf_counter())
+    profiler.start()
+
+
+def _save_profile(exc=None):
+    started = g.pop('_profiler', None)
+    if started is None:
+        return
+    mode, profiler, started_at = started
+    profiler.stop()
+    duration_ms = (time.perf_counter() - started_at) * 1000
+
+    directory = get_profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    endpoint = _UNSAFE_FILENAME.sub('_', request.endpoint or 'unmatched')
+    name = (f'{datetime.utcnow():%Y%m%dT%H%M%S%f}-{endpoint}-{duration_ms:.0f}ms'
+            f'-{os.getpid()}.{PROFILE_MODES[mode]}')
+    try:
+        profiler.dump(os.path.join(directory, name))
+        _prune_profiles(current_app.config.get('PROFILER_KEEP', 50))
+    except OSError as e:
+        current_app.logger.warning(f'Could not save profile {name}: {e}')
+
+
+def init_profiler(app):
+    """Register the request hooks that start and save profiles."""
+    if not app.config.get('PROFILER_ENABLED', True):
+        return
+    app.before_request(_start_profile)
+    # Teardown also runs when the view raised
+    app.teardown_request(_save_profile)
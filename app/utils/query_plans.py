@@ -0,0 +1,65 @@
+"""
+Query-plan regression checks for the Café application.
+
+Runs ``EXPLAIN QUERY PLAN`` for the hot query shapes of the menu and order
+routes and reports any that fall back to a full table scan or sort through a
+temporary B-tree. Used by ``manage.py check-query-plans``.
+"""
+from sqlalchemy import select
+from ..models.menu_item import MenuItem
+from ..models.order import Order
+
+# Route -> statement with the same filters and ordering as the route's query
+HOT_QUERIES = {
+    'main.menu': lambda: select(MenuItem).filter_by(
+        category='Coffee', is_available=True
+    ).order_by(MenuItem.name),
+    'menu snapshot': lambda: select(MenuItem).filter_by(
+        is_available=True
+    ).order_by(MenuItem.category, MenuItem.name),
+    'main.my_orders': lambda: select(Order).filter_by(
+        user_id=1
+    ).order_by(Order.order_date.desc()).limit(10),
+    'Order.get_orders_by_status': lambda: select(Order).filter_by(
+        status='pending'
+    ).order_by(Order.order_date.desc()),
+}
+
+
+def explain(connection, statement):
+    """Return the ``EXPLAIN QUERY PLAN`` detail lines for ``statement`` (SQLite)."""
+    sql = str(statement.compile(
+        dialect=connection.dialect,
+        compile_kwargs={'literal_binds': True}
+    ))
+    rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}').fetchall()
+    return [row[-1] for row in rows]
+
+
+def plan_problems(details):
+    """Return the plan steps that scan a whole table or sort in a temp B-tree."""
+    problems = []
+    for detail in details:
+        if 'USE TEMP B-TREE' in detail:
+            problems.append(detail)
+        elif detail.startswith('SCAN ') and ' INDEX ' not in f'{detail} ':
+            problems.append(detail)
+    return problems
+
+
+def check_query_plans(engine, queries=None):
+    """Explain every hot query against ``engine``.
+
+    Returns:
+        dict: ``{name: (plan_details, problems)}`` for each query, or None
+        if the database is not SQLite (the only plan format understood).
+    """
+    if engine.dialect.name != 'sqlite':
+        return None
+
+    results = {}
+    with engine.connect() as connection:
+        for name, build in (queries or HOT_QUERIES).items():
+            details = explain(connection, build())
+            results[name] = (details, plan_problems(details))
+    return results
@@ -0,0 +1,126 @@
+"""
+Per-request SQL instrumentation for the Café application.
+
+Counts the statements each request runs, the time spent in the database and
+how often the same statement shape repeats (the signature of an N+1 query).
+Results go into a ``Server-Timing`` header and the log, and can be turned into
+hard failures in tests with ``SQL_STATS_RAISE``.
+"""
+import re
+import time
+from collections import Counter
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from ..exceptions import QueryBudgetError
+
+_WHITESPACE = re.compile(r'\s+')
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*,?)+\)')
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def statement_shape(statement):
+    """Normalize a SQL statement so repeats with different parameters compare equal."""
+    shape = _WHITESPACE.sub(' ', statement).strip()
+    shape = _LITERAL.sub('?', shape)
+    return _PLACEHOLDER_LIST.sub('(?)', shape)
+
+
+class QueryStats:
+    """Statements executed during a single request."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        self.shapes[statement_shape(statement)] += 1
+
+    @property
+    def most_repeated(self):
+        """Return ``(shape, count)`` of the most repeated statement, or None."""
+        if not self.shapes:
+            return None
+        return self.shapes.most_common(1)[0]
+
+    def server_timing(self):
+        """Format the stats as a ``Server-Timing`` header value."""
+        return f'db;dur={self.duration * 1000:.2f};desc="{self.count} queries"'
+
+    def __repr__(self):
+        return f'<QueryStats {self.count} queries in {self.duration * 1000:.2f}ms>'
+
+
+def get_query_stats():
+    """Return the stats for the current request, or None outside a request."""
+    if not has_request_context():
+        return None
+    return g.get('_query_stats')
+
+
+# The start time lives on the execution context, so a failed statement
+# leaves nothing behind on the (pooled) connection
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = get_query_stats()
+    if stats is None:
+        return
+    started = getattr(context, '_query_start', None)
+    stats.record(statement, time.perf_counter() - started if started is not None else 0.0)
+
+
+def check_query_budget(stats, max_queries=None, max_repeats=None):
+    """Return a list of budget violations for ``stats`` (empty if within budget)."""
+    problems = []
+    if max_queries is not None and stats.count > max_queries:
+        problems.append(f'{stats.count} queries (limit {max_queries})')
+    repeated = stats.most_repeated
+    if max_repeats is not None and repeated and repeated[1] > max_repeats:
+        problems.append(f'statement repeated {repeated[1]} times (limit {max_repeats}): {repeated[0]}')
+    return problems
+
+
+def init_sql_stats(app):
+    """Register the request hooks that collect and report SQL statistics."""
+    if not app.config.get('SQL_STATS_ENABLED', True):
+        return
+
+    @app.before_request
+    def _start_query_stats():
+        g._query_stats = QueryStats()
+
+    @app.after_request
+    def _report_query_stats(response):
+        stats = g.get('_query_stats')
+        if stats is None:
+            return response
+
+        config = current_app.config
+        if config.get('SQL_STATS_SERVER_TIMING', True):
+            response.headers.add('Server-Timing', stats.server_timing())
+
+        problems = check_query_budget(
+            stats,
+            max_queries=config.get('SQL_QUERY_LIMIT'),
+            max_repeats=config.get('SQL_REPEAT_LIMIT')
+        )
+        if problems:
+            message = f'{request.method} {request.path} ({request.endpoint}): ' + '; '.join(problems)
+            if config.get('SQL_STATS_RAISE'):
+                raise QueryBudgetError(message)
+            current_app.logger.warning(f'Query budget exceeded: {message}')
+        else:
+            current_app.logger.debug(
+                f'{request.method} {request.path}: {stats.count} queries, '
+                f'{stats.duration * 1000:.2f}ms in the database'
+            )
+        return response
@@ -0,0 +1,110 @@
+"""
+SQLite tuning for the Café application.
+
+Smaller branches run on SQLite. With the default rollback journal and no busy
+timeout, concurrent workers fail with "database is locked" as soon as a write
+overlaps a read. ``SQLITE_PERFORMANCE_PROFILE`` switches every new connection
+to WAL mode with a busy timeout and larger caches.
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# Applied to each new connection, in this order (journal_mode first so the
+# remaining pragmas run against the WAL database)
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',    # Durable across app crashes; fsync on checkpoint only
+    'busy_timeout': 5000,       # Milliseconds to wait for a lock before failing
+    'mmap_size': 268435456,     # 256MB of memory-mapped reads
+    'cache_size': -65536,       # Negative means KiB, i.e. a 64MB page cache
+    'temp_store': 'MEMORY'
+}
+
+# With WAL, readers never block the writer, so a larger pool is safe
+DEFAULT_SQLITE_ENGINE_OPTIONS = {
+    'pool_size': 10,
+    'max_overflow': 20,
+    'pool_timeout': 10,
+    'pool_pre_ping': False
+}
+
+
+def is_sqlite_uri(uri):
+    """Return True if ``uri`` points at a SQLite database."""
+    return bool(uri) and make_url(uri).get_backend_name() == 'sqlite'
+
+
+def is_memory_uri(uri):
+    """Return True if ``uri`` is an in-memory SQLite database."""
+    database = make_url(uri).database
+    return not database or database == ':memory:'
+
+
+def get_sqlite_pragmas(app):
+    """Return the pragmas for ``app``, or None if the profile is disabled."""
+    profile = app.config.get('SQLITE_PERFORMANCE_PROFILE')
+    if not profile:
+        return None
+    pragmas = dict(DEFAULT_SQLITE_PRAGMAS)
+    if isinstance(profile, dict):
+        pragmas.update(profile)
+    return pragmas
+
+
+def set_sqlite_pragmas(dbapi_connection, pragmas):
+    """Run ``PRAGMA name = value`` for each pragma on a raw sqlite3 connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+    finally:
+        cursor.close()
+
+
+def listen_for_sqlite_connect(engine, pragmas):
+    """Apply ``pragmas`` to every new DBAPI connection made by ``engine``."""
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        set_sqlite_pragmas(dbapi_connection, pragmas)
+    return _on_connect
+
+
+def configure_sqlite_engine(app):
+    """Merge the SQLite pool settings into ``SQLALCHEMY_ENGINE_OPTIONS``.
+
+    Must be called before ``db.init_app(app)``. Explicit engine options in the
+    config take precedence over the defaults; ``connect_args`` are merged key
+    by key, so setting one driver argument keeps the profile's others.
+    """
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI')
+    pragmas = get_sqlite_pragmas(app)
+    if pragmas is None or not is_sqlite_uri(uri) or is_memory_uri(uri):
+        return
+
+    busy_timeout = int(pragmas['busy_timeout'])
+    options = dict(DEFAULT_SQLITE_ENGINE_OPTIONS)
+    options['connect_args'] = {
+        'timeout': busy_timeout / 1000.0,
+        'check_same_thread': False
+    }
+    configured = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    options['connect_args'].update(configured.pop('connect_args', None) or {})
+    options.update(configured)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def init_sqlite_profile(app, db):
+    """Register the pragma hook on the app's SQLite engines, if enabled.
+
+    Covers the primary and any SQLite binds (such as local read replicas).
+    Must be called after ``db.init_app(app)``.
+    """
+    pragmas = get_sqlite_pragmas(app)
+    if pragmas is None:
+        return
+
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        if engine.dialect.name == 'sqlite':
+            listen_for_sqlite_connect(engine, pragmas)
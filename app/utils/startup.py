@@ -0,0 +1,170 @@
+"""
+Startup helpers for the Café application.
+
+Keeps ``create_app`` cheap for CLI commands and worker restarts: optional
+extensions are imported only when they are first needed, and the schema is
+only introspected when the database is not at the latest Alembic revision.
+"""
+import importlib
+import os
+from flask import current_app
+
+
+class LazyExtension:
+    """Import and instantiate an optional Flask extension on first use.
+
+    Args:
+        module (str): Module that provides the extension class.
+        attr (str): Name of the extension class in that module.
+        deferred (bool): If True, ``init_app`` only records the app and the
+            extension is imported and initialized the first time one of its
+            attributes is used (e.g. ``mail.send``). Only suitable for
+            extensions that do not register request hooks or blueprints.
+    """
+
+    def __init__(self, module, attr, deferred=False):
+        self._module = module
+        self._attr = attr
+        self._deferred = deferred
+        self._instance = None
+        self._pending_apps = []
+
+    @property
+    def loaded(self):
+        """Whether the underlying extension has been imported."""
+        return self._instance is not None
+
+    def _load(self):
+        if self._instance is None:
+            extension_class = getattr(importlib.import_module(self._module), self._attr)
+            self._instance = extension_class()
+        return self._instance
+
+    def init_app(self, app):
+        """Initialize the extension for ``app`` now, or on first use if deferred."""
+        if self._deferred:
+            self._pending_apps.append(app)
+        else:
+            self._load().init_app(app)
+
+    def __getattr__(self, name):
+        instance = self._load()
+        while self._pending_apps:
+            instance.init_app(self._pending_apps.pop())
+        return getattr(instance, name)
+
+    def __repr__(self):
+        state = 'loaded' if self.loaded else 'not loaded'
+        return f'<LazyExtension {self._module}.{self._attr} ({state})>'
+
+
+def _migrations_config(app):
+    from alembic.config import Config as AlembicConfig
+
+    directory = app.extensions['migrate'].directory
+    alembic_config = AlembicConfig(os.path.join(directory, 'alembic.ini'))
+    alembic_config.set_main_option('script_location', directory)
+    return alembic_config
+
+
+def get_schema_revisions(app=None):
+    """Return the database's Alembic revision and the latest migration head.
+
+    Returns:
+        tuple: ``(current_revision, head_revision)``; either may be None.
+    """
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+    from .. import db
+
+    app = app or current_app._get_current_object()
+    head = ScriptDirectory.from_config(_migrations_config(app)).get_current_head()
+    with app.app_context():
+        with db.engine.connect() as connection:
+            current = MigrationContext.configure(connection).get_current_revision()
+    return current, head
+
+
+# Revision whose upgrade creates the original users/menu/orders tables
+BASELINE_REVISION = 'c61209002771'
+
+
+def upgrade_schema(app):
+    """Bring the database schema to the latest Alembic revision.
+
+    An empty database gets every table from ``db.create_all()`` and is
+    stamped with the head revision. A database created before migrations were
+    tracked (tables but no ``alembic_version``) is first stamped with the
+    baseline revision, the equivalent of ``flask db stamp c61209002771``, so
+    the upgrade only adds what is missing instead of recreating its tables.
+    """
+    from flask_migrate import stamp, upgrade
+    from sqlalchemy import inspect
+    from .. import db
+
+    current, head = get_schema_revisions(app)
+    if head is not None and current == head:
+        return
+
+    with app.app_context():
+        tables = set(inspect(db.engine).get_table_names()) - {'alembic_version'}
+        directory = app.extensions['migrate'].directory
+        if not tables:
+            app.logger.info('Empty database; creating tables and stamping revision %s', head)
+            db.create_all()
+            stamp(directory=directory, revision='head')
+            return
+        if current is None:
+            app.logger.warning(
+                'Database has tables but no Alembic revision; stamping baseline %s '
+                '(`flask db stamp %s`) before upgrading', BASELINE_REVISION, BASELINE_REVISION
+            )
+            stamp(directory=directory, revision=BASELINE_REVISION)
+        upgrade(directory=directory)
+
+
+def ensure_schema(app):
+    """Make sure the database schema is current without introspecting it needlessly.
+
+    When the database is stamped with the latest Alembic revision the schema
+    is known to be current and nothing else is done. Otherwise the schema is
+    brought up to date with :func:`upgrade_schema`.
+
+    Returns:
+        bool: True if the schema was already at the latest revision.
+    """
+    current, head = get_schema_revisions(app)
+    if head is not None and current == head:
+        return True
+
+    app.logger.warning(
+        f'Database revision {current or "(none)"} does not match migration head '
+        f'{head or "(none)"}; upgrading the schema.'
+    )
+    upgrade_schema(app)
+    return False
+
+
+def ensure_admin_user(app):
+    """Create the default admin account (``ADMIN_EMAIL``) if it does not exist.
+
+    Returns:
+        bool: True if the account was created.
+    """
+    from .. import db
+    from ..models.user import User
+
+    with app.app_context():
+        admin_email = app.config.get('ADMIN_EMAIL', 'admin@cafewebsite.com')
+        if User.query.filter_by(email=admin_email).first():
+            return False
+        admin = User(
+            username='admin',
+            email=admin_email,
+            first_name='Admin',
+            is_admin=True
+        )
+        admin.password = os.getenv('ADMIN_PASSWORD', 'admin123')
+        db.session.add(admin)
+        db.session.commit()
+        return True
@@ -0,0 +1,170 @@
+"""
+Fingerprinted, precompressed static assets for the Café application.
+
+``flask build-assets`` copies every file in the static folder to a
+content-hashed name under ``static/build`` (``css/styles.css`` ->
+``build/css/styles.3f2a1b9c0d1e.css``), writes gzip and brotli variants next
+to the compressible ones and records the mapping in
+``static/build/manifest.json``.
+
+At startup the manifest is loaded and ``url_for('static', filename=...)``
+returns the hashed name. WhiteNoise serves the static folder ahead of Flask:
+hashed files get ``Cache-Control: immutable`` with a one-year lifetime and are
+sent precompressed when the client accepts it. Without a manifest (e.g. in
+development) the original names are used, so the build step is optional.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+from flask import current_app
+
+BUILD_DIR = 'build'
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 12
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.map', '.json', '.svg', '.txt', '.html', '.xml', '.ico'}
+MIN_COMPRESS_SIZE = 256
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def file_hash(path):
+    """Return the first ``HASH_LENGTH`` hex digits of the file's MD5."""
+    digest = hashlib.md5(usedforsecurity=False)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(name, digest):
+    """Insert ``digest`` before the extension: ``css/a.css`` -> ``css/a.<digest>.css``."""
+    stem, ext = os.path.splitext(name)
+    return f'{stem}.{digest}{ext}'
+
+
+def compress_file(path, min_size=MIN_COMPRESS_SIZE):
+    """Write ``.gz`` and (if brotli is installed) ``.br`` variants of ``path``.
+
+    Variants that would not be smaller than the original are skipped.
+
+    Returns:
+        list: The encodings written.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < min_size:
+        return []
+
+    variants = {'gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(data, quality=11)
+
+    written = []
+    for suffix, compressed in variants.items():
+        if len(compressed) < len(data):
+            with open(f'{path}.{suffix}', 'wb') as f:
+                f.write(compressed)
+            written.append(suffix)
+    return written
+
+
+def iter_source_files(static_folder):
+    """Yield static file names (POSIX, relative to the folder), skipping build output."""
+    for root, dirs, files in os.walk(static_folder):
+        rel_root = os.path.relpath(root, static_folder)
+        if rel_root == '.':
+            dirs[:] = [d for d in dirs if d != BUILD_DIR]
+        for filename in sorted(files):
+            if filename.startswith('.'):
+                continue
+            name = os.path.normpath(os.path.join(rel_root, filename))
+            yield name.replace(os.sep, '/')
+
+
+def build_assets(static_folder, compress=True, clean=False):
+    """Fingerprint and precompress every static file and write the manifest.
+
+    Hashed files from earlier builds are kept unless ``clean`` is set, so
+    pages rendered before a deploy can still load their assets.
+
+    Args:
+        static_folder (str): The app's static folder.
+        compress (bool): Write gzip/brotli variants of compressible files.
+        clean (bool): Remove the previous build first.
+
+    Returns:
+        dict: The manifest, mapping original to hashed names.
+    """
+    build_root = os.path.join(static_folder, BUILD_DIR)
+    if clean:
+        shutil.rmtree(build_root, ignore_errors=True)
+
+    manifest = {}
+    for name in iter_source_files(static_folder):
+        source = os.path.join(static_folder, name)
+        target_name = f'{BUILD_DIR}/{hashed_name(name, file_hash(source))}'
+        target = os.path.join(static_folder, target_name)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copy2(source, target)
+            if compress and os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+                compress_file(target)
+        manifest[name] = target_name
+
+    os.makedirs(build_root, exist_ok=True)
+    manifest_path = os.path.join(build_root, MANIFEST_NAME)
+    with open(f'{manifest_path}.tmp', 'w') as f:
+        json.dump({'version': 1, 'files': manifest}, f, indent=2, sort_keys=True)
+    os.replace(f'{manifest_path}.tmp', manifest_path)
+    return manifest
+
+
+def load_manifest(static_folder):
+    """Return the asset manifest for ``static_folder`` (empty if not built)."""
+    path = os.path.join(static_folder, BUILD_DIR, MANIFEST_NAME)
+    try:
+        with open(path) as f:
+            return json.load(f).get('files', {})
+    except (OSError, ValueError):
+        return {}
+
+
+def _hashed_static_url(endpoint, values):
+    if endpoint == 'static' and 'filename' in values:
+        manifest = current_app.extensions.get('static_manifest')
+        if manifest:
+            values['filename'] = manifest.get(values['filename'], values['filename'])
+
+
+def init_static_assets(app):
+    """Use hashed asset URLs from the manifest and serve static files with WhiteNoise."""
+    if app.config.get('STATIC_FOLDER'):
+        # Keep the URL the static route was registered with (/static)
+        static_url_path = app.static_url_path
+        app.static_folder = app.config['STATIC_FOLDER']
+        app.static_url_path = static_url_path
+
+    app.extensions['static_manifest'] = load_manifest(app.static_folder)
+    app.url_defaults(_hashed_static_url)
+
+    if not app.config.get('STATIC_WHITENOISE', True):
+        return
+
+    from whitenoise import WhiteNoise
+
+    immutable_prefix = f'{app.static_url_path}/{BUILD_DIR}/'
+    app.wsgi_app = WhiteNoise(
+        app.wsgi_app,
+        root=app.static_folder,
+        prefix=app.static_url_path,
+        max_age=app.config.get('STATIC_MAX_AGE', 3600),
+        # Hashed names change whenever the content does
+        immutable_file_test=lambda path, url: url.startswith(immutable_prefix),
+        # Pick up new files without a restart while developing
+        autorefresh=app.debug
+    )
@@ -0,0 +1,341 @@
+"""
+Non-blocking structured logging for the Café application.
+
+Request threads/greenlets never write to a log sink directly. Loggers get a
+:class:`QueueHandler` that only appends the record to an in-memory queue, and
+a single background writer thread (a real OS thread, even under gevent)
+passes the records on to the real handlers. The queue is bounded by
+``LOG_QUEUE_SIZE``: when the sink cannot keep up, new records are dropped
+instead of blocking requests or growing memory, and the writer periodically
+logs how many were lost (also exported as ``cafe_log_records_dropped``).
+
+Records are written as one JSON object per line (``LOG_JSON``) including the
+request id, endpoint and, for the ``cafe.access`` log written after every
+request, the status, duration and DB time from :mod:`app.utils.sql_stats`.
+Middleware that answers without Flask (page cache hits) writes its own
+access records with :func:`log_access`.
+"""
+import _thread
+import atexit
+import copy
+import json
+import logging
+import os
+import re
+import sys
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from flask import g, has_request_context, request, request_finished, request_started
+from flask.logging import default_handler
+from .gevent_support import unpatched
+from .sql_stats import get_query_stats
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+ACCESS_LOGGER = 'cafe.access'
+_VALID_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_start_new_thread = unpatched('_thread', 'start_new_thread', _thread.start_new_thread)
+_allocate_lock = unpatched('_thread', 'allocate_lock', _thread.allocate_lock)
+_sleep = unpatched('time', 'sleep', time.sleep)
+
+
+class LogPipeline:
+    """Bounded record queue drained by a background writer thread.
+
+    The thread is started lazily in each process, so a pipeline created in
+    the gunicorn master (``preload_app``) keeps working in forked workers.
+    """
+
+    def __init__(self, maxsize=10000, poll_interval=0.05, drop_report_interval=10):
+        self.maxsize = maxsize
+        self.poll_interval = poll_interval
+        self.drop_report_interval = drop_report_interval
+        # deque.append/popleft are atomic, so no lock is shared with requests
+        self.records = deque()
+        self.dropped = 0
+        self._reported_dropped = 0
+        self._reported_at = 0.0
+        self._pid = None
+        self._running = False
+        self._finished = None
+        # Where drop warnings are written (set by init_logging)
+        self.report_handlers = []
+        atexit.register(self.stop)
+
+    def put(self, record, handlers):
+        """Queue a record for ``handlers``; returns False if it was dropped."""
+        if self._pid != os.getpid():
+            self.start()
+        if len(self.records) >= self.maxsize:
+            self.dropped += 1
+            return False
+        self.records.append((record, handlers))
+        return True
+
+    def start(self):
+        if self._pid != os.getpid():
+            # Forked: the parent's writer thread does not exist here, and its
+            # queued records are the parent's to write
+            self.records.clear()
+            self._running = False
+        if self._running:
+            return
+        self._pid = os.getpid()
+        self._running = True
+        self._finished = _allocate_lock()
+        self._finished.acquire()
+        _start_new_thread(self._run, ())
+
+    def stop(self, timeout=5):
+        """Write out the queued records and stop the writer thread."""
+        if not self._running or self._pid != os.getpid():
+            return
+        self._running = False
+        if self._finished.acquire(timeout=timeout):
+            self._finished.release()
+
+    def _run(self):
+        try:
+            while self._running or self.records:
+                try:
+                    record, handlers = self.records.popleft()
+                except IndexError:
+                    self._report_dropped()
+                    _sleep(self.poll_interval)
+                    continue
+                self._handle(record, handlers)
+        finally:
+            self._finished.release()
+
+    def _handle(self, record, handlers):
+        for handler in handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def _report_dropped(self):
+        dropped = self.dropped - self._reported_dropped
+        now = time.monotonic()
+        if not dropped or now - self._reported_at < self.drop_report_interval:
+            return
+        self._reported_dropped += dropped
+        self._reported_at = now
+        record = logging.LogRecord(
+            'cafe.logging', logging.WARNING, __file__, 0,
+            'Log queue full: dropped %d records (%d in total)', (dropped, self.dropped), None
+        )
+        self._handle(record, self.report_handlers)
+
+    def stats(self):
+        return {'queued': len(self.records), 'dropped': self.dropped, 'capacity': self.maxsize}
+
+
+class RequestContextFilter(logging.Filter):
+    """Attach the current request's id and endpoint to every record."""
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.method = request.method
+            record.path = request.path
+            record.endpoint = request.endpoint
+            user = g.get('_login_user')
+            if user is not None and getattr(user, 'is_authenticated', False):
+                record.user_id = user.get_id()
+        return True
+
+
+class QueueHandler(logging.Handler):
+    """Hand records to a :class:`LogPipeline` without doing any I/O."""
+
+    def __init__(self, pipeline, handlers):
+        super().__init__()
+        self.pipeline = pipeline
+        self.handlers = handlers
+        self.addFilter(RequestContextFilter())
+
+    def prepare(self, record):
+        """Render the message and traceback now, while args are still valid."""
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        return record
+
+    def emit(self, record):
+        try:
+            self.pipeline.put(self.prepare(record), self.handlers)
+        except Exception:
+            self.handleError(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and value is not None:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+_pipeline = None
+# logger name -> (QueueHandler, sink handlers)
+_queued_loggers = {}
+
+
+def get_pipeline(maxsize=10000):
+    """Return the process-wide log pipeline, creating it on first use."""
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = LogPipeline(maxsize=maxsize)
+    return _pipeline
+
+
+def get_log_stats():
+    """Return queue depth and drop counts, or None if queueing is not set up."""
+    return _pipeline.stats() if _pipeline is not None else None
+
+
+def queue_logger(logger, pipeline, handlers=None):
+    """Route ``logger`` through ``pipeline``.
+
+    Args:
+        logger (logging.Logger): The logger to make non-blocking.
+        pipeline (LogPipeline): The queue to use.
+        handlers (list): Sink handlers; defaults to the logger's current
+            handlers, which are moved behind the queue.
+    """
+    if logger.name in _queued_loggers:
+        return _queued_loggers[logger.name][0]
+    handlers = list(handlers if handlers is not None else logger.handlers)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    queue_handler = QueueHandler(pipeline, handlers)
+    logger.addHandler(queue_handler)
+    _queued_loggers[logger.name] = (queue_handler, handlers)
+    return queue_handler
+
+
+def build_sink_handlers(app):
+    """Create the handlers the writer thread sends records to."""
+    if app.config.get('LOG_JSON'):
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(app.config.get(
+            'LOG_FORMAT', '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        ))
+
+    stream = sys.stderr if app.config.get('LOG_STREAM') == 'stderr' else sys.stdout
+    handlers = [logging.StreamHandler(stream)]
+    if app.config.get('LOG_FILE'):
+        from logging.handlers import WatchedFileHandler
+        os.makedirs(os.path.dirname(app.config['LOG_FILE']) or '.', exist_ok=True)
+        handlers.append(WatchedFileHandler(app.config['LOG_FILE']))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def get_request_id(environ):
+    """Return the client's ``X-Request-ID`` if it is valid, else a new id."""
+    request_id = environ.get('HTTP_X_REQUEST_ID', '')
+    return request_id if _VALID_REQUEST_ID.match(request_id) else uuid.uuid4().hex
+
+
+def log_access(environ, status, duration, length, request_id, **extra):
+    """Write a ``cafe.access`` record for a request answered outside Flask.
+
+    Args:
+        environ (dict): The WSGI environ of the request.
+        status (int): The response status code.
+        duration (float): Seconds spent serving the request.
+        length (int): Size of the response body in bytes.
+        request_id (str): The id sent back in ``X-Request-ID``.
+        **extra: More fields for the record.
+    """
+    method = environ.get('REQUEST_METHOD')
+    path = environ.get('PATH_INFO', '')
+    query = environ.get('QUERY_STRING')
+    logging.getLogger(ACCESS_LOGGER).info(
+        '%s %s %s', method, f'{path}?{query}' if query else path, status,
+        extra=dict(extra, **{
+            'status': status,
+            'duration_ms': round(duration * 1000, 2),
+            'bytes': length,
+            'remote_addr': environ.get('REMOTE_ADDR'),
+            'request_id': request_id,
+            'method': method,
+            'path': path
+        })
+    )
+
+
+def _start_request(sender, **extra):
+    g.request_id = get_request_id(request.environ)
+    g._log_start = time.perf_counter()
+
+
+def _log_request(sender, response, **extra):
+    started = g.get('_log_start')
+    if started is None:
+        return
+    response.headers.setdefault(REQUEST_ID_HEADER, g.request_id)
+
+    stats = get_query_stats()
+    logging.getLogger(ACCESS_LOGGER).info(
+        '%s %s %s', request.method, request.full_path.rstrip('?'), response.status_code,
+        extra={
+            'status': response.status_code,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+            'db_ms': round(stats.duration * 1000, 2) if stats else None,
+            'db_queries': stats.count if stats else None,
+            'bytes': response.content_length,
+            'remote_addr': request.remote_addr
+        }
+    )
+
+
+def init_logging(app):
+    """Set up request ids, access records and the non-blocking log queue."""
+    request_started.connect(_start_request, app)
+    request_finished.connect(_log_request, app)
+
+    access_logger = logging.getLogger(ACCESS_LOGGER)
+    access_logger.setLevel(logging.INFO)
+    access_logger.disabled = not app.config.get('LOG_ACCESS', True)
+
+    if app.config.get('LOG_LEVEL'):
+        app.logger.setLevel(app.config['LOG_LEVEL'])
+
+    if not app.config.get('LOG_QUEUE_ENABLED', True):
+        return
+
+    pipeline = get_pipeline(app.config.get('LOG_QUEUE_SIZE', 10000))
+    sinks = build_sink_handlers(app)
+
+    app.logger.removeHandler(default_handler)
+    queue_logger(app.logger, pipeline, sinks)
+    access_logger.propagate = False
+    queue_logger(access_logger, pipeline, sinks)
+    pipeline.report_handlers = sinks
+
+    # Gunicorn's error log is set up before the app is loaded; move its
+    # handlers behind the queue too so workers never block on them
+    gunicorn_logger = logging.getLogger('gunicorn.error')
+    if gunicorn_logger.handlers:
+        queue_logger(gunicorn_logger, pipeline)
@@ -0,0 +1,226 @@
+"""
+Synthetic dataset generator for the Café application.
+
+Fills the database with production-like volumes (menu items, customers and
+orders with realistic status timestamps) so performance work can be
+reproduced locally. Rows are written with bulk Core inserts in batches with
+explicit primary keys, so memory use does not grow with the dataset size.
+"""
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, select
+from werkzeug.security import generate_password_hash
+from .. import db
+from ..models.menu_item import MenuItem
+from ..models.order import Order, OrderItem
+from ..models.user import User
+from .menu_cache import bump_menu_version
+
+SYNTHETIC_PASSWORD = 'password'
+SYNTHETIC_EMAIL_DOMAIN = 'example.com'
+TAX_RATE = 0.08
+
+CATEGORIES = {
+    'Coffee': (2.00, 5.50),
+    'Tea': (2.00, 4.50),
+    'Cold Drinks': (2.50, 6.00),
+    'Bakery': (1.50, 4.50),
+    'Breakfast': (5.00, 12.00),
+    'Sandwiches': (6.00, 11.00),
+    'Salads': (7.00, 12.50),
+    'Desserts': (3.00, 7.00)
+}
+ADJECTIVES = ['Classic', 'Iced', 'Spiced', 'Honey', 'Vanilla', 'Maple', 'Smoked', 'Toasted',
+              'Double', 'Wild', 'Golden', 'House', 'Seasonal', 'Rustic', 'Salted', 'Berry']
+
+# Relative order volume per hour of day (morning and lunch peaks)
+HOURLY_WEIGHTS = [0, 0, 0, 0, 0, 1, 4, 10, 14, 11, 8, 9, 13, 12, 7, 6, 6, 7, 6, 4, 3, 2, 1, 0]
+ORDER_TYPES = (['dine_in', 'takeout', 'delivery'], [50, 35, 15])
+
+
+def _next_id(model):
+    return (db.session.scalar(select(func.max(model.id))) or 0) + 1
+
+
+def generate_menu_items(count, rng):
+    """Insert ``count`` menu items; returns ``[(id, name, price)]`` for order lines."""
+    start = _next_id(MenuItem)
+    now = datetime.utcnow()
+    categories = list(CATEGORIES)
+    rows = []
+    for n in range(count):
+        category = categories[n % len(categories)]
+        low, high = CATEGORIES[category]
+        rows.append({
+            'id': start + n,
+            'name': f'{rng.choice(ADJECTIVES)} {category} #{start + n}',
+            'description': f'Synthetic {category.lower()} item',
+            'price': round(rng.uniform(low, high), 2),
+            'category': category,
+            'is_available': rng.random() > 0.05,
+            'is_featured': rng.random() < 0.03,
+            'calories': rng.randint(5, 900),
+            'is_vegetarian': rng.random() < 0.4,
+            'is_vegan': rng.random() < 0.15,
+            'is_gluten_free': rng.random() < 0.2,
+            'display_order': n,
+            'created_at': now,
+            'updated_at': now
+        })
+    db.session.execute(insert(MenuItem.__table__), rows)
+    db.session.commit()
+    return [(row['id'], row['name'], row['price']) for row in rows]
+
+
+def generate_users(count, rng, batch_size=10000):
+    """Insert ``count`` customers sharing one password hash; returns their id range."""
+    start = _next_id(User)
+    password_hash = generate_password_hash(SYNTHETIC_PASSWORD)
+    now = datetime.utcnow()
+    for batch_start in range(0, count, batch_size):
+        rows = []
+        for n in range(batch_start, min(count, batch_start + batch_size)):
+            user_id = start + n
+            rows.append({
+                'id': user_id,
+                'email': f'user{user_id}@{SYNTHETIC_EMAIL_DOMAIN}',
+                'username': f'user{user_id}',
+                'password_hash': password_hash,
+                'first_name': 'User',
+                'last_name': str(user_id),
+                'is_active': True,
+                'email_verified': True,
+                'created_at': now - timedelta(days=rng.randint(0, 720)),
+                'updated_at': now
+            })
+        db.session.execute(insert(User.__table__), rows)
+        db.session.commit()
+    return range(start, start + count)
+
+
+def _order_timeline(order_date, lines, status, rng):
+    """Status timestamps consistent with the order's size and final status."""
+    timeline = dict.fromkeys(['confirmed_at', 'prepared_at', 'ready_at', 'completed_at',
+                              'cancelled_at'])
+    steps = ['confirmed_at', 'prepared_at', 'ready_at', 'completed_at']
+    reached = {'pending': 0, 'confirmed': 1, 'preparing': 2, 'ready': 3,
+               'completed': 4, 'cancelled': rng.randint(0, 2)}[status]
+    prep_minutes = 2 + sum(quantity for _, _, _, quantity in lines) * rng.uniform(0.7, 2.0)
+    offsets = [rng.uniform(0.2, 3), rng.uniform(0.5, 4), prep_minutes, rng.uniform(1, 15)]
+    moment = order_date
+    for step, minutes in zip(steps[:reached], offsets):
+        moment += timedelta(minutes=minutes)
+        timeline[step] = moment
+    if status == 'cancelled':
+        timeline['cancelled_at'] = moment + timedelta(minutes=rng.uniform(1, 10))
+    return timeline
+
+
+def generate_orders(count, user_ids, menu, rng, days=365, batch_size=5000):
+    """Insert ``count`` orders (1-5 lines each) spread over the last ``days`` days.
+
+    Orders older than two hours are completed or cancelled; recent ones may still
+    be in progress. Yields the number of orders written after each batch.
+    """
+    order_id = _next_id(Order)
+    item_id = _next_id(OrderItem)
+    now = datetime.utcnow()
+    hours = list(range(24))
+    written = 0
+
+    while written < count:
+        orders, items = [], []
+        for _ in range(min(batch_size, count - written)):
+            day = now - timedelta(days=rng.uniform(0, days))
+            order_date = day.replace(hour=rng.choices(hours, HOURLY_WEIGHTS)[0],
+                                     minute=rng.randint(0, 59), second=rng.randint(0, 59))
+            if order_date > now:
+                order_date -= timedelta(days=1)
+            age = now - order_date
+            if age > timedelta(hours=2):
+                status = rng.choices(['completed', 'cancelled'], [95, 5])[0]
+            else:
+                status = rng.choice(['pending', 'confirmed', 'preparing', 'ready', 'completed'])
+
+            lines = []
+            for menu_item_id, name, price in rng.sample(menu, rng.randint(1, min(5, len(menu)))):
+                lines.append((menu_item_id, name, price, rng.choices([1, 2, 3], [80, 15, 5])[0]))
+            subtotal = round(sum(price * quantity for _, _, price, quantity in lines), 2)
+            tax = round(subtotal * TAX_RATE, 2)
+
+            order = {
+                'id': order_id,
+                'order_number': f'SYN-{order_id}',
+                'user_id': rng.choice(user_ids),
+                'status': status,
+                'subtotal': subtotal,
+                'tax': tax,
+                'total': round(subtotal + tax, 2),
+                'payment_status': 'refunded' if status == 'cancelled' else 'paid',
+                'payment_method': rng.choice(['card', 'cash', 'mobile']),
+                'order_type': rng.choices(*ORDER_TYPES)[0],
+                'table_number': None,
+                'order_date': order_date,
+                'created_at': order_date,
+                'updated_at': order_date
+            }
+            order.update(_order_timeline(order_date, lines, status, rng))
+            if order['order_type'] == 'dine_in':
+                order['table_number'] = rng.randint(1, 40)
+            orders.append(order)
+
+            for menu_item_id, name, price, quantity in lines:
+                items.append({
+                    'id': item_id,
+                    'order_id': order_id,
+                    'menu_item_id': menu_item_id,
+                    'item_name': name,
+                    'item_price': price,
+                    'quantity': quantity,
+                    'total_price': round(price * quantity, 2),
+                    'created_at': order_date,
+                    'updated_at': order_date
+                })
+                item_id += 1
+            order_id += 1
+
+        db.session.execute(insert(Order.__table__), orders)
+        db.session.execute(insert(OrderItem.__table__), items)
+        db.session.commit()
+        written += len(orders)
+        yield written
+
+
+def generate_dataset(items, users, orders, days=365, seed=None, progress=None):
+    """Generate a complete synthetic dataset.
+
+    Args:
+        items (int): Menu items to create.
+        users (int): Customers to create (all with password ``'password'``).
+        orders (int): Orders to create.
+        days (int): How far back order dates go.
+        seed (int): Random seed for reproducible datasets.
+        progress (callable): Called with a status message after each step/batch.
+    """
+    rng = random.Random(seed)
+    report = progress or (lambda message: None)
+
+    if items:
+        menu = generate_menu_items(items, rng)
+        # Bulk inserts bypass the ORM change events
+        bump_menu_version()
+    else:
+        menu = [(id, name, float(price)) for id, name, price in db.session.execute(
+            select(MenuItem.id, MenuItem.name, MenuItem.price).filter_by(is_available=True))]
+    report(f'{len(menu)} menu items')
+
+    if users:
+        user_ids = generate_users(users, rng)
+    else:
+        user_ids = list(db.session.scalars(select(User.id)))
+    report(f'{len(user_ids)} users')
+
+    if orders and not (menu and user_ids):
+        raise ValueError('Orders need at least one menu item and one user')
+    for written in generate_orders(orders, user_ids, menu, rng, days=days):
+        report(f'{written}/{orders} orders')
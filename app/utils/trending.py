@@ -0,0 +1,240 @@
+"""
+Trending menu items for the Café application.
+
+Each worker counts the units sold per item as order transactions commit, and
+a background thread (a greenlet under gevent) adds them to hourly
+``item_sales`` rows every ``TRENDING_FLUSH_INTERVAL`` seconds. The write is an
+increment (``quantity = quantity + n``), so workers never overwrite each
+other's counts.
+
+An item's trending score is its sales over the last ``TRENDING_WINDOW_HOURS``
+with each hour weighted by ``0.5 ** (age / TRENDING_HALF_LIFE_HOURS)``. The
+top ``TRENDING_SIZE`` items are recomputed from the hourly rows every
+``TRENDING_REFRESH_INTERVAL`` seconds and kept in worker memory, so pages
+read the list without touching the database.
+
+Pending counts are also written when the worker exits (gunicorn's
+``worker_exit`` hook, or ``atexit``), so only a worker that is killed outright
+loses them; the list is an estimate. ``flask rebuild-trending`` recomputes the
+rows from order history.
+"""
+import atexit
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import delete, event, insert, select
+from sqlalchemy.orm import Session, object_session
+from .. import db
+from ..models.item_sales import ItemSales
+from ..models.order import Order, OrderItem
+from .counters import increment_counts
+from .menu_cache import get_menu_snapshot
+
+# (menu_item_id, period_start) -> units sold in this worker, not yet written
+_pending = Counter()
+_lock = threading.Lock()
+# The app the flusher thread of this process writes with
+_flusher = {'pid': None, 'app': None}
+
+
+class TrendingList:
+    """Item ids ranked by trending score, best first."""
+
+    def __init__(self, scores):
+        self.scores = scores
+        self.refreshed_at = time.monotonic()
+        # Menu item dicts for the ranked ids, resolved per menu snapshot
+        self.items = []
+        self.menu_version = None
+
+    def __repr__(self):
+        return f'<TrendingList ({len(self.scores)} items)>'
+
+
+def period_start(moment):
+    """Return the start of the hour bucket ``moment`` falls into."""
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def record_sale(menu_item_id, quantity=1, when=None):
+    """Count units of an item sold; they are written on the next flush."""
+    key = (menu_item_id, period_start(when or datetime.utcnow()))
+    with _lock:
+        _pending[key] += quantity
+
+
+def flush_item_sales(app=None):
+    """Write this worker's pending counts and prune rows outside the window.
+
+    Args:
+        app (Flask): The application. Defaults to ``current_app``.
+
+    Returns:
+        int: The number of hourly rows written.
+    """
+    app = app or current_app._get_current_object()
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+
+    now = datetime.utcnow()
+    cutoff = period_start(now - timedelta(hours=app.config.get('TRENDING_WINDOW_HOURS', 72)))
+    rows = [
+        {'menu_item_id': item_id, 'period_start': start, 'quantity': quantity,
+         'created_at': now, 'updated_at': now}
+        for (item_id, start), quantity in pending.items() if start >= cutoff
+    ]
+    try:
+        with app.app_context(), db.engine.begin() as connection:
+            increment_counts(connection, ItemSales.__table__, ['menu_item_id', 'period_start'], rows, 'quantity')
+            connection.execute(delete(ItemSales.__table__).where(ItemSales.__table__.c.period_start < cutoff))
+    except Exception:
+        # Keep the counts for the next attempt
+        with _lock:
+            _pending.update(pending)
+        raise
+    return len(rows)
+
+
+def flush_pending_sales():
+    """Write this worker's pending counts, e.g. before it exits.
+
+    Returns:
+        int: The number of hourly rows written.
+    """
+    app = _flusher['app']
+    if app is None or not _pending:
+        return 0
+    try:
+        return flush_item_sales(app)
+    except Exception:
+        app.logger.exception('Could not write trending item sales')
+        return 0
+
+
+def _flush_periodically(app, interval):
+    while True:
+        time.sleep(interval)
+        flush_pending_sales()
+
+
+def start_flusher(app):
+    """Start this process's flusher thread, once per (forked) process."""
+    with _lock:
+        if _flusher['pid'] == os.getpid():
+            return
+        _flusher.update(pid=os.getpid(), app=app)
+    interval = app.config.get('TRENDING_FLUSH_INTERVAL', 30)
+    threading.Thread(target=_flush_periodically, args=(app, interval),
+                     name='trending-flush', daemon=True).start()
+
+
+atexit.register(flush_pending_sales)
+
+
+def compute_trending_scores(now=None, limit=None):
+    """Rank items by decayed sales over the trending window.
+
+    Returns:
+        list: ``(menu_item_id, score)`` tuples, highest score first.
+    """
+    config = current_app.config
+    now = now or datetime.utcnow()
+    half_life = config.get('TRENDING_HALF_LIFE_HOURS', 6)
+    cutoff = now - timedelta(hours=config.get('TRENDING_WINDOW_HOURS', 72))
+    rows = db.session.execute(
+        select(ItemSales.menu_item_id, ItemSales.period_start, ItemSales.quantity)
+        .where(ItemSales.period_start >= period_start(cutoff))
+    )
+    scores = Counter()
+    for item_id, start, quantity in rows:
+        # Age of the middle of the hour
+        age = (now - start).total_seconds() / 3600 - 0.5
+        scores[item_id] += quantity * 0.5 ** (max(age, 0.0) / half_life)
+    return scores.most_common(limit or config.get('TRENDING_SIZE', 12))
+
+
+def get_trending():
+    """Return the app's :class:`TrendingList`, recomputing it when stale."""
+    app = current_app._get_current_object()
+    trending = app.extensions.get('trending')
+    interval = app.config.get('TRENDING_REFRESH_INTERVAL', 60)
+    if trending is None or time.monotonic() - trending.refreshed_at >= interval:
+        trending = TrendingList(compute_trending_scores())
+        app.extensions['trending'] = trending
+    return trending
+
+
+def get_trending_items(limit=None):
+    """Return the trending available items as menu snapshot dicts, best first."""
+    if not current_app.config.get('TRENDING_ENABLED', True):
+        return []
+    trending = get_trending()
+    snapshot = get_menu_snapshot()
+    if trending.menu_version != snapshot.version:
+        by_id = {item['id']: item for item in snapshot.items}
+        trending.items = [by_id[item_id] for item_id, _ in trending.scores if item_id in by_id]
+        trending.menu_version = snapshot.version
+    return trending.items[:limit]
+
+
+def rebuild_item_sales(hours=None):
+    """Recompute the hourly rows of the trending window from order history.
+
+    Replaces the rows in the window; counts other workers flush while this
+    runs are added on top.
+
+    Returns:
+        int: The number of hourly rows written.
+    """
+    hours = hours or current_app.config.get('TRENDING_WINDOW_HOURS', 72)
+    cutoff = period_start(datetime.utcnow() - timedelta(hours=hours))
+    sold = Counter()
+    result = db.session.execute(
+        select(OrderItem.menu_item_id, Order.order_date, OrderItem.quantity)
+        .join(Order, OrderItem.order_id == Order.id)
+        .where(Order.order_date >= cutoff)
+        .execution_options(yield_per=5000)
+    )
+    for item_id, order_date, quantity in result:
+        sold[(item_id, period_start(order_date))] += quantity or 0
+
+    now = datetime.utcnow()
+    db.session.execute(delete(ItemSales).where(ItemSales.period_start >= cutoff))
+    rows = [
+        {'menu_item_id': item_id, 'period_start': start, 'quantity': quantity,
+         'created_at': now, 'updated_at': now}
+        for (item_id, start), quantity in sold.items()
+    ]
+    if rows:
+        db.session.execute(insert(ItemSales.__table__), rows)
+    db.session.commit()
+    current_app.extensions.pop('trending', None)
+    return len(rows)
+
+
+# Sales are counted once their order's transaction commits
+@event.listens_for(OrderItem, 'after_insert')
+def _item_sold(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('items_sold', []).append((target.menu_item_id, target.quantity or 1))
+
+
+@event.listens_for(Session, 'after_commit')
+def _count_sales(session):
+    sold = session.info.pop('items_sold', None)
+    if not sold or not has_app_context() or not current_app.config.get('TRENDING_ENABLED', True):
+        return
+    now = datetime.utcnow()
+    for item_id, quantity in sold:
+        record_sale(item_id, quantity, now)
+    start_flusher(current_app._get_current_object())
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_sales(session):
+    session.info.pop('items_sold', None)
@@ -0,0 +1,143 @@
+"""
+Lifetime customer stats for the Café application.
+
+``User`` carries each customer's completed order count, total spent, last
+order date and most ordered items, so the profile and order history pages
+read them from the already loaded user instead of aggregating the order
+history. When an order's status moves to ``completed`` the stats are
+updated with increments, in the transaction that completes the order; the
+per-item counts behind the top items live in ``user_item_counts``.
+
+``flask backfill-user-stats`` recomputes everything from the order history,
+e.g. after importing orders or refunding a completed one.
+"""
+from datetime import datetime
+from flask import current_app, has_app_context
+from sqlalchemy import bindparam, case, delete, event, func, insert, inspect, literal, select, update
+from .. import db
+from ..models.order import Order, OrderItem
+from ..models.user import User
+from ..models.user_item_count import UserItemCount
+from .counters import increment_counts
+
+
+def _top_items_limit():
+    if has_app_context():
+        return current_app.config.get('USER_STATS_TOP_ITEMS', 3)
+    return 3
+
+
+def _top_items(rows):
+    return [{'id': item_id, 'name': name, 'quantity': quantity} for item_id, name, quantity in rows]
+
+
+# Count orders in the transaction that completes them
+@event.listens_for(Order, 'after_update')
+def _order_completed(mapper, connection, target):
+    history = inspect(target).attrs.status.history
+    # Completing an already completed order again must not count it twice
+    if 'completed' not in history.added or 'completed' in history.deleted:
+        return
+
+    now = datetime.utcnow()
+    items = connection.execute(
+        select(OrderItem.menu_item_id, func.max(OrderItem.item_name), func.sum(OrderItem.quantity))
+        .where(OrderItem.order_id == target.id)
+        .group_by(OrderItem.menu_item_id)
+    ).all()
+    rows = [
+        {'user_id': target.user_id, 'menu_item_id': item_id, 'item_name': name, 'quantity': quantity or 0,
+         'created_at': now, 'updated_at': now}
+        for item_id, name, quantity in items
+    ]
+    increment_counts(connection, UserItemCount.__table__, ['user_id', 'menu_item_id'], rows, 'quantity')
+
+    counts = UserItemCount.__table__.c
+    top = connection.execute(
+        select(counts.menu_item_id, counts.item_name, counts.quantity)
+        .where(counts.user_id == target.user_id)
+        .order_by(counts.quantity.desc(), counts.menu_item_id)
+        .limit(_top_items_limit())
+    ).all()
+
+    users = User.__table__.c
+    order_date = target.order_date or now
+    connection.execute(
+        update(User.__table__)
+        .where(users.id == target.user_id)
+        .values(
+            order_count=users.order_count + 1,
+            total_spent=users.total_spent + (target.total or 0),
+            last_order_date=case(
+                (users.last_order_date.is_(None) | (users.last_order_date < order_date), order_date),
+                else_=users.last_order_date
+            ),
+            top_items=_top_items(top)
+        )
+    )
+
+
+def backfill_user_stats(chunk_size=1000):
+    """Recompute every user's lifetime stats from their completed orders.
+
+    Returns:
+        int: The number of users with completed orders.
+    """
+    now = datetime.utcnow()
+    completed = Order.status == 'completed'
+
+    db.session.execute(delete(UserItemCount))
+    db.session.execute(
+        insert(UserItemCount).from_select(
+            ['user_id', 'menu_item_id', 'item_name', 'quantity', 'created_at', 'updated_at'],
+            select(Order.user_id, OrderItem.menu_item_id, func.max(OrderItem.item_name),
+                   func.sum(OrderItem.quantity), literal(now), literal(now))
+            .join(OrderItem, OrderItem.order_id == Order.id)
+            .where(completed)
+            .group_by(Order.user_id, OrderItem.menu_item_id)
+        )
+    )
+
+    def of_user(column):
+        return select(column).where(Order.user_id == User.id, completed).scalar_subquery()
+
+    db.session.execute(
+        update(User).values(
+            order_count=of_user(func.count(Order.id)),
+            total_spent=of_user(func.coalesce(func.sum(Order.total), 0)),
+            last_order_date=of_user(func.max(Order.order_date)),
+            top_items=None
+        ),
+        execution_options={'synchronize_session': False}
+    )
+
+    # Top items, a batch of users at a time
+    limit = _top_items_limit()
+    counts = UserItemCount.__table__.c
+    set_top_items = (update(User.__table__)
+                     .where(User.__table__.c.id == bindparam('user'))
+                     .values(top_items=bindparam('items')))
+    users, last = 0, 0
+    while True:
+        user_ids = db.session.execute(
+            select(counts.user_id).where(counts.user_id > last)
+            .group_by(counts.user_id).order_by(counts.user_id).limit(chunk_size)
+        ).scalars().all()
+        if not user_ids:
+            break
+        top = {user_id: [] for user_id in user_ids}
+        rows = db.session.execute(
+            select(counts.user_id, counts.menu_item_id, counts.item_name, counts.quantity)
+            .where(counts.user_id.between(user_ids[0], user_ids[-1]))
+            .order_by(counts.user_id, counts.quantity.desc(), counts.menu_item_id)
+        )
+        for user_id, item_id, name, quantity in rows:
+            if len(top[user_id]) < limit:
+                top[user_id].append((item_id, name, quantity))
+        db.session.execute(set_top_items, [{'user': user_id, 'items': _top_items(items)}
+                                           for user_id, items in top.items()])
+        users += len(user_ids)
+        last = user_ids[-1]
+
+    db.session.commit()
+    return users
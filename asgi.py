@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""
+ASGI config for the Café read-only menu API.
+
+This module contains the ASGI callable as a module-level variable named
+``application``. It serves only the public menu endpoints (see
+``app/async_api.py``) and runs next to the WSGI app, e.g.::
+
+    uvicorn asgi:application --port 8001 --workers 2
+"""
+
+import os
+from app.async_api import create_async_app
+
+application = create_async_app(os.getenv('FLASK_ENV') or 'development')
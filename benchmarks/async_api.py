@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+"""
+Requests per second per core: Flask menu API vs. the async menu API.
+
+Starts gunicorn (wsgi:application) and uvicorn (asgi:application) with one
+worker process each, so each server gets a single core, and drives the same
+read-only endpoints on both with keep-alive connections:
+
+* ``/api/menu/items``
+* ``/api/menu/categories``
+
+The async-only endpoints (``/api/menu/items/<id>`` and ``/api/menu/search``)
+are measured on uvicorn as well. Both servers run the production config
+(gunicorn_config.py sets ``FLASK_ENV=production``, so uvicorn gets the same)
+and read its database; seed it first with ``flask seed-synthetic``. Requests
+carry ``X-Forwarded-Proto: https`` so the HTTPS redirect does not answer them,
+only 2xx responses count as successes, and both servers must return the same
+data for a shared endpoint before it is timed. Run the load generator on other
+cores than the servers (e.g. with ``taskset``) or the numbers will mostly
+measure this script.
+
+Usage:
+    python benchmarks/async_api.py [--concurrency 32] [--seconds 20]
+    python benchmarks/async_api.py --flask-url http://127.0.0.1:5000 --async-url http://127.0.0.1:8001
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadtest import PROXY_HEADERS, ROOT, start_gunicorn, summarize, wait_for_port
+
+SHARED_PATHS = ['/api/menu/items', '/api/menu/categories']
+ASYNC_ONLY_PATHS = ['/api/menu/items/{id}', '/api/menu/search?q=latte']
+
+
+def start_uvicorn(port):
+    cmd = [sys.executable, '-m', 'uvicorn', 'asgi:application',
+           '--host', '127.0.0.1', '--port', str(port), '--workers', '1',
+           '--log-level', 'warning', '--no-access-log']
+    # Same config and database as gunicorn, whose raw_env sets FLASK_ENV
+    server = subprocess.Popen(cmd, cwd=ROOT, env=dict(os.environ, FLASK_ENV='production'))
+    wait_for_port('127.0.0.1', port)
+    return server
+
+
+def first_item_id(base_url):
+    status, body = get(connect(base_url), '/api/menu/items')
+    items = json.loads(body) if status == 200 else []
+    return items[0]['id'] if items else 1
+
+
+def connect(base_url):
+    url = urllib.parse.urlsplit(base_url)
+    return http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+
+
+def get(connection, path):
+    connection.request('GET', path, headers=PROXY_HEADERS)
+    response = connection.getresponse()
+    return response.status, response.read()
+
+
+def check_same_response(flask_url, async_url, path):
+    """Fail unless both servers answer ``path`` with a 200 and the same data."""
+    responses = []
+    for base_url in (flask_url, async_url):
+        connection = connect(base_url)
+        try:
+            status, body = get(connection, path)
+        finally:
+            connection.close()
+        if status != 200:
+            raise SystemExit(f'{base_url}{path} returned {status}')
+        responses.append(json.loads(body))
+    if responses[0] != responses[1]:
+        raise SystemExit(f'{path}: the Flask and async servers returned different data')
+
+
+def drive(base_url, path, concurrency, seconds):
+    """Request ``path`` from ``concurrency`` threads for ``seconds``."""
+    samples = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def run():
+        connection = connect(base_url)
+        local = []
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                status, _ = get(connection, path)
+                ok = 200 <= status < 300
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = connect(base_url)
+                ok = False
+            local.append((time.perf_counter() - started, ok))
+        connection.close()
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=run) for _ in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(samples, time.monotonic() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--flask-url', help='Target a running Flask server instead of starting gunicorn')
+    parser.add_argument('--async-url', help='Target a running ASGI server instead of starting uvicorn')
+    parser.add_argument('--flask-port', type=int, default=5056)
+    parser.add_argument('--async-port', type=int, default=5057)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=20, help='Per endpoint and server')
+    parser.add_argument('--json', dest='json_path', help='Write results to this file')
+    args = parser.parse_args()
+
+    servers = []
+    try:
+        flask_url = args.flask_url
+        if not flask_url:
+            servers.append(start_gunicorn(args.flask_port, 1, None))
+            flask_url = f'http://127.0.0.1:{args.flask_port}'
+        async_url = args.async_url
+        if not async_url:
+            servers.append(start_uvicorn(args.async_port))
+            async_url = f'http://127.0.0.1:{args.async_port}'
+
+        results = {}
+        for path in SHARED_PATHS:
+            check_same_response(flask_url, async_url, path)
+        for path in SHARED_PATHS:
+            flask = drive(flask_url, path, args.concurrency, args.seconds)
+            asgi = drive(async_url, path, args.concurrency, args.seconds)
+            results[path] = {'flask': flask, 'async': asgi}
+            if flask.get('rps') and asgi.get('rps'):
+                results[path]['speedup'] = round(asgi['rps'] / flask['rps'], 2)
+
+        item_id = first_item_id(async_url)
+        for path in ASYNC_ONLY_PATHS:
+            path = path.format(id=item_id)
+            results[path] = {'async': drive(async_url, path, args.concurrency, args.seconds)}
+    finally:
+        for server in servers:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=30)
+
+    results['concurrency'] = args.concurrency
+    print(json.dumps(results, indent=2))
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
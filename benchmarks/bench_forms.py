@@ -0,0 +1,12 @@
+"""Benchmarks for form construction (SearchForm queries the menu categories)."""
+from app.main.forms import OrderForm, SearchForm
+
+
+def bench_order_form(benchmark, app, dataset):
+    with app.test_request_context('/order'):
+        benchmark(OrderForm)
+
+
+def bench_search_form(benchmark, app, dataset):
+    with app.test_request_context('/search'):
+        benchmark(SearchForm)
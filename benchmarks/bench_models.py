@@ -0,0 +1,20 @@
+"""Benchmarks for model serialization and total calculation."""
+from app.models.order import OrderItem
+
+
+def bench_menu_item_to_dict(benchmark, dataset):
+    benchmark(dataset['menu_item'].to_dict)
+
+
+def bench_order_to_dict(benchmark, dataset):
+    benchmark(dataset['order'].to_dict)
+
+
+def bench_order_calculate_totals(benchmark, dataset):
+    benchmark(dataset['order'].calculate_totals)
+
+
+def bench_order_item_calculate_total(benchmark, dataset):
+    item = OrderItem(menu_item_id=dataset['menu_item'].id, item_name='Latte',
+                     item_price=dataset['menu_item'].price, quantity=3)
+    benchmark(item.calculate_total)
@@ -0,0 +1,50 @@
+"""Benchmarks for end-to-end route latency through the Flask test client."""
+import pytest
+
+GET_ROUTES = [
+    'main.index',
+    'main.menu',
+    'main.menu_item',
+    'main.search',
+    'main.my_orders',
+    'main.about',
+    'main.get_menu_items',
+    'main.get_menu_categories',
+]
+
+
+def _path(endpoint, dataset):
+    return {
+        'main.index': '/',
+        'main.menu': '/menu',
+        'main.menu_item': f'/menu/{dataset["menu_item"].id}',
+        'main.search': '/search?q=latte',
+        'main.my_orders': '/my-orders',
+        'main.about': '/about',
+        'main.get_menu_items': '/api/menu/items',
+        'main.get_menu_categories': '/api/menu/categories',
+    }[endpoint]
+
+
+@pytest.mark.parametrize('endpoint', GET_ROUTES)
+def bench_get(benchmark, client, dataset, endpoint):
+    path = _path(endpoint, dataset)
+
+    def get():
+        response = client.get(path)
+        assert response.status_code == 200, f'{path}: {response.status_code}'
+
+    benchmark(get)
+
+
+def bench_create_order(benchmark, client, dataset):
+    payload = {
+        'order_type': 'takeout',
+        'items': [{'id': dataset['menu_item'].id, 'quantity': 2}]
+    }
+
+    def post():
+        response = client.post('/api/orders', json=payload)
+        assert response.status_code == 201, response.get_data(as_text=True)
+
+    benchmark(post)
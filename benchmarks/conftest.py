@@ -0,0 +1,78 @@
+"""
+Fixtures for the micro-benchmark suite.
+
+Each benchmark runs against seeded datasets of several sizes (see
+``DATASET_SIZES``), generated with the same code as ``flask seed-synthetic``.
+
+Save a baseline and compare later runs against it; a regression beyond the
+threshold fails the run:
+
+    python -m pytest benchmarks -c benchmarks/pytest.ini --benchmark-autosave
+    python -m pytest benchmarks -c benchmarks/pytest.ini \\
+        --benchmark-compare --benchmark-compare-fail=mean:15%
+
+Results are stored as JSON under ``.benchmarks/``; use ``--benchmark-json=FILE``
+to write a single run elsewhere (e.g. as a CI artifact).
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models.menu_item import MenuItem
+from app.models.order import Order
+from app.models.user import User
+from app.utils.synthetic_data import SYNTHETIC_PASSWORD, generate_dataset
+
+# name -> (menu items, users, orders)
+DATASET_SIZES = {
+    'small': (20, 20, 200),
+    'medium': (200, 200, 5000),
+    'large': (2000, 1000, 50000),
+}
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app('testing')
+    app.config.update(SQL_STATS_RAISE=False, RATELIMIT_ENABLED=False)
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture(scope='session', params=list(DATASET_SIZES))
+def dataset(request, app):
+    """Seed the database for one dataset size and return sample rows."""
+    items, users, orders = DATASET_SIZES[request.param]
+    # Drop objects (and changes, e.g. from calculate_totals) of the previous size
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    generate_dataset(items, users, orders, seed=1)
+    db.session.remove()
+
+    # The busiest customer, so history pages are as full as they get
+    user_id = db.session.query(Order.user_id).group_by(Order.user_id)\
+                                            .order_by(db.func.count().desc()).limit(1).scalar()
+    return {
+        'size': request.param,
+        'menu_item': MenuItem.query.filter_by(is_available=True).first(),
+        'order': Order.query.filter_by(user_id=user_id).first(),
+        'user': db.session.get(User, user_id),
+    }
+
+
+@pytest.fixture
+def client(app, dataset):
+    """A test client logged in as the dataset's busiest customer."""
+    email = dataset['user'].email
+    # Requests reuse the pushed app context; a fresh one per test keeps
+    # Flask-Login's cached user (on g) from leaking across datasets
+    with app.app_context():
+        client = app.test_client()
+        response = client.post('/auth/login', data={'email': email, 'password': SYNTHETIC_PASSWORD})
+        assert response.status_code == 302, f'login failed: {response.status_code}'
+        yield client
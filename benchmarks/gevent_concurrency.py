@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+"""
+Concurrency benchmark for gevent mode (GEVENT_MODE).
+
+Runs the app's database layer inside a gevent-patched process, as a gevent
+gunicorn worker would, with many concurrent greenlets issuing a slow query
+through ``db.session``. Each mode runs in its own process:
+
+* ``off`` - default pool, blocking driver calls on the event loop
+* ``on``  - gevent mode: pool sized for the concurrency, SQLite calls in the
+  hub's thread pool (psycogreen for PostgreSQL)
+
+Besides query throughput and latency it reports the event loop lag seen by a
+heartbeat greenlet, i.e. how long a cheap request (a cached page, a health
+check) would have to wait while the queries run. In ``off`` mode the query
+latency looks low because it excludes the time greenlets spent waiting for
+the blocked loop; the loop lag shows that wait. On a single core gevent mode
+does not add throughput for CPU-bound queries; it keeps the worker responsive.
+
+By default a temporary SQLite database is seeded; pass ``--database-url`` to
+use PostgreSQL (the slow query is then ``pg_sleep``).
+
+Usage:
+    python benchmarks/gevent_concurrency.py [--concurrency 100] [--seconds 5]
+    python benchmarks/gevent_concurrency.py --database-url postgresql://user:pw@localhost/cafe
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+HEARTBEAT_INTERVAL = 0.01
+SQLITE_SLOW_QUERY = ('WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < :n) '
+                     'SELECT count(*) FROM c, (SELECT 1 FROM menu_items LIMIT 1)')
+POSTGRES_SLOW_QUERY = 'SELECT pg_sleep(:n / 1000000.0)'
+
+
+def child(mode, database_url, concurrency, seconds, cost):
+    """Run one mode in this (patched) process and print the results as JSON."""
+    from gevent import monkey
+    monkey.patch_all()
+
+    import time
+    import gevent
+    from sqlalchemy import text
+
+    os.environ.update(GEVENT_MODE=mode, DEV_DATABASE_URL=database_url, SQLITE_PERFORMANCE_PROFILE='true',
+                      LOG_LEVEL='WARNING')
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from app import create_app, db
+    from loadtest import percentile
+
+    app = create_app('development', web=False)
+    app.config['SQL_STATS_RAISE'] = False
+    query = text(POSTGRES_SLOW_QUERY if database_url.startswith('postgresql') else SQLITE_SLOW_QUERY)
+    if mode == 'on':
+        from app.utils.gevent_support import init_gevent_worker
+        init_gevent_worker(app, db)
+
+    latencies, lags, errors = [], [], [0]
+    deadline = time.monotonic() + seconds
+
+    def worker():
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                with app.app_context():
+                    db.session.execute(query, {'n': cost}).scalar()
+                    db.session.remove()
+            except Exception:
+                errors[0] += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    def heartbeat():
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            gevent.sleep(HEARTBEAT_INTERVAL)
+            lags.append(max(0.0, time.perf_counter() - started - HEARTBEAT_INTERVAL))
+
+    started = time.monotonic()
+    gevent.joinall([gevent.spawn(heartbeat)] + [gevent.spawn(worker) for _ in range(concurrency)])
+    elapsed = time.monotonic() - started
+
+    def ms(value):
+        return round(value * 1000, 1) if value is not None else None
+
+    print(json.dumps({
+        'queries': len(latencies),
+        'errors': errors[0],
+        'qps': round(len(latencies) / elapsed, 1),
+        'p50_ms': ms(percentile(latencies, 50)) if latencies else None,
+        'p99_ms': ms(percentile(latencies, 99)) if latencies else None,
+        'loop_lag_p50_ms': ms(percentile(lags, 50)) if lags else None,
+        'loop_lag_p99_ms': ms(percentile(lags, 99)) if lags else None,
+        'loop_lag_max_ms': ms(max(lags)) if lags else None
+    }))
+
+
+def run(mode, database_url, args):
+    cmd = [sys.executable, os.path.abspath(__file__), '--child', mode, '--database-url', database_url,
+           '--concurrency', str(args.concurrency), '--seconds', str(args.seconds), '--cost', str(args.cost)]
+    output = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--database-url', help='Database to query (default: a temporary SQLite file)')
+    parser.add_argument('--concurrency', type=int, default=100, help='Concurrent greenlets')
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--cost', type=int, default=20000,
+                        help='Rows generated per SQLite query, or microseconds of pg_sleep')
+    parser.add_argument('--child', choices=['on', 'off'], help=argparse.SUPPRESS)
+    parser.add_argument('--json', dest='json_path', help='Write results to this file')
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.database_url, args.concurrency, args.seconds, args.cost)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url
+        if not database_url:
+            sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+            from sqlite_concurrency import seed
+            path = os.path.join(tmp, 'bench.db')
+            seed(path)
+            database_url = f'sqlite:///{path}'
+        results = {mode: run(mode, database_url, args) for mode in ('off', 'on')}
+
+    results['concurrency'] = args.concurrency
+    print(json.dumps(results, indent=2))
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
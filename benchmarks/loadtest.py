@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+"""
+End-to-end load test for the Café application.
+
+Starts gunicorn with gunicorn_config.py (or targets an already running server
+with --url), logs in a pool of synthetic customers and drives the real routes
+with a weighted mix for a fixed duration:
+
+* ``/menu``                     - full menu page
+* ``/search?q=...``             - menu search
+* ``/my-orders``                - order history
+* ``POST /api/orders``          - order placement
+
+Reports throughput and latency percentiles per route; any response other
+than 2xx counts as an error. Seed the database first with ``flask
+seed-synthetic``; its customers all use the password 'password'.
+
+gunicorn_config.py runs the production config, which redirects plain HTTP to
+HTTPS, so every request claims to come through a TLS-terminating proxy
+(``X-Forwarded-Proto: https``) and redirects are never followed.
+
+Usage:
+    python benchmarks/loadtest.py [--concurrency 32] [--seconds 60] [--workers 4]
+    python benchmarks/loadtest.py --url http://127.0.0.1:5000 --concurrency 16
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEARCH_TERMS = ['latte', 'tea', 'muffin', 'vanilla', 'iced', 'salad', 'honey', 'cake']
+DEFAULT_MIX = 'menu=40,search=20,my_orders=20,create_order=20'
+CSRF_TOKEN = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+# Requests arrive as if through a TLS-terminating proxy
+PROXY_HEADERS = {'X-Forwarded-Proto': 'https'}
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Return redirects as responses (raised as HTTPError) instead of following them."""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class ProxiedCookiePolicy(http.cookiejar.DefaultCookiePolicy):
+    """Send Secure cookies over plain HTTP, as the proxy would over HTTPS."""
+
+    def return_ok_secure(self, cookie, request):
+        return True
+
+
+class Client:
+    """A logged-in customer with its own cookie jar."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar(ProxiedCookiePolicy())
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), NoRedirect
+        )
+
+    def request(self, path, data=None, json_body=None):
+        """Return the status and body of a request, without following redirects."""
+        status, _, body = self.send(path, data, json_body)
+        return status, body
+
+    def send(self, path, data=None, json_body=None):
+        headers = dict(PROXY_HEADERS)
+        if json_body is not None:
+            data = json.dumps(json_body).encode()
+            headers['Content-Type'] = 'application/json'
+        elif data is not None:
+            data = urllib.parse.urlencode(data).encode()
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers)
+        try:
+            with self.opener.open(req, timeout=60) as response:
+                return response.status, response.headers, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers, e.read()
+
+    def login(self, email, password):
+        """Log in; True if the form redirected away from the login page.
+
+        A rejected login re-renders the form with a 200.
+        """
+        status, body = self.request('/auth/login')
+        if status != 200:
+            return False
+        match = CSRF_TOKEN.search(body.decode('utf-8', 'replace'))
+        form = {'email': email, 'password': password}
+        if match:
+            form['csrf_token'] = match.group(1)
+        status, headers, _ = self.send('/auth/login', data=form)
+        location = urllib.parse.urlsplit(headers.get('Location', '')).path
+        return 300 <= status < 400 and bool(location) and not location.startswith('/auth/login')
+
+
+def build_actions(menu_ids):
+    def menu(client):
+        return client.request('/menu')
+
+    def search(client):
+        return client.request('/search?q=' + random.choice(SEARCH_TERMS))
+
+    def my_orders(client):
+        return client.request(f'/my-orders?page={random.randint(1, 3)}')
+
+    def create_order(client):
+        items = [{'id': item_id, 'quantity': random.randint(1, 3)}
+                 for item_id in random.sample(menu_ids, min(len(menu_ids), random.randint(1, 4)))]
+        return client.request('/api/orders', json_body={'order_type': 'takeout', 'items': items})
+
+    return {'menu': menu, 'search': search, 'my_orders': my_orders, 'create_order': create_order}
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(','):
+        name, weight = part.split('=')
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def summarize(samples, seconds):
+    latencies = [latency for latency, ok in samples]
+    errors = sum(1 for _, ok in samples if not ok)
+    if not latencies:
+        return {'requests': 0, 'errors': errors}
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / seconds, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+        'p90_ms': round(percentile(latencies, 90) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+        'max_ms': round(max(latencies) * 1000, 1)
+    }
+
+
+def wait_for_port(host, port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Server did not start listening on {host}:{port}')
+
+
+def start_gunicorn(port, workers, worker_class):
+    env = dict(os.environ, RATELIMIT_ENABLED='false')
+    cmd = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_config.py',
+           '-b', f'127.0.0.1:{port}', '--access-logfile', '/dev/null']
+    if workers:
+        cmd += ['--workers', str(workers)]
+    if worker_class:
+        cmd += ['--worker-class', worker_class]
+    cmd.append('wsgi:application')
+    server = subprocess.Popen(cmd, cwd=ROOT, env=env)
+    wait_for_port('127.0.0.1', port)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', help='Target a running server instead of starting gunicorn')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--workers', type=int, help='Override the gunicorn worker count')
+    parser.add_argument('--worker-class', help='Override the gunicorn worker class')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=60)
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='Route weights, e.g. ' + DEFAULT_MIX)
+    parser.add_argument('--first-user-id', type=int, default=2,
+                        help='Log in as user<id>@example.com starting from this id')
+    parser.add_argument('--password', default='password')
+    parser.add_argument('--json', dest='json_path', help='Write results to this file')
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        server = start_gunicorn(args.port, args.workers, args.worker_class)
+        base_url = f'http://127.0.0.1:{args.port}'
+
+    try:
+        status, body = Client(base_url).request('/api/menu/items')
+        menu_ids = [item['id'] for item in json.loads(body)] if status == 200 else []
+        actions = build_actions(menu_ids)
+        weights = parse_mix(args.mix)
+        if not menu_ids:
+            weights.pop('create_order', None)
+        names = list(weights)
+
+        clients = []
+        for n in range(args.concurrency):
+            client = Client(base_url)
+            try:
+                logged_in = client.login(f'user{args.first_user_id + n}@example.com', args.password)
+            except OSError:
+                logged_in = False
+            if not logged_in:
+                print(f'warning: login failed for user{args.first_user_id + n}', file=sys.stderr)
+            clients.append(client)
+
+        samples = {name: [] for name in names}
+        lock = threading.Lock()
+        deadline = time.monotonic() + args.seconds
+
+        def run(client):
+            while time.monotonic() < deadline:
+                name = random.choices(names, [weights[n] for n in names])[0]
+                started = time.perf_counter()
+                try:
+                    status, _ = actions[name](client)
+                    ok = 200 <= status < 300
+                except OSError:
+                    ok = False
+                latency = time.perf_counter() - started
+                with lock:
+                    samples[name].append((latency, ok))
+
+        threads = [threading.Thread(target=run, args=(client,)) for client in clients]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+    finally:
+        if server is not None:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=30)
+
+    results = {name: summarize(route_samples, elapsed) for name, route_samples in samples.items()}
+    results['total'] = summarize([s for route in samples.values() for s in route], elapsed)
+    results['concurrency'] = args.concurrency
+    results['seconds'] = round(elapsed, 1)
+
+    print(json.dumps(results, indent=2))
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
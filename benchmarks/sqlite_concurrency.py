@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+"""
+SQLite concurrency benchmark for the Café application.
+
+Runs reader and writer processes against a temporary SQLite file, once with
+the default settings and once with ``SQLITE_PERFORMANCE_PROFILE``. Readers run
+the menu query (available items of a category ordered by name); writers do
+what ``create_order`` does: insert an order with a few order items and commit.
+
+Reports throughput, latency percentiles and "database is locked" errors.
+
+Usage:
+    python benchmarks/sqlite_concurrency.py [--readers 4] [--writers 4] [--seconds 5]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.models.base import db
+from app.models.user import User
+from app.models.menu_item import MenuItem
+from app.models.order import Order, OrderItem
+from app.utils.sqlite import (DEFAULT_SQLITE_ENGINE_OPTIONS, DEFAULT_SQLITE_PRAGMAS,
+                              listen_for_sqlite_connect)
+
+CATEGORIES = ['Coffee', 'Tea', 'Bakery', 'Sandwiches', 'Desserts']
+
+
+def make_engine(path, profile):
+    """Create an engine the same way create_app would for the given profile."""
+    url = f'sqlite:///{path}'
+    if not profile:
+        return create_engine(url)
+    options = dict(DEFAULT_SQLITE_ENGINE_OPTIONS)
+    options['connect_args'] = {
+        'timeout': DEFAULT_SQLITE_PRAGMAS['busy_timeout'] / 1000.0,
+        'check_same_thread': False
+    }
+    engine = create_engine(url, **options)
+    listen_for_sqlite_connect(engine, DEFAULT_SQLITE_PRAGMAS)
+    return engine
+
+
+def seed(path, items=200):
+    engine = create_engine(f'sqlite:///{path}')
+    db.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(User(email='bench@cafe.com', username='bench', password_hash='x'))
+        for i in range(items):
+            session.add(MenuItem(
+                name=f'Item {i}',
+                price=random.randint(100, 900) / 100,
+                category=CATEGORIES[i % len(CATEGORIES)],
+                is_available=True
+            ))
+        session.commit()
+    engine.dispose()
+
+
+def reader(path, profile, seconds, results):
+    engine = make_engine(path, profile)
+    latencies, errors = [], 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            with Session(engine) as session:
+                session.query(MenuItem).filter_by(
+                    category=random.choice(CATEGORIES), is_available=True
+                ).order_by(MenuItem.name).all()
+            latencies.append(time.perf_counter() - started)
+        except OperationalError:
+            errors += 1
+    results.put(('read', latencies, errors))
+
+
+def writer(path, profile, seconds, results):
+    engine = make_engine(path, profile)
+    latencies, errors, n = [], 0, 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        n += 1
+        started = time.perf_counter()
+        try:
+            with Session(engine) as session:
+                menu_items = session.query(MenuItem).filter(
+                    MenuItem.id.in_(random.sample(range(1, 201), 3))
+                ).all()
+                order = Order(user_id=1, order_type='takeout', status='pending',
+                              order_number=f'B{os.getpid()}-{n}')
+                for menu_item in menu_items:
+                    order.items.append(OrderItem(
+                        menu_item_id=menu_item.id,
+                        item_name=menu_item.name,
+                        item_price=menu_item.price,
+                        quantity=random.randint(1, 3)
+                    ))
+                order.calculate_totals()
+                session.add(order)
+                session.commit()
+            latencies.append(time.perf_counter() - started)
+        except OperationalError:
+            errors += 1
+    results.put(('write', latencies, errors))
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run(profile, readers, writers, seconds):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        seed(path)
+        results = multiprocessing.Queue()
+        procs = [multiprocessing.Process(target=reader, args=(path, profile, seconds, results))
+                 for _ in range(readers)]
+        procs += [multiprocessing.Process(target=writer, args=(path, profile, seconds, results))
+                  for _ in range(writers)]
+        for proc in procs:
+            proc.start()
+        collected = [results.get() for _ in procs]
+        for proc in procs:
+            proc.join()
+
+    summary = {}
+    for kind in ('read', 'write'):
+        latencies = [l for k, lats, _ in collected if k == kind for l in lats]
+        errors = sum(e for k, _, e in collected if k == kind)
+        summary[kind] = {
+            'ops_per_sec': round(len(latencies) / seconds, 1),
+            'p50_ms': round(statistics.median(latencies) * 1000, 2) if latencies else None,
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+            'locked_errors': errors
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--json', dest='json_path', help='Write results to this file')
+    args = parser.parse_args()
+
+    results = {
+        'default': run(False, args.readers, args.writers, args.seconds),
+        'profile': run(True, args.readers, args.writers, args.seconds)
+    }
+    print(json.dumps(results, indent=2))
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+Startup-time benchmark for the Café application.
+
+Each run starts a fresh interpreter and measures:
+
+* ``import``        - time to import the ``app`` package
+* ``create_app``    - time spent in the application factory
+* ``first_request`` - time to serve the first request with the test client
+
+Usage:
+    python benchmarks/startup.py [--runs 10] [--config testing] [--cli] [--json out.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json, sys, time
+started = time.perf_counter()
+from app import create_app, db
+imported = time.perf_counter()
+app = create_app(sys.argv[1], web=sys.argv[2] != 'cli')
+created = time.perf_counter()
+first_request = None
+if sys.argv[2] != 'cli':
+    # Part of the first request: the in-memory testing database starts empty
+    with app.app_context():
+        db.create_all()
+    response = app.test_client().get(sys.argv[3])
+    first_request = time.perf_counter() - created
+    if response.status_code != 200:
+        sys.exit(f'{sys.argv[3]} returned {response.status_code}')
+print(json.dumps({
+    'import': imported - started,
+    'create_app': created - imported,
+    'first_request': first_request,
+    'modules': len(sys.modules)
+}))
+'''
+
+
+def run_once(config_name, mode, path):
+    """Run one cold start in a subprocess and return its timings."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1', WARMUP_ON_PRELOAD='false')
+    output = subprocess.check_output(
+        [sys.executable, '-c', CHILD, config_name, mode, path],
+        cwd=ROOT, env=env
+    )
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def summarize(samples, key):
+    values = [s[key] for s in samples if s[key] is not None]
+    if not values:
+        return None
+    return {
+        'median_ms': round(statistics.median(values) * 1000, 2),
+        'min_ms': round(min(values) * 1000, 2),
+        'max_ms': round(max(values) * 1000, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--config', default='testing')
+    parser.add_argument('--path', default='/api/menu/categories',
+                        help='URL used for the first request')
+    parser.add_argument('--cli', action='store_true',
+                        help='Measure CLI startup (create_app(web=False), no request)')
+    parser.add_argument('--json', dest='json_path', help='Write results to this file')
+    args = parser.parse_args()
+
+    mode = 'cli' if args.cli else 'web'
+    samples = [run_once(args.config, mode, args.path) for _ in range(args.runs)]
+    results = {
+        'mode': mode,
+        'runs': args.runs,
+        'import': summarize(samples, 'import'),
+        'create_app': summarize(samples, 'create_app'),
+        'first_request': summarize(samples, 'first_request'),
+        'modules': samples[-1]['modules']
+    }
+
+    print(json.dumps(results, indent=2))
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
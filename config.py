@@ -17,6 +17,70 @@ class Config:
         'sqlite:///' + os.path.join(basedir, 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = DEBUG  # Log SQL queries in debug mode
+    # WAL, busy timeout and cache pragmas for SQLite (True, or a dict of
+    # pragma overrides); see app/utils/sqlite.py
+    SQLITE_PERFORMANCE_PROFILE = os.environ.get('SQLITE_PERFORMANCE_PROFILE', 'false').lower() in ['true', 'on', '1']
+    
+    # gevent mode for the database layer (see app/utils/gevent_support.py):
+    # 'on', 'off' or 'auto' (on when gevent has patched the process).
+    # gunicorn_config.py turns it on for gevent workers.
+    GEVENT_MODE = os.environ.get('GEVENT_MODE', 'auto')
+    GEVENT_DB_POOL_SIZE = int(os.environ.get('GEVENT_DB_POOL_SIZE', 20))
+    GEVENT_DB_MAX_OVERFLOW = None  # Default: ADMISSION_MAX_IN_FLIGHT - GEVENT_DB_POOL_SIZE
+    GEVENT_DB_POOL_TIMEOUT = 5  # Seconds to wait for a connection before failing
+    GEVENT_SQLITE_THREADPOOL = True  # Run SQLite calls in the hub's thread pool
+    
+    # Read replicas (comma-separated URLs) used by the read-only views;
+    # clients stick to the primary for a few seconds after they write
+    REPLICA_DATABASE_URLS = [url.strip() for url in os.environ.get('REPLICA_DATABASE_URLS', '').split(',') if url.strip()]
+    REPLICA_STICKY_SECONDS = 5
+    
+    # Optional ASGI menu API (see app/async_api.py); reads from the first
+    # replica or the primary unless overridden
+    ASYNC_API_DATABASE_URL = os.environ.get('ASYNC_API_DATABASE_URL')
+    ASYNC_API_POOL_SIZE = int(os.environ.get('ASYNC_API_POOL_SIZE', 10))
+    ASYNC_API_CACHE_SECONDS = 5  # Item and category lists kept in memory
+    ASYNC_API_SEARCH_LIMIT = 50
+    
+    # Per-request SQL statistics: report in a Server-Timing header and warn
+    # (or raise QueryBudgetError with SQL_STATS_RAISE) over these limits
+    SQL_STATS_ENABLED = True
+    SQL_STATS_SERVER_TIMING = True
+    SQL_QUERY_LIMIT = int(os.environ.get('SQL_QUERY_LIMIT', 20))
+    SQL_REPEAT_LIMIT = int(os.environ.get('SQL_REPEAT_LIMIT', 5))
+    SQL_STATS_RAISE = False
+    
+    # Prometheus metrics endpoint; set METRICS_TOKEN to require a bearer token
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ['true', 'on', '1']
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    METRICS_REQUIRE_TOKEN = False  # Without a token, don't serve /metrics at all
+    
+    # On-demand request profiling (admin only, see app/utils/profiler.py);
+    # profiles are written to instance/profiles unless PROFILER_DIR is set
+    PROFILER_ENABLED = os.environ.get('PROFILER_ENABLED', 'true').lower() in ['true', 'on', '1']
+    PROFILER_DIR = os.environ.get('PROFILER_DIR')
+    PROFILER_INTERVAL = 0.005  # Seconds between stack samples
+    PROFILER_MAX_DURATION = 600  # Longest the profiling switch may stay on
+    PROFILER_TOKEN_MAX_AGE = 3600  # Lifetime of X-Profile-Token tokens
+    PROFILER_KEEP = 50  # Saved profiles kept per directory
+    
+    # Worker memory diagnostics (see app/utils/memory.py): tracemalloc
+    # snapshots via /admin/memory/snapshot or `kill -USR2 <worker pid>`
+    MEMORY_SNAPSHOT_SIGNAL = os.environ.get('MEMORY_SNAPSHOT_SIGNAL', 'SIGUSR2')
+    MEMORY_TRACE_FRAMES = 10  # Frames kept per allocation traceback
+    MEMORY_REPORT_DIR = os.environ.get('MEMORY_REPORT_DIR')  # Default: instance/memory
+    MEMORY_REPORTS_KEEP = 50
+    METRICS_PROCESS_INTERVAL = 10  # Seconds between RSS/GC metric updates per worker
+    
+    # Logging (see app/utils/structured_logging.py): records are queued and
+    # written by a background thread; past LOG_QUEUE_SIZE they are dropped
+    LOG_LEVEL = os.environ.get('LOG_LEVEL')
+    LOG_FILE = os.environ.get('LOG_FILE')
+    LOG_JSON = os.environ.get('LOG_JSON', 'false').lower() in ['true', 'on', '1']
+    LOG_STREAM = 'stdout'
+    LOG_ACCESS = os.environ.get('LOG_ACCESS', 'true').lower() in ['true', 'on', '1']
+    LOG_QUEUE_ENABLED = True
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
     
     # Session settings
     PERMANENT_SESSION_LIFETIME = timedelta(days=1)
@@ -29,12 +93,27 @@ class Config:
     WTF_CSRF_SECRET_KEY = os.environ.get('CSRF_SECRET_KEY') or os.urandom(24).hex()
     SECURITY_PASSWORD_SALT = os.environ.get('SECURITY_PASSWORD_SALT') or 'dev-password-salt-change-in-production'
     RATELIMIT_DEFAULT = '200 per day;50 per hour'
+    # Disabled by benchmarks/loadtest.py, which sends all traffic from one IP
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', 'true').lower() in ['true', 'on', '1']
     
     # Upload settings
     UPLOAD_FOLDER = os.path.join(basedir, 'app', 'static', 'uploads')
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
     MAX_CONTENT_LENGTH = 2 * 1024 * 1024  # 2MB max file size
     
+    # Static files (see app/utils/static_assets.py); run `flask build-assets`
+    # to serve content-hashed, precompressed copies with immutable caching
+    STATIC_FOLDER = os.path.join(basedir, 'static')
+    STATIC_WHITENOISE = True
+    STATIC_MAX_AGE = 3600  # Cache lifetime for files requested by their original name
+    
+    # Response compression (see app/utils/compression.py)
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() in ['true', 'on', '1']
+    COMPRESSION_MIN_SIZE = 500  # Bytes; smaller bodies are sent as is
+    COMPRESSION_LEVEL = 6  # gzip
+    COMPRESSION_BROTLI_QUALITY = 5  # Higher is much slower for dynamic responses
+    COMPRESSION_CACHE_SIZE = 8 * 1024 * 1024  # Bytes of compressed copies kept by ETag
+    
     # Email settings
     MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
     MAIL_PORT = int(os.environ.get('MAIL_PORT', 587))
@@ -50,6 +129,64 @@ class Config:
     APP_NAME = 'Café Website'
     APP_VERSION = '1.0.0'
     
+    # Performance settings
+    WARMUP_ON_PRELOAD = os.environ.get('WARMUP_ON_PRELOAD', 'true').lower() in ['true', 'on', '1']
+    MENU_SNAPSHOT_CHECK_INTERVAL = 5  # Seconds between menu version checks
+    
+    # Micro-cache for anonymous public pages (see app/utils/page_cache.py)
+    PAGE_CACHE_ENABLED = os.environ.get('PAGE_CACHE_ENABLED', 'true').lower() in ['true', 'on', '1']
+    PAGE_CACHE_ENDPOINTS = ('main.index', 'main.menu', 'main.menu_item', 'main.about')
+    PAGE_CACHE_TTL = int(os.environ.get('PAGE_CACHE_TTL', 5))  # Seconds
+    PAGE_CACHE_MAX_ENTRIES = 500  # Per worker
+    
+    # {% cache %} template fragments (see app/utils/fragment_cache.py)
+    FRAGMENT_CACHE_ENABLED = os.environ.get('FRAGMENT_CACHE_ENABLED', 'true').lower() in ['true', 'on', '1']
+    FRAGMENT_CACHE_TTL = 300  # Seconds; menu edits invalidate fragments sooner
+    
+    # Admission control / load shedding (see app/utils/admission.py).
+    # Pressure is max(in flight / MAX_IN_FLIGHT, queueing delay / MAX_DELAY);
+    # a priority class is shed from the pressure given for it.
+    ADMISSION_CONTROL_ENABLED = os.environ.get('ADMISSION_CONTROL_ENABLED', 'true').lower() in ['true', 'on', '1']
+    ADMISSION_MAX_IN_FLIGHT = int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', 200))  # Per worker
+    ADMISSION_MAX_DELAY = float(os.environ.get('ADMISSION_MAX_DELAY', 1.0))  # Seconds
+    ADMISSION_PRIORITY_CLASSES = {'low': 0.5, 'normal': 0.75, 'high': 0.9, 'critical': 1.0}
+    ADMISSION_DEFAULT_PRIORITY = 'normal'
+    ADMISSION_ROUTE_PRIORITIES = {
+        'main.search': 'low',
+        'main.my_orders': 'low',
+        'main.get_menu_items': 'low',
+        'main.get_menu_categories': 'low',
+        'main.order_eta': 'low',
+        'auth.login': 'high',
+        'POST main.order': 'critical',
+        'main.create_order': 'critical',
+        'static': 'critical',
+        'metrics': 'critical',
+    }
+    ADMISSION_RETRY_AFTER = 5  # Seconds
+    # Only behind a proxy that overwrites X-Request-Start; clients can send it too
+    ADMISSION_TRUST_REQUEST_START = os.environ.get('ADMISSION_TRUST_REQUEST_START', 'false').lower() in ['true', 'on', '1']
+    ADMISSION_MAX_REQUEST_START_DELAY = 120  # Seconds (gunicorn timeout); longer header delays are bogus
+    
+    # "Trending now" items (see app/utils/trending.py)
+    TRENDING_ENABLED = os.environ.get('TRENDING_ENABLED', 'true').lower() in ['true', 'on', '1']
+    TRENDING_SIZE = 12  # Items kept in the list
+    TRENDING_INDEX_ITEMS = 6  # Shown on the home page
+    TRENDING_HALF_LIFE_HOURS = float(os.environ.get('TRENDING_HALF_LIFE_HOURS', 6))
+    TRENDING_WINDOW_HOURS = 72  # Hourly sales older than this are pruned
+    TRENDING_FLUSH_INTERVAL = 30  # Seconds between writes of a worker's counts
+    TRENDING_REFRESH_INTERVAL = 60  # Seconds between recomputing the list
+    
+    # Prep time sketches and order ETAs (see app/utils/prep_times.py)
+    PREP_TIME_SKETCH_ACCURACY = 0.02  # Relative error; run `flask rebuild-prep-times` after changing it
+    PREP_TIME_REFRESH_INTERVAL = 60  # Seconds between reloading the sketches
+    ETA_MIN_SAMPLES = 20  # Orders a sketch needs before it is used
+    ETA_DEFAULT_PREP_MINUTES = 10  # Until the kitchen has history
+    ETA_KITCHEN_CAPACITY = int(os.environ.get('ETA_KITCHEN_CAPACITY', 3))  # Orders prepared in parallel
+    
+    # Lifetime customer stats on User (see app/utils/user_stats.py)
+    USER_STATS_TOP_ITEMS = 3  # Favourite items kept per customer
+    
     @staticmethod
     def init_app(app):
         pass
@@ -62,6 +199,11 @@ class DevelopmentConfig(Config):
 class TestingConfig(Config):
     TESTING = True
     WTF_CSRF_ENABLED = False
+    SQL_STATS_RAISE = True  # Fail tests on N+1 queries
+    LOG_QUEUE_ENABLED = False  # Keep logging synchronous so tests can capture it
+    PAGE_CACHE_ENABLED = False
+    ADMISSION_CONTROL_ENABLED = False
+    RATELIMIT_ENABLED = False  # Read by Flask-Limiter at init_app
     SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL') or 'sqlite:///:memory:'
 
 class ProductionConfig(Config):
@@ -72,6 +214,10 @@ class ProductionConfig(Config):
     RATELIMIT_DEFAULT = '200 per day;50 per hour'
     LOG_LEVEL = 'WARNING'
     LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    LOG_JSON = os.environ.get('LOG_JSON', 'true').lower() in ['true', 'on', '1']
+    SQLITE_PERFORMANCE_PROFILE = os.environ.get('SQLITE_PERFORMANCE_PROFILE', 'true').lower() in ['true', 'on', '1']
+    SQL_STATS_SERVER_TIMING = False  # Don't expose DB timings publicly
+    METRICS_REQUIRE_TOKEN = True  # Never expose /metrics publicly
     CACHE_TYPE = 'FileSystemCache'
     CACHE_DIR = os.path.join(basedir, 'instance', 'cache')
     CACHE_DEFAULT_TIMEOUT = 300  # 5 minutes
@@ -80,15 +226,8 @@ class ProductionConfig(Config):
     API_PREFIX = '/api/v1'
 
 class DockerConfig(ProductionConfig):
-    @classmethod
-    def init_app(cls, app):
-        ProductionConfig.init_app(app)
-        # Log to stderr
-        import logging
-        from logging import StreamHandler
-        file_handler = StreamHandler()
-        file_handler.setLevel(logging.INFO)
-        app.logger.addHandler(file_handler)
+    # Log to stderr, through the same non-blocking queue as everything else
+    LOG_STREAM = 'stderr'
 
 # Configuration dictionary
 config = {
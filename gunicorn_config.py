@@ -6,6 +6,8 @@ This file contains production-ready configuration for Gunicorn.
 
 import multiprocessing
 import os
+import shutil
+import tempfile
 
 # Server socket
 bind = '0.0.0.0:5000'  # Listen on all network interfaces
@@ -15,12 +17,17 @@ backlog = 2048  # Maximum number of pending connections
 workers = multiprocessing.cpu_count() * 2 + 1  # Optimal worker count
 worker_class = 'gevent'  # Using gevent for async workers
 worker_connections = 1000  # Maximum number of simultaneous clients per worker
+# Cooperative DB access and pool sizing for gevent workers (app/utils/gevent_support.py).
+# Set before the app is preloaded, so the engine is created with the gevent pool size.
+os.environ.setdefault('GEVENT_MODE', 'on' if worker_class == 'gevent' else 'off')
 timeout = 30  # Worker timeout in seconds
 keepalive = 2  # Seconds to keep connections alive
 
 # Logging
 loglevel = 'info'  # Log level
-accesslog = '-'  # Log to stdout
+# The app writes JSON access records (with request id and DB time) through its
+# non-blocking log queue; set GUNICORN_ACCESS_LOG=- to also get gunicorn's
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
 errorlog = '-'   # Log errors to stderr
 access_log_format = '%(h)s %(l)s %(u)s; %(t)s; "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s"'  # Log format
 
@@ -28,10 +35,14 @@ access_log_format = '%(h)s %(l)s %(u)s; %(t)s; "%(r)s" %(s)s %(b)s "%(f)s" "%(a)
 proc_name = 'cafe_app'  # Process name
 
 # Security
-# Preload the application before forking worker processes
+# Preload the application before forking worker processes.
+# wsgi.py warms up the menu snapshot and templates in the master
+# (WARMUP_ON_PRELOAD), so workers share them copy-on-write.
 preload_app = True
 
-# Maximum number of requests a worker will process before restarting
+# Maximum number of requests a worker will process before restarting.
+# Tune from cafe_worker_rss_bytes vs cafe_worker_requests in /metrics and
+# tracemalloc reports (/admin/memory) rather than lowering this blindly.
 max_requests = 1000
 max_requests_jitter = 50  # Random jitter to prevent all workers restarting at once
 
@@ -39,6 +50,42 @@ max_requests_jitter = 50  # Random jitter to prevent all workers restarting at o
 timeout = 120  # seconds
 graceful_timeout = 30  # seconds
 
+# Metrics: workers write their values to per-process files in this directory,
+# which /metrics merges (see app/utils/metrics.py). Must be set before the
+# app is imported, hence here rather than in raw_env.
+prometheus_multiproc_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'cafe_metrics')
+)
+os.makedirs(prometheus_multiproc_dir, exist_ok=True)
+
+def on_starting(server):
+    """Drop metric files left over from a previous run."""
+    shutil.rmtree(prometheus_multiproc_dir, ignore_errors=True)
+    os.makedirs(prometheus_multiproc_dir, exist_ok=True)
+
+def post_worker_init(worker):
+    """Finish gevent mode and take a tracemalloc snapshot on SIGUSR2.
+
+    Runs after the gevent worker has monkey-patched the process.
+    """
+    from flask import Flask
+    from app import db
+    from app.utils.gevent_support import init_gevent_worker
+    from app.utils.memory import install_signal_handler
+    if isinstance(worker.wsgi, Flask):
+        init_gevent_worker(worker.wsgi, db)
+        install_signal_handler(worker.wsgi)
+
+def worker_exit(server, worker):
+    """Write the trending item sales the worker has not flushed yet."""
+    from app.utils.trending import flush_pending_sales
+    flush_pending_sales()
+
+def child_exit(server, worker):
+    """Stop reporting live gauges for a worker that has exited."""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
 # Environment variables
 raw_env = [
     'FLASK_APP=wsgi.py',
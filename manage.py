@@ -3,15 +3,15 @@
 Command-line utility for administrative tasks.
 """
 import os
+import click
 from app import create_app, db
 from app.models.user import User
 from app.models.menu_item import MenuItem
 from app.models.order import Order, OrderItem
-from flask_migrate import Migrate, upgrade, migrate, init, stamp
 
-# Create the application instance
-app = create_app(os.getenv('FLASK_CONFIG') or 'default')
-migrate = Migrate(app, db)
+# Create the application instance without the page-serving extensions
+# (Talisman, Bootstrap, Moment); Flask-Migrate is set up by create_app
+app = create_app(os.getenv('FLASK_CONFIG') or 'default', web=False)
 
 # Make shell context available
 @app.shell_context_processor
@@ -28,21 +28,18 @@ def make_shell_context():
 @app.cli.command()
 def deploy():
     """Run deployment tasks."""
-    # Migrate database to latest revision
-    upgrade()
-    
-    # Create default admin user if it doesn't exist
-    admin_email = app.config.get('ADMIN_EMAIL', 'admin@cafewebsite.com')
-    if not User.query.filter_by(email=admin_email).first():
-        admin = User(
-            username='admin',
-            email=admin_email,
-            first_name='Admin',
-            is_admin=True
-        )
-        admin.password = os.getenv('ADMIN_PASSWORD', 'admin123')
-        db.session.add(admin)
-        db.session.commit()
+    from app.utils.startup import ensure_admin_user, upgrade_schema
+    
+    # Migrate database to latest revision (stamping databases that predate
+    # migrations with the baseline revision first)
+    upgrade_schema(app)
+    
+    # Fingerprinted, precompressed static files (see build-assets)
+    from app.utils.static_assets import build_assets
+    build_assets(app.config.get('STATIC_FOLDER') or app.static_folder)
+    
+    # Create default admin user if it doesn't exist (no longer done by create_app)
+    if ensure_admin_user(app):
         print('Created default admin user')
     
     # Add sample menu items if none exist
@@ -94,5 +91,172 @@ def deploy():
         db.session.commit()
         print('Added sample menu items')
 
+@app.cli.command('replica-sync')
+def replica_sync():
+    """Copy the primary SQLite database into each local SQLite read replica."""
+    import sqlite3
+    from sqlalchemy.engine import make_url
+    
+    primary = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if primary.get_backend_name() != 'sqlite':
+        print('replica-sync only supports SQLite databases')
+        return
+    
+    for url in app.config.get('REPLICA_DATABASE_URLS', []):
+        replica = make_url(url)
+        if replica.get_backend_name() != 'sqlite':
+            print(f'Skipping non-SQLite replica {replica!r}')
+            continue
+        source = sqlite3.connect(primary.database)
+        target = sqlite3.connect(replica.database)
+        with target:
+            source.backup(target)
+        source.close()
+        target.close()
+        print(f'Synced {primary.database} -> {replica.database}')
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Fail if a hot route query falls back to a table scan or temp B-tree sort."""
+    from app.utils.query_plans import check_query_plans
+    
+    results = check_query_plans(db.engine)
+    if results is None:
+        print(f'Skipped: query-plan checks only support SQLite, not {db.engine.dialect.name}')
+        return
+    
+    failed = False
+    for name, (details, problems) in results.items():
+        status = 'FAIL' if problems else 'ok'
+        print(f'[{status}] {name}: ' + ' | '.join(details))
+        failed = failed or bool(problems)
+    
+    if failed:
+        raise SystemExit(1)
+
+@app.cli.command('rebuild-trending')
+@click.option('--hours', type=int, help='Hours of order history to recount (default: TRENDING_WINDOW_HOURS).')
+def rebuild_trending_command(hours):
+    """Recompute the hourly item sales behind the trending list from orders."""
+    from app.utils.trending import rebuild_item_sales
+    
+    rows = rebuild_item_sales(hours)
+    print(f'Wrote {rows} hourly item sales rows')
+
+@app.cli.command('rebuild-prep-times')
+def rebuild_prep_times_command():
+    """Recompute the prep time sketches behind order ETAs from order history."""
+    from app.utils.prep_times import rebuild_prep_time_sketches
+    
+    orders = rebuild_prep_time_sketches()
+    print(f'Counted {orders} orders in the prep time sketches')
+
+@app.cli.command('backfill-user-stats')
+@click.option('--chunk-size', default=1000, show_default=True, help='Users per top items batch.')
+def backfill_user_stats_command(chunk_size):
+    """Recompute customers' lifetime order stats from their completed orders."""
+    from app.utils.user_stats import backfill_user_stats
+    
+    users = backfill_user_stats(chunk_size)
+    print(f'Updated lifetime stats for {users} customers with completed orders')
+
+@app.cli.command('migrate-legacy-orders')
+@click.option('--source', default='database.db', show_default=True,
+              help='Legacy app.py SQLite database.')
+@click.option('--checkpoint', default=os.path.join('instance', 'legacy_orders_checkpoint.json'),
+              show_default=True, help='Progress file used to resume the migration.')
+@click.option('--chunk-size', default=1000, show_default=True, help='Legacy rows per transaction.')
+@click.option('--pause', default=0.0, show_default=True, help='Seconds to sleep between chunks.')
+@click.option('--user-email', default='kiosk@cafewebsite.com', show_default=True,
+              help='Account the legacy kiosk orders are attributed to (created if missing).')
+def migrate_legacy_orders_command(source, checkpoint, chunk_size, pause, user_email):
+    """Stream legacy JSON-blob orders into the orders/order_items tables."""
+    from app.utils.legacy_orders import migrate_legacy_orders
+    
+    user = User.query.filter_by(email=user_email).first()
+    if user is None:
+        user = User(username='kiosk', email=user_email, first_name='Kiosk', is_active=False)
+        user.password = os.urandom(16).hex()
+        db.session.add(user)
+        db.session.commit()
+        print(f'Created kiosk user {user_email}')
+    
+    def progress(last_id, stats):
+        print(f'... legacy id {last_id}: {stats["orders"]} orders, {stats["items"]} items, '
+              f'{stats["skipped"]} skipped, {stats["invalid"]} invalid')
+    
+    stats = migrate_legacy_orders(source, user.id, checkpoint_path=checkpoint,
+                                  chunk_size=chunk_size, pause=pause, progress=progress)
+    for error in stats['errors']:
+        print(f'Invalid legacy order {error}')
+    print(f'Migrated {stats["orders"]} orders ({stats["items"]} items); '
+          f'{stats["skipped"]} already migrated, {stats["invalid"]} invalid')
+
+@app.cli.command('menu-import')
+@click.argument('path')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'json']),
+              help='File format (defaults to the file extension).')
+@click.option('--dry-run', is_flag=True, help='Show the diff without saving anything.')
+def menu_import(path, fmt, dry_run):
+    """Upsert menu items from a CSV or JSON file, keyed on name."""
+    from app.exceptions import ValidationError
+    from app.utils.menu_io import read_menu_file, import_menu
+    
+    try:
+        rows = read_menu_file(path, fmt)
+        diff = import_menu(rows, dry_run=dry_run)
+    except ValidationError as e:
+        raise click.ClickException(str(e))
+    
+    for name in diff['added']:
+        print(f'+ {name}')
+    for name, changes in diff['updated'].items():
+        fields = ', '.join(f'{field}: {old!r} -> {new!r}' for field, (old, new) in changes.items())
+        print(f'~ {name} ({fields})')
+    print(f'{len(diff["added"])} added, {len(diff["updated"])} updated, '
+          f'{len(diff["unchanged"])} unchanged' + (' (dry run, nothing saved)' if dry_run else ''))
+
+@app.cli.command('menu-export')
+@click.argument('path')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'json']),
+              help='File format (defaults to the file extension).')
+def menu_export(path, fmt):
+    """Export all menu items to a CSV or JSON file."""
+    from app.utils.menu_io import export_menu
+    
+    count = export_menu(path, fmt)
+    print(f'Exported {count} menu items to {path}')
+
+@app.cli.command('seed-synthetic')
+@click.option('--items', default=2000, show_default=True, help='Menu items to create.')
+@click.option('--users', default=100000, show_default=True, help='Customers to create.')
+@click.option('--orders', default=1000000, show_default=True, help='Orders to create.')
+@click.option('--days', default=365, show_default=True, help='Spread order dates over this many days.')
+@click.option('--seed', type=int, help='Random seed for a reproducible dataset.')
+def seed_synthetic(items, users, orders, days, seed):
+    """Fill the database with a large synthetic dataset for performance testing.
+    
+    All generated customers can log in with the password 'password'.
+    """
+    from app.utils.synthetic_data import generate_dataset
+    
+    generate_dataset(items, users, orders, days=days, seed=seed, progress=print)
+    print('Synthetic dataset created')
+
+@app.cli.command('build-assets')
+@click.option('--no-compress', is_flag=True, help='Skip the gzip/brotli variants.')
+@click.option('--clean', is_flag=True, help='Remove hashed files from previous builds.')
+def build_assets_command(no_compress, clean):
+    """Fingerprint and precompress the static files and write the asset manifest."""
+    from app.utils.static_assets import brotli, build_assets
+    
+    static_folder = app.config.get('STATIC_FOLDER') or app.static_folder
+    manifest = build_assets(static_folder, compress=not no_compress, clean=clean)
+    for name, hashed in sorted(manifest.items()):
+        print(f'{name} -> {hashed}')
+    if not no_compress and brotli is None:
+        print('brotli is not installed; only gzip variants were written')
+    print(f'Built {len(manifest)} assets; restart the app to load the new manifest')
+
 if __name__ == '__main__':
     app.cli()
\ No newline at end of file
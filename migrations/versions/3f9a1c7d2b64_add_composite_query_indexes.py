@@ -0,0 +1,44 @@
+"""Add composite indexes for the menu and order history queries
+
+Revision ID: 3f9a1c7d2b64
+Revises: c61209002771
+Create Date: 2026-10-19 10:52:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a1c7d2b64'
+down_revision = 'c61209002771'
+branch_labels = None
+depends_on = None
+
+
+def _index_names(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    # Databases that fell back to db.create_all() already have these indexes
+    menu_indexes = _index_names('menu_items')
+    order_indexes = _index_names('orders')
+    # Menu pages: filter_by(is_available, category).order_by(name)
+    if 'ix_menu_items_available_category_name' not in menu_indexes:
+        op.create_index('ix_menu_items_available_category_name', 'menu_items',
+                        ['is_available', 'category', 'name'], unique=False)
+    # Order history: filter_by(user_id).order_by(order_date desc)
+    if 'ix_orders_user_id_order_date' not in order_indexes:
+        op.create_index('ix_orders_user_id_order_date', 'orders',
+                        ['user_id', 'order_date'], unique=False)
+    # Order queues: filter_by(status).order_by(order_date desc)
+    if 'ix_orders_status_order_date' not in order_indexes:
+        op.create_index('ix_orders_status_order_date', 'orders',
+                        ['status', 'order_date'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_orders_status_order_date', table_name='orders')
+    op.drop_index('ix_orders_user_id_order_date', table_name='orders')
+    op.drop_index('ix_menu_items_available_category_name', table_name='menu_items')
@@ -0,0 +1,40 @@
+"""Add hourly item sales for the trending list
+
+Revision ID: a7e4c2d95b10
+Revises: 3f9a1c7d2b64
+Create Date: 2026-10-19 14:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7e4c2d95b10'
+down_revision = '3f9a1c7d2b64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases that fell back to db.create_all() already have the table
+    if sa.inspect(op.get_bind()).has_table('item_sales'):
+        return
+    op.create_table('item_sales',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('menu_item_id', sa.Integer(), nullable=False),
+    sa.Column('period_start', sa.DateTime(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['menu_item_id'], ['menu_items.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('menu_item_id', 'period_start', name='uq_item_sales_item_period')
+    )
+    # Window reads and pruning: filter(period_start >= cutoff)
+    op.create_index('ix_item_sales_period_start', 'item_sales', ['period_start'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_item_sales_period_start', table_name='item_sales')
+    op.drop_table('item_sales')
@@ -0,0 +1,37 @@
+"""Add prep time sketch buckets for order ETAs
+
+Revision ID: d3b8f61a4c27
+Revises: a7e4c2d95b10
+Create Date: 2026-10-19 15:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3b8f61a4c27'
+down_revision = 'a7e4c2d95b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases that fell back to db.create_all() already have the table
+    if sa.inspect(op.get_bind()).has_table('prep_time_buckets'):
+        return
+    op.create_table('prep_time_buckets',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('dimension', sa.String(length=20), nullable=False),
+    sa.Column('key', sa.String(length=50), nullable=False),
+    sa.Column('bucket', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('dimension', 'key', 'bucket', name='uq_prep_time_buckets_sketch_bucket')
+    )
+
+
+def downgrade():
+    op.drop_table('prep_time_buckets')
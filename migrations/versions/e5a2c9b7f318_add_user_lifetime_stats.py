@@ -0,0 +1,55 @@
+"""Add lifetime order stats to users
+
+Revision ID: e5a2c9b7f318
+Revises: d3b8f61a4c27
+Create Date: 2026-10-19 15:50:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a2c9b7f318'
+down_revision = 'd3b8f61a4c27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    user_columns = {column['name'] for column in inspector.get_columns('users')}
+    if 'order_count' not in user_columns:
+        with op.batch_alter_table('users') as batch_op:
+            batch_op.add_column(sa.Column('order_count', sa.Integer(), server_default='0', nullable=False))
+            batch_op.add_column(sa.Column('total_spent', sa.Numeric(precision=10, scale=2), server_default='0',
+                                          nullable=False))
+            batch_op.add_column(sa.Column('last_order_date', sa.DateTime(), nullable=True))
+            batch_op.add_column(sa.Column('top_items', sa.JSON(), nullable=True))
+
+    # Databases that fell back to db.create_all() already have the table
+    if inspector.has_table('user_item_counts'):
+        return
+    op.create_table('user_item_counts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('menu_item_id', sa.Integer(), nullable=False),
+    sa.Column('item_name', sa.String(length=100), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['menu_item_id'], ['menu_items.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'menu_item_id', name='uq_user_item_counts_user_item')
+    )
+    # Existing customers get their stats from `flask backfill-user-stats`
+
+
+def downgrade():
+    op.drop_table('user_item_counts')
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('top_items')
+        batch_op.drop_column('last_order_date')
+        batch_op.drop_column('total_spent')
+        batch_op.drop_column('order_count')
@@ -4,20 +4,18 @@ Main entry point for the application.
 """
 import os
 from app import create_app, db
-from app.models.user import User
-from app.models.menu_item import MenuItem
-from app.models.order import Order, OrderItem
-from flask_migrate import Migrate
 
-# Create the application instance
+# Create the application instance (Flask-Migrate is set up by create_app)
 app = create_app(os.getenv('FLASK_CONFIG') or 'default')
-migrate = Migrate(app, db)  # Initialize Flask-Migrate with app and db
 
 @app.shell_context_processor
 def make_shell_context():
     """
     Make shell context available in the Flask shell.
     """
+    from app.models.user import User
+    from app.models.menu_item import MenuItem
+    from app.models.order import Order, OrderItem
     return {
         'db': db,
         'User': User,
@@ -27,4 +25,9 @@ def make_shell_context():
     }
 
 if __name__ == '__main__':
+    # The development server sets up its own database; deployments use
+    # `python manage.py deploy`
+    from app.utils.startup import ensure_admin_user, ensure_schema
+    ensure_schema(app)
+    ensure_admin_user(app)
     app.run(host='0.0.0.0', port=5000)
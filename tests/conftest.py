@@ -0,0 +1,75 @@
+"""
+Fixtures for the behaviour tests.
+
+Run them with ``python -m pytest tests``; each test gets empty tables in the
+in-memory ``testing`` database.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models.menu_item import MenuItem
+from app.models.order import Order, OrderItem
+from app.models.user import User
+from app.utils.trending import flush_pending_sales
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture(autouse=True)
+def tables(app):
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    yield
+    db.session.remove()
+    # Leave nothing for the atexit flush, which runs after pytest closes its output
+    flush_pending_sales()
+
+
+@pytest.fixture
+def user():
+    user = User(username='customer', email='customer@example.com', first_name='Casey')
+    user.password = 'password123'
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def menu_items():
+    items = [
+        MenuItem(name='Latte', price=3.00, category='Coffee', is_available=True),
+        MenuItem(name='Muffin', price=2.50, category='Bakery', is_available=True),
+    ]
+    db.session.add_all(items)
+    db.session.commit()
+    return items
+
+
+@pytest.fixture
+def place_order(user):
+    """Return a function that commits a pending order for ``user``.
+
+    Items are ``(menu_item, quantity)`` pairs.
+    """
+    def place_order(*items, **kwargs):
+        order = Order(user_id=user.id, **kwargs)
+        db.session.add(order)
+        for menu_item, quantity in items:
+            order.items.append(OrderItem(menu_item_id=menu_item.id, item_name=menu_item.name,
+                                         item_price=menu_item.price, quantity=quantity))
+        db.session.flush()
+        order.calculate_totals()
+        db.session.commit()
+        return order
+    return place_order
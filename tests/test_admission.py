@@ -0,0 +1,58 @@
+import time
+
+from werkzeug.test import Client
+
+from app.utils.admission import AdmissionControlMiddleware, parse_request_start
+
+
+def _ok(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'ok']
+
+
+def _middleware(app, **kwargs):
+    return AdmissionControlMiddleware(_ok, app, route_priorities=app.config['ADMISSION_ROUTE_PRIORITIES'],
+                                      max_in_flight=10, **kwargs)
+
+
+def test_low_priority_requests_are_shed_first(app):
+    middleware = _middleware(app)
+    client = Client(middleware)
+    middleware.in_flight = 6  # Pressure 0.6: above 'low' (0.5), below 'normal' (0.75)
+
+    shed = client.get('/search?q=latte')
+    assert shed.status_code == 503
+    assert shed.headers['Retry-After'] == '5'
+    assert client.get('/api/menu/items').get_json() == {'error': 'Service overloaded, please retry shortly'}
+    assert client.get('/about').status_code == 200
+    assert client.post('/order').status_code == 200
+    assert middleware.stats['shed']['low'] == 2
+
+
+def test_in_flight_drops_when_the_response_closes(app):
+    middleware = _middleware(app)
+    response = Client(middleware).get('/about')
+    assert middleware.in_flight == 1
+    response.close()  # As the server does once the body is sent
+    assert middleware.in_flight == 0
+
+
+def test_request_start_is_only_used_when_trusted(app):
+    started = f't={time.time() - 2:.3f}'  # Queued for 2s, twice max_delay
+    untrusted = _middleware(app)
+    Client(untrusted).get('/about', headers={'X-Request-Start': started})
+    assert untrusted.queue_delay() == 0.0
+
+    trusted = _middleware(app, trust_request_start=True)
+    Client(trusted).get('/about', headers={'X-Request-Start': started})
+    assert trusted.queue_delay() > 0.3
+
+
+def test_request_start_formats_and_bogus_values():
+    now = 1_700_000_000.0
+    assert parse_request_start('t=1699999999.5', now=now) == 0.5
+    assert parse_request_start(str(int((now - 0.25) * 1000)), now=now) == 0.25
+    assert parse_request_start(str(int((now - 0.25) * 1_000_000)), now=now) == 0.25
+    assert parse_request_start('t=1700000001', now=now) is None  # In the future
+    assert parse_request_start('t=0', now=now, max_delay=120) is None  # Epoch: not a queue delay
+    assert parse_request_start('soon', now=now) is None
@@ -0,0 +1,49 @@
+from werkzeug.test import Client
+
+from app.utils.page_cache import PageCacheMiddleware
+
+
+def _talisman_like(environ, start_response):
+    """Redirect plain HTTP like Talisman's force_https, else render a page."""
+    secure = environ['wsgi.url_scheme'] == 'https' or environ.get('HTTP_X_FORWARDED_PROTO') == 'https'
+    if not secure:
+        start_response('302 FOUND', [('Location', 'https://localhost/about')])
+        return [b'']
+    start_response('200 OK', [('Content-Type', 'text/html')])
+    return [b'<p>About</p>']
+
+
+def _client(app):
+    return Client(PageCacheMiddleware(_talisman_like, app, endpoints=('main.about',)))
+
+
+def test_repeated_requests_are_served_from_the_cache(app):
+    client = _client(app)
+    headers = {'X-Forwarded-Proto': 'https'}
+
+    assert client.get('/about', headers=headers).headers['X-Cache'] == 'MISS'
+    response = client.get('/about', headers=headers)
+    assert response.headers['X-Cache'] == 'HIT'
+    assert response.data == b'<p>About</p>'
+
+
+def test_plain_http_is_not_served_a_page_cached_for_https(app):
+    client = _client(app)
+    client.get('/about', headers={'X-Forwarded-Proto': 'https'})
+
+    response = client.get('/about')
+    assert response.status_code == 302
+    assert response.headers['X-Cache'] == 'MISS'
+
+
+def test_pages_sent_with_write_are_cached_whole(app):
+    def writer(environ, start_response):
+        write = start_response('200 OK', [('Content-Type', 'text/html')])
+        write(b'<p>')
+        return [b'About</p>']
+
+    client = Client(PageCacheMiddleware(writer, app, endpoints=('main.about',)))
+    assert client.get('/about').data == b'<p>About</p>'
+    response = client.get('/about')
+    assert response.headers['X-Cache'] == 'HIT'
+    assert response.data == b'<p>About</p>'
@@ -0,0 +1,30 @@
+from sqlalchemy import func, select
+
+from app import db
+from app.models.prep_time import PrepTimeBucket
+from app.utils.prep_times import load_prep_time_sketches
+
+
+def _recorded():
+    return db.session.scalar(select(func.coalesce(func.sum(PrepTimeBucket.count), 0)))
+
+
+def test_ready_orders_are_added_to_the_sketches(menu_items, place_order):
+    order = place_order((menu_items[0], 1), (menu_items[1], 1))
+    order.update_status('preparing')
+    order.update_status('ready')
+
+    sketches = load_prep_time_sketches()
+    assert ('category', 'Coffee') in sketches and ('category', 'Bakery') in sketches
+    assert _recorded() == len(sketches)
+
+
+def test_an_order_marked_ready_again_is_recorded_once(menu_items, place_order):
+    order = place_order((menu_items[0], 1))
+    order.update_status('preparing')
+    order.update_status('ready')
+    recorded = _recorded()
+
+    order.update_status('ready')
+    order.update_status('completed')
+    assert _recorded() == recorded
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app import db
+from app.models.item_sales import ItemSales
+from app.models.order import Order, OrderItem
+from app.utils.trending import (compute_trending_scores, flush_item_sales, flush_pending_sales,
+                                period_start, rebuild_item_sales)
+
+
+def _sales():
+    return {item_id: quantity for item_id, quantity in
+            db.session.execute(select(ItemSales.menu_item_id, ItemSales.quantity))}
+
+
+def test_committed_sales_are_flushed_like_the_rebuild(app, menu_items, place_order):
+    latte, muffin = menu_items
+    place_order((latte, 2), (muffin, 1))
+    place_order((latte, 1))
+    flush_item_sales(app)
+    flushed = _sales()
+
+    assert flushed == {latte.id: 3, muffin.id: 1}
+    rebuild_item_sales()
+    assert _sales() == flushed
+
+
+def test_rolled_back_sales_are_not_counted(app, user, menu_items):
+    order = Order(user_id=user.id)
+    order.items.append(OrderItem(menu_item_id=menu_items[0].id, item_name='Latte', item_price=3, quantity=4))
+    db.session.add(order)
+    db.session.flush()
+    db.session.rollback()
+
+    flush_item_sales(app)
+    assert _sales() == {}
+
+
+def test_pending_sales_are_written_on_exit(menu_items, place_order):
+    place_order((menu_items[1], 2))
+    assert flush_pending_sales() == 1
+    assert _sales() == {menu_items[1].id: 2}
+    assert flush_pending_sales() == 0  # Nothing left to write
+
+
+def test_older_sales_weigh_less(app, menu_items):
+    latte, muffin = menu_items
+    now = datetime.utcnow()
+    half_life = app.config['TRENDING_HALF_LIFE_HOURS']
+    db.session.add_all([
+        ItemSales(menu_item_id=latte.id, period_start=period_start(now), quantity=10),
+        ItemSales(menu_item_id=muffin.id, period_start=period_start(now - timedelta(hours=2 * half_life)),
+                  quantity=10),
+        ItemSales(menu_item_id=muffin.id, period_start=period_start(now - timedelta(hours=100)), quantity=500),
+    ])
+    db.session.commit()
+
+    scores = dict(compute_trending_scores(now=now))
+    assert list(scores) == [latte.id, muffin.id]
+    # Two half-lives old (give or take the hour bucket), and outside the window not at all
+    assert 0.15 < scores[muffin.id] / scores[latte.id] < 0.35
@@ -0,0 +1,45 @@
+from app import db
+from app.utils.user_stats import backfill_user_stats
+
+
+def _stats(user):
+    db.session.refresh(user)
+    return user.order_count, float(user.total_spent), user.last_order_date, user.top_items
+
+
+def test_completing_orders_updates_stats_like_the_backfill(user, menu_items, place_order):
+    latte, muffin = menu_items
+    first = place_order((latte, 2), (muffin, 1))
+    second = place_order((muffin, 3))
+    place_order((latte, 5))  # Still pending, not counted
+
+    first.update_status('completed')
+    second.update_status('completed')
+    incremental = _stats(user)
+
+    assert incremental[0] == 2
+    assert incremental[1] == round(float(first.total) + float(second.total), 2)
+    assert incremental[2] == max(first.order_date, second.order_date)
+    assert [item['name'] for item in incremental[3]] == ['Muffin', 'Latte']
+
+    assert backfill_user_stats() == 1
+    assert _stats(user) == incremental
+
+
+def test_completing_a_completed_order_again_counts_it_once(user, menu_items, place_order):
+    order = place_order((menu_items[0], 1))
+    order.update_status('completed')
+    order.update_status('completed')
+
+    assert _stats(user)[0] == 1
+    assert user.top_items == [{'id': menu_items[0].id, 'name': 'Latte', 'quantity': 1}]
+    backfill_user_stats()
+    assert _stats(user)[0] == 1
+
+
+def test_other_statuses_do_not_count(user, menu_items, place_order):
+    order = place_order((menu_items[0], 1))
+    for status in ('confirmed', 'preparing', 'ready', 'cancelled'):
+        order.update_status(status)
+
+    assert _stats(user)[:2] == (0, 0.0)
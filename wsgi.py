@@ -8,14 +8,21 @@ This module contains the WSGI callable as a module-level variable named ``applic
 import os
 from app import create_app, db
 from app.models import *  # Import all your models here
+from app.utils.startup import ensure_schema
 
 # Create the Flask application instance using the configuration from environment
 application = create_app(os.getenv('FLASK_ENV') or 'development')
 
-# Ensure all models are loaded and database tables are created
-with application.app_context():
-    db.create_all()
-    print("Database tables created/verified")
+# Only create tables when the database is not at the latest migration;
+# a stamped database skips schema introspection entirely
+schema_current = ensure_schema(application)
+print("Database schema " + ("up to date" if schema_current else "created/verified"))
+
+# Load the menu snapshot and templates in the gunicorn master (preload_app)
+# so every forked worker shares them copy-on-write
+if application.config.get('WARMUP_ON_PRELOAD'):
+    from app.utils.warmup import warm_up
+    warm_up(application)
 
 if __name__ == "__main__":
     # This is only used when running the application directly (not through a WSGI server)